@@ -2,11 +2,17 @@
 # coding=utf8
 import sys
 
-from pdftoc.app import Application
+from pdftoc import cli
 
 
 if __name__ == "__main__":
 
+    if len(sys.argv) > 1 and sys.argv[1] in cli.COMMANDS:
+        # Headless batch mode, does not require a display.
+        sys.exit(cli.main(sys.argv[1:]))
+
+    from pdftoc.app import Application
+
     app = Application()
     app.run(sys.argv)
 
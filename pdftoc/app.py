@@ -1,12 +1,16 @@
 from pathlib import Path
 import json
+import os
 
 import gi
 gi.require_version('Gtk', '3.0')
 gi.require_version('Gdk', '3.0')
-from gi.repository import Gio, Gtk, Gdk
+from gi.repository import GLib, Gio, Gtk, Gdk
 
 from .app_window import AppWindowController
+from .metadata.scheduler import SubprocessScheduler
+from .ui_resources import UIResources
+from .utils import PhaseTimer
 
 
 __dir__ = Path(__file__).absolute().parent
@@ -19,9 +23,23 @@ class Application(Gtk.Application):
             application_id='me.ju1ius.pdftoc',
             flags=Gio.ApplicationFlags.HANDLES_OPEN
         )
+        # Set PDFTOC_PROFILE_STARTUP=1 to print the duration of the startup phases on stderr
+        self.timer = PhaseTimer(bool(os.environ.get('PDFTOC_PROFILE_STARTUP')))
         self.resource_path: Path = __dir__ / 'resources'
+        self.resources = UIResources(self.resource_path)
         # Maps window ids to controller objects
         self.controllers = {}
+        # Whether documents are opened in a single window
+        self.tabbed = False
+        self.add_main_option(
+            'tabs', ord('t'), GLib.OptionFlags.NONE, GLib.OptionArg.NONE,
+            'Open the documents in a single window', None
+        )
+        self.add_main_option(
+            'max-pdftk', 0, GLib.OptionFlags.NONE, GLib.OptionArg.INT,
+            f'Maximum number of pdftk processes running at once (default: {SubprocessScheduler.DEFAULT_MAX_IN_FLIGHT})',
+            'N'
+        )
         self.css_provider = Gtk.CssProvider()
 
     def do_startup(self):
@@ -38,10 +56,20 @@ class Application(Gtk.Application):
         action.connect('activate', self.on_quit)
         self.add_action(action)
 
-        self.css_provider.load_from_path(str(self.resource_path / 'app.css'))
-        Gtk.StyleContext.add_provider_for_screen(Gdk.Screen.get_default(), self.css_provider, Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION)
+        with self.timer.phase('css'):
+            self.css_provider.load_from_data(self.resources.get_data('app.css'))
+            Gtk.StyleContext.add_provider_for_screen(Gdk.Screen.get_default(), self.css_provider, Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION)
+
+        # Accelerators are only needed once the first window accepts input
+        GLib.idle_add(self._load_keybindings)
+        self.timer.mark('startup')
 
-        self._load_keybindings()
+    def do_handle_local_options(self, options: GLib.VariantDict):
+        self.tabbed = options.contains('tabs')
+        if options.contains('max-pdftk'):
+            SubprocessScheduler.get_default().max_in_flight = options.lookup_value('max-pdftk').get_int32()
+        # Continues the default processing
+        return -1
 
     def do_activate(self):
         """
@@ -55,20 +83,29 @@ class Application(Gtk.Application):
         """
         Called when app is activated with a file parameter
         """
+        # In tabbed mode, the documents are added to the first window
+        controller = None
+        if self.tabbed and self.controllers:
+            controller = next(iter(self.controllers.values()))
+            controller.present()
         for gfile in files:
             path = gfile.get_path()
             if not path:
                 print('TODO: implement remote files.')
                 continue
-            controller = self._create_controller()
-            controller.present()
-            controller.open_file(path)
+            if controller is None or not self.tabbed:
+                controller = self._create_controller()
+                controller.present()
+                controller.open_file(path)
+            else:
+                controller.open_file(path, activate=False)
 
     def do_window_removed(self, window, data=None):
         """
         Called when an app window is closed
         """
-        del self.controllers[window.get_id()]
+        controller = self.controllers.pop(window.get_id())
+        controller.documents.cancel_loads()
         Gtk.Application.do_window_removed(self, window)
 
     def on_quit(self, action, param):
@@ -79,17 +116,27 @@ class Application(Gtk.Application):
         controller.present()
 
     def _load_keybindings(self):
-        with open(self.resource_path / 'keybindings.json', encoding='utf8') as fp:
-            config = json.load(fp)
+        with self.timer.phase('keybindings'):
+            config = json.loads(self.resources.get_text('keybindings.json'))
             for action, accels in config['actions'].items():
                 self.set_accels_for_action(action, accels)
+        return GLib.SOURCE_REMOVE
 
     def _create_controller(self):
-        builder = Gtk.Builder.new_from_file(str(self.resource_path / 'app_window.ui'))
-        builder.add_from_file(str(self.resource_path / 'menus.ui'))
-        controller = AppWindowController(self, builder)
-        controller.window.get_style_context()
-        self.add_window(controller.window)
-        self.controllers[controller.get_window_id()] = controller
+        number = len(self.controllers) + 1
+        with self.timer.phase(f'window {number}'):
+            builder = self.resources.new_builder('app_window.ui', 'menus.ui')
+            controller = AppWindowController(self, builder)
+            controller.window.get_style_context()
+            self.add_window(controller.window)
+            self.controllers[controller.get_window_id()] = controller
+        if self.timer.enabled:
+            handler = None
+
+            def on_first_draw(window, cr):
+                window.disconnect(handler)
+                self.timer.mark(f'window {number} drawn')
+
+            handler = controller.window.connect('draw', on_first_draw)
 
         return controller
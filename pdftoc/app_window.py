@@ -1,10 +1,11 @@
 import datetime
-from os.path import abspath, dirname
+from functools import partial
 
-from gi.repository import GObject, Gtk, Gio
+from gi.repository import GObject, GLib, Gtk, Gio, Pango
 
-from .metadata.model import Document
-from .metadata import loader, writer
+from .document_list import DocumentList
+from .metadata.model import DocumentModel
+from .metadata import writer
 from .utils import local_timezone, local_now
 from .toc.controller import TOCController
 
@@ -20,7 +21,13 @@ BIND_BIDIRECTIONAL = (GObject.BindingFlags.BIDIRECTIONAL
 class AppWindowController:
 
     def __init__(self, app, builder):
+        # Whether several documents can be opened in the window, see `Application.tabbed`
+        self.tabbed = app.tabbed
         self._document = None
+        self._history_handler = None
+        self._document_handlers = []
+        # The entry of the displayed document, None for the initial empty document
+        self._entry = None
 
         self.window = builder.get_object('app_window')
         self.window.set_show_menubar(False)
@@ -30,6 +37,8 @@ class AppWindowController:
             ('open', self._handle_action_open),
             ('save', self._handle_action_save),
             ('save-as', self._handle_action_save_as),
+            ('undo', self._handle_action_undo),
+            ('redo', self._handle_action_redo),
         ):
             action = Gio.SimpleAction.new(action, None)
             action.connect('activate', handler)
@@ -50,12 +59,27 @@ class AppWindowController:
         self.author_entry = builder.get_object('meta_author_entry')
         self.creator_entry = builder.get_object('meta_creator_entry')
         self.creation_entry = builder.get_object('meta_creation_date_entry')
-        self.creation_entry.connect('day-selected', self._on_creation_date_changed)
+        self._creation_date_handler = self.creation_entry.connect('day-selected', self._on_creation_date_changed)
 
         self.toc = TOCController(app, builder)
 
+        self.documents = DocumentList()
+        self.documents.connect('loaded', self._on_document_loaded)
+        self.documents.connect('load-error', self._on_document_load_error)
+        self.documents.connect('load-progress', self._on_document_load_progress)
+        self.documents_view = builder.get_object('documents_treeview')
+        self.documents_view.append_column(Gtk.TreeViewColumn('Document', Gtk.CellRendererText(), text=DocumentList.NAME))
+        status_cell = Gtk.CellRendererText(style=Pango.Style.ITALIC)
+        self.documents_view.append_column(Gtk.TreeViewColumn('Status', status_cell, text=DocumentList.STATUS))
+        self.documents_view.set_model(self.documents)
+        self.documents_view.get_selection().connect('changed', self._on_document_selection_changed)
+        if self.tabbed:
+            builder.get_object('documents_scrolledwindow').show()
+        # pdftk runs for the focused window first
+        self.window.connect('notify::is-active', self._on_window_active_changed)
+
         # initialize with empty document to avoid errors when no file is loaded
-        self.set_document(Document())
+        self.set_document(DocumentModel())
 
         self.window.show_all()
 
@@ -66,56 +90,142 @@ class AppWindowController:
         self.window.present()
 
     def set_document(self, doc):
+        if self._document:
+            self._document.history.disconnect(self._history_handler)
+            # The widgets are shared with the other documents of the window
+            for handler in self._document_handlers:
+                if isinstance(handler, GObject.Binding):
+                    handler.unbind()
+                else:
+                    self._document.disconnect(handler)
         self._document = doc
-        doc.bind_property('title', self.title_entry, 'text', BIND_BIDIRECTIONAL)
-        doc.bind_property('title', self.header, 'title', BIND_DEFAULT)
-        doc.bind_property('subject', self.subject_entry, 'text', BIND_BIDIRECTIONAL)
-        doc.bind_property('author', self.author_entry, 'text', BIND_BIDIRECTIONAL)
-        doc.bind_property('author', self.header, 'subtitle', BIND_DEFAULT)
-        doc.bind_property('creator', self.creator_entry, 'text', BIND_BIDIRECTIONAL)
-        if doc.creation_date:
-            self.creation_entry.props.year = doc.creation_date.year
-            self.creation_entry.props.month = doc.creation_date.month
-            self.creation_entry.props.day = doc.creation_date.day
+        self._history_handler = doc.history.connect('changed', self._on_history_changed)
+        self._on_history_changed(doc.history)
+        self._document_handlers = [
+            doc.connect('notify::creation-date', self._on_document_creation_date_changed),
+            doc.bind_property('title', self.title_entry, 'text', BIND_BIDIRECTIONAL),
+            doc.bind_property('title', self.header, 'title', BIND_DEFAULT),
+            doc.bind_property('subject', self.subject_entry, 'text', BIND_BIDIRECTIONAL),
+            doc.bind_property('author', self.author_entry, 'text', BIND_BIDIRECTIONAL),
+            doc.bind_property('author', self.header, 'subtitle', BIND_DEFAULT),
+            doc.bind_property('creator', self.creator_entry, 'text', BIND_BIDIRECTIONAL),
+        ]
+        self._on_document_creation_date_changed(doc)
         self.toc.set_model(doc.outline)
 
     def get_document(self):
         return self._document
 
-    def open_file(self, path):
+    def open_file(self, path, activate=True):
+        """
+        Queues the loading of a document.
+
+        In tabbed mode, the document is added to the document list and displayed if `activate` is True.
+        Otherwise it replaces the current document once loaded.
+        """
         self.statusbar.push(self.message_contexts['io'], 'Loading: {}'.format(path))
-        doc = Document(abspath(path))
-        loader.load(doc, self._on_document_loaded, self._on_document_load_error)
+        if not self.tabbed:
+            # Only the current document is kept until the new one is loaded
+            for row in list(self.documents):
+                if row[DocumentList.ENTRY] is not self._entry:
+                    self.documents.remove(row.iter)
+        it = self.documents.add(path)
+        if self.tabbed and activate:
+            self.documents_view.get_selection().select_iter(it)
 
     def save(self, path=None):
         if not self._document:
             return
         self.statusbar.push(self.message_contexts['io'], 'Saving: {}'.format(path or self._document.path))
-        self._document.modification_date = local_now()
-        writer.write(self._document, path, self._on_document_saved, self._on_document_save_error)
+        doc = self._document.to_document()
+        doc.modification_date = local_now()
+        writer.write(
+            doc,
+            path,
+            # The displayed document may change before the document is saved
+            partial(self._on_document_saved, self._document, self._entry),
+            self._on_document_save_error,
+            backend=writer.Writer.BACKEND_WORKER,
+            priority=GLib.PRIORITY_HIGH
+        )
 
-    def _on_document_loaded(self, loader, doc):
-        self.set_document(doc)
+    def _activate(self, entry):
+        """
+        Displays the document of `entry`, or an empty one until it is loaded.
+        """
+        self._entry = entry
+        self.set_document(entry.model or DocumentModel())
         msg_ctx = self.message_contexts['io']
         self.statusbar.pop(msg_ctx)
-        self.statusbar.push(msg_ctx, f'Loaded: {doc.path}')
+        if entry.state == entry.FAILED:
+            self.statusbar.push(msg_ctx, f'Error: {entry.error}')
+        elif entry.model:
+            self.statusbar.push(msg_ctx, f'Loaded: {entry.path}')
+        else:
+            self.statusbar.push(msg_ctx, f'Loading: {entry.path}')
+
+    def _on_document_selection_changed(self, selection):
+        model, it = selection.get_selected()
+        if it is None:
+            return
+        self.documents.prioritize(it)
+        self._activate(self.documents.get_entry(it))
+
+    def _on_document_loaded(self, documents, entry):
+        if not self.tabbed:
+            for row in list(documents):
+                if row[DocumentList.ENTRY] is not entry:
+                    documents.remove(row.iter)
+            self._activate(entry)
+        elif entry is self._entry:
+            self._activate(entry)
+
+    def _on_document_load_progress(self, documents, entry, count):
+        if self.tabbed and entry is not self._entry:
+            return
+        msg_ctx = self.message_contexts['io']
+        self.statusbar.pop(msg_ctx)
+        self.statusbar.push(msg_ctx, f'Loading: {count} bookmarks')
 
-    def _on_document_load_error(self, loader, error):
+    def _on_document_load_error(self, documents, entry, error):
+        if not self.tabbed:
+            # The current document is kept
+            documents.remove(documents.find(entry))
+        elif entry is not self._entry:
+            return
         msg_ctx = self.message_contexts['io']
         self.statusbar.pop(msg_ctx)
         self.statusbar.push(msg_ctx, f'Error: {error}')
 
-    def _on_document_saved(self, writer, doc, newpath):
-        doc.path = newpath
+    def _on_document_saved(self, model, entry, writer, doc, newpath):
+        model.path = newpath
+        if entry:
+            self.documents.set_path(entry, newpath)
         msg_ctx = self.message_contexts['io']
         self.statusbar.pop(msg_ctx)
-        self.statusbar.push(msg_ctx, f'Saved: {doc.path}')
+        self.statusbar.push(msg_ctx, f'Saved: {newpath}')
 
     def _on_document_save_error(self, writer, error):
         msg_ctx = self.message_contexts['io']
         self.statusbar.pop(msg_ctx)
         self.statusbar.push(msg_ctx, f'Error: {error}')
 
+    def _on_window_active_changed(self, window, pspec):
+        self.documents.set_priority(GLib.PRIORITY_HIGH if window.is_active() else GLib.PRIORITY_DEFAULT)
+
+    def _on_history_changed(self, history):
+        self.window.lookup_action('undo').set_enabled(history.can_undo)
+        self.window.lookup_action('redo').set_enabled(history.can_redo)
+
+    def _on_document_creation_date_changed(self, doc, pspec=None):
+        if doc is not self._document or not doc.creation_date:
+            return
+        # Setting the date would otherwise set the (time-less) selected day back on the document
+        with self.creation_entry.handler_block(self._creation_date_handler):
+            self.creation_entry.props.year = doc.creation_date.year
+            self.creation_entry.props.month = doc.creation_date.month
+            self.creation_entry.props.day = doc.creation_date.day
+
     def _on_creation_date_changed(self, widget, data=None):
         if not self._document:
             return
@@ -125,8 +235,27 @@ class AppWindowController:
 
     def _handle_action_close(self, action, param):
         # TODO: Show a warning dialog if there are unsaved changes
+        if self.tabbed and len(self.documents) > 1:
+            self._close_active_document()
+            return
         self.window.close()
 
+    def _close_active_document(self):
+        it = self.documents.find(self._entry) if self._entry else None
+        if it is None:
+            return
+        path = self.documents.get_path(it)
+        self.documents.remove(it)
+        if not path.prev():
+            path = Gtk.TreePath.new_first()
+        self.documents_view.get_selection().select_path(path)
+
+    def _handle_action_undo(self, action, param):
+        self._document.history.undo()
+
+    def _handle_action_redo(self, action, param):
+        self._document.history.redo()
+
     def _handle_action_open(self, action, param):
         dialog = Gtk.FileChooserDialog(
             'Open PDF',
@@ -0,0 +1,144 @@
+"""
+Runs batch jobs over many documents on a pool of worker processes.
+"""
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Deque, Dict, Iterable, Iterator, Optional, Tuple
+
+from .metadata import pdftk
+
+
+# How many jobs are queued per worker, so that workers never wait for the next one.
+QUEUE_DEPTH = 2
+
+
+def cpu_count() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def file_size(path: str) -> int:
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        # Let the job itself report the error
+        return 0
+
+
+def _init_worker(pdftk_slots):
+    pdftk.set_concurrency_limit(pdftk_slots)
+
+
+class BatchScheduler:
+    """
+    Runs `job(path)` for each path on a process pool, yielding results in completion order.
+
+    * `jobs` is the number of worker processes (defaults to the number of usable CPUs).
+    * `max_pdftk` bounds the number of pdftk processes running at the same time, across all workers,
+      since each of them is a JVM that uses much more memory than the workers themselves.
+    * `max_inflight_bytes` bounds the total size of the files being processed at the same time.
+      A file bigger than the limit is still processed, alone.
+
+    `job` must be picklable (i.e. a module-level function or a `functools.partial` of one),
+    and should report its own errors in its result.
+    Errors escaping from `job` are passed to `on_error(path, exception)` whose return value is yielded instead.
+    When a worker dies, the pool is replaced and the paths that were running are retried one at a time,
+    so that only the path that crashes on its own is reported, with a `BrokenProcessPool` error.
+    """
+
+    def __init__(self, jobs: Optional[int] = None, max_pdftk: Optional[int] = None,
+                 max_inflight_bytes: Optional[int] = None):
+        self.jobs = max(1, jobs or cpu_count())
+        self.max_pdftk = max(1, max_pdftk or self.jobs)
+        self.max_inflight_bytes = max_inflight_bytes
+
+    def run(self, job: Callable[[str], object], paths: Iterable[str],
+            on_error: Callable[[str, Exception], object]) -> Iterator[object]:
+        if self.jobs == 1:
+            # Not worth spawning a process
+            for path in paths:
+                try:
+                    yield job(path)
+                except Exception as err:
+                    yield on_error(path, err)
+            return
+
+        context = multiprocessing.get_context()
+        pdftk_slots = context.BoundedSemaphore(self.max_pdftk)
+        paths = iter(paths)
+        upcoming: Optional[Tuple[str, int]] = None
+        # Paths that were running when a worker died. They are run again one at a time, to find the culprit.
+        suspects: Deque[Tuple[str, int]] = deque()
+        # future => (path, size, whether it runs alone)
+        pending: Dict[Future, Tuple[str, int, bool]] = {}
+        inflight = 0
+        pool = None
+        try:
+            while True:
+                if pool is None:
+                    pool = ProcessPoolExecutor(self.jobs, mp_context=context,
+                                               initializer=_init_worker, initargs=(pdftk_slots,))
+                broken = False
+                try:
+                    while not any(alone for _, _, alone in pending.values()):
+                        if suspects:
+                            if pending:
+                                break
+                            path, size = suspects[0]
+                            pending[pool.submit(job, path)] = path, size, True
+                            suspects.popleft()
+                            inflight += size
+                            break
+                        if len(pending) >= self.jobs * QUEUE_DEPTH:
+                            break
+                        if upcoming is None:
+                            path = next(paths, None)
+                            if path is None:
+                                break
+                            upcoming = path, file_size(path)
+                        path, size = upcoming
+                        if pending and self.max_inflight_bytes and inflight + size > self.max_inflight_bytes:
+                            break
+                        pending[pool.submit(job, path)] = path, size, False
+                        inflight += size
+                        upcoming = None
+                except BrokenProcessPool:
+                    # A worker died since the last results were collected
+                    broken = True
+                if not pending:
+                    if not broken:
+                        return
+                    pool.shutdown()
+                    pool = None
+                    continue
+                while pending:
+                    # Once the pool is broken, all the pending futures complete, most of them with an error
+                    done, _ = wait(pending, return_when=ALL_COMPLETED if broken else FIRST_COMPLETED)
+                    for future in done:
+                        path, size, alone = pending.pop(future)
+                        inflight -= size
+                        try:
+                            result = future.result()
+                        except BrokenProcessPool as err:
+                            broken = True
+                            if alone:
+                                yield on_error(path, err)
+                            else:
+                                suspects.append((path, size))
+                            continue
+                        except Exception as err:
+                            result = on_error(path, err)
+                        yield result
+                    if not broken:
+                        break
+                if broken:
+                    pool.shutdown()
+                    pool = None
+        finally:
+            if pool is not None:
+                pool.shutdown()
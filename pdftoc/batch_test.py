@@ -0,0 +1,32 @@
+import os
+
+from pdftoc.batch import BatchScheduler
+
+
+def job(path):
+    if path.endswith('crash'):
+        os._exit(1)
+    return path, os.getpid()
+
+
+def test_run_in_worker_processes():
+    scheduler = BatchScheduler(jobs=2, max_inflight_bytes=1)
+    paths = [f'file-{i}' for i in range(6)]
+    results = list(scheduler.run(job, paths, lambda path, err: (path, None)))
+    assert sorted(path for path, _ in results) == paths
+    assert os.getpid() not in {pid for _, pid in results}
+
+
+def test_crashed_worker_is_reported():
+    scheduler = BatchScheduler(jobs=2)
+    results = dict(scheduler.run(job, ['crash'], lambda path, err: (path, type(err).__name__)))
+    assert results == {'crash': 'BrokenProcessPool'}
+
+
+def test_crash_does_not_abort_the_batch():
+    scheduler = BatchScheduler(jobs=2)
+    paths = ['crash'] + [f'file-{i}' for i in range(20)] + ['other-crash']
+    results = dict(scheduler.run(job, paths, lambda path, err: (path, type(err).__name__)))
+    assert sorted(results) == sorted(paths)
+    assert results['crash'] == results['other-crash'] == 'BrokenProcessPool'
+    assert all(isinstance(results[f'file-{i}'], int) for i in range(20))
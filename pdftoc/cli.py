@@ -0,0 +1,206 @@
+"""
+Headless batch commands, usable without a display.
+
+    pdftoc export [options] FILES...
+        Writes the metadata and outline of each PDF to `<name>.toc.txt`, in pdftk `dump_data` format.
+    pdftoc import [options] FILES...
+        Applies `<name>.toc.txt` back to each PDF.
+    pdftoc apply [options] TOC_FILE FILES...
+        Applies the same outline file to every PDF.
+
+FILES can be paths or glob patterns, `--files-from` reads additional paths from a file (`-` for stdin).
+Files are processed in parallel by a pool of worker processes (see `pdftoc.batch`).
+A JSON object is reported on a line for each processed file, in completion order.
+Nothing in here imports Gtk.
+"""
+import argparse
+import functools
+import glob
+import json
+import re
+import sys
+import time
+from os.path import basename, dirname, join, splitext
+from typing import Iterable, Iterator, List, Optional, TextIO
+
+from .batch import BatchScheduler
+from .metadata.document import Document
+from .metadata.outline import OutlineTree
+from .metadata.parser import Parser
+from .metadata.serializer import Serializer
+from .metadata.worker import read_document, write_document
+
+
+COMMANDS = ('export', 'import', 'apply')
+
+TOC_SUFFIX = '.toc.txt'
+
+READ_BACKENDS = ('auto', 'native', 'pdftk')
+WRITE_BACKENDS = ('auto', 'incremental', 'pdftk')
+
+SIZE_RE = re.compile(r'(\d+(?:\.\d+)?)\s*([kmg]?)i?b?', re.I)
+SIZE_UNITS = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+
+
+def apply_toc(doc: Document, toc: str):
+    """
+    Replaces the outline of `doc` with the one described in `toc` (pdftk `dump_data` format).
+    Info entries present in `toc` override those of the document.
+    """
+    doc.outline = OutlineTree()
+    doc.unknown = []
+    doc.page_medias = []
+    Parser().parse(toc, doc)
+
+
+def toc_path(pdf_path: str, directory: Optional[str] = None) -> str:
+    return join(directory or dirname(pdf_path), splitext(basename(pdf_path))[0] + TOC_SUFFIX)
+
+
+def expand_paths(patterns: Iterable[str], files_from: Optional[TextIO] = None) -> Iterator[str]:
+    seen = set()
+    paths = list(patterns)
+    if files_from:
+        paths.extend(line.strip() for line in files_from if line.strip())
+    for pattern in paths:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            if path not in seen:
+                seen.add(path)
+                yield path
+
+
+def export_file(path: str, args) -> dict:
+    doc = read_document(Document(path), args.read_backend)
+    output = toc_path(path, args.output_dir)
+    with open(output, 'wb') as fp:
+        for chunk in Serializer().iter_chunks(doc):
+            fp.write(chunk)
+    return {'output': output, 'bookmarks': len(doc.outline)}
+
+
+def import_file(path: str, args, toc: Optional[str] = None) -> dict:
+    if toc is None:
+        with open(toc_path(path, args.input_dir), encoding='utf8') as fp:
+            toc = fp.read()
+    doc = read_document(Document(path), args.read_backend)
+    apply_toc(doc, toc)
+    output = write_document(doc, backend=args.write_backend, in_place=args.in_place)
+    return {'output': output, 'bookmarks': len(doc.outline)}
+
+
+def process_file(command: str, options: argparse.Namespace, toc: Optional[str], path: str) -> dict:
+    """
+    Runs `command` on a single file, returning its report entry.
+    """
+    result = {'command': command, 'file': path}
+    start = time.perf_counter()
+    try:
+        if command == 'export':
+            result.update(export_file(path, options))
+        else:
+            result.update(import_file(path, options, toc))
+        result['status'] = 'ok'
+    except Exception as err:
+        result.update(error_result(command, path, err))
+    result['seconds'] = round(time.perf_counter() - start, 6)
+    return result
+
+
+def error_result(command: str, path: str, err: Exception) -> dict:
+    return {'command': command, 'file': path, 'status': 'error', 'error': f'{type(err).__name__}: {err}'}
+
+
+def job_options(args: argparse.Namespace) -> argparse.Namespace:
+    """
+    Copies the options needed by `process_file`, leaving out open files so that they can be sent to worker processes.
+    """
+    keys = ('read_backend', 'write_backend', 'in_place', 'output_dir', 'input_dir')
+    return argparse.Namespace(**{key: getattr(args, key, None) for key in keys})
+
+
+def run(command: str, paths: Iterable[str], args, report: TextIO) -> int:
+    """
+    Runs `command` on each path, reporting results as JSON lines. Returns the number of failures.
+    """
+    toc = None
+    if command == 'apply':
+        with open(args.toc_file, encoding='utf8') as fp:
+            toc = fp.read()
+    scheduler = BatchScheduler(
+        getattr(args, 'jobs', 1),
+        getattr(args, 'max_pdftk', None),
+        getattr(args, 'max_inflight_bytes', None),
+    )
+    job = functools.partial(process_file, command, job_options(args), toc)
+    on_error = functools.partial(error_result, command)
+    failures = 0
+    for result in scheduler.run(job, paths, on_error):
+        if result['status'] != 'ok':
+            failures += 1
+        report.write(json.dumps(result, ensure_ascii=False) + '\n')
+        report.flush()
+    return failures
+
+
+def parse_size(value: str) -> int:
+    """
+    Parses a size in bytes, with an optional K, M or G suffix.
+    """
+    m = SIZE_RE.fullmatch(value.strip())
+    if not m:
+        raise argparse.ArgumentTypeError(f'invalid size: {value!r}')
+    return int(float(m.group(1)) * SIZE_UNITS[m.group(2).upper()])
+
+
+def add_common_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('files', nargs='*', metavar='FILE', help='PDF files or glob patterns')
+    parser.add_argument('--files-from', type=argparse.FileType('r', encoding='utf8'),
+                        help='read additional paths from this file, one per line (- for stdin)')
+    parser.add_argument('--read-backend', choices=READ_BACKENDS, default='auto')
+    parser.add_argument('--report', type=argparse.FileType('w', encoding='utf8'), default='-',
+                        help='where to write the JSON lines report (defaults to stdout)')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                        help='number of worker processes (defaults to the number of CPUs, 1 disables the pool)')
+    parser.add_argument('--max-pdftk', type=int,
+                        help='maximum number of concurrent pdftk processes (defaults to the number of jobs)')
+    parser.add_argument('--max-inflight-bytes', type=parse_size,
+                        help='maximum total size of the files processed at the same time, i.e. 512M')
+
+
+def add_write_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--write-backend', choices=WRITE_BACKENDS, default='auto')
+    parser.add_argument('--in-place', action='store_true',
+                        help='append incremental updates directly to the original files')
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='pdftoc', description='Batch PDF outline import/export.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help='export outlines to text files')
+    add_common_arguments(export)
+    export.add_argument('--output-dir', help=f'where to write the {TOC_SUFFIX} files (defaults to the PDF directory)')
+
+    import_ = commands.add_parser('import', help='import outlines from text files')
+    add_common_arguments(import_)
+    add_write_arguments(import_)
+    import_.add_argument('--input-dir', help=f'where to read the {TOC_SUFFIX} files from (defaults to the PDF directory)')
+
+    apply = commands.add_parser('apply', help='apply an outline file to many PDFs')
+    apply.add_argument('toc_file', metavar='TOC_FILE')
+    add_common_arguments(apply)
+    add_write_arguments(apply)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = create_parser().parse_args(argv)
+    paths = expand_paths(args.files, args.files_from)
+    failures = run(args.command, paths, args, args.report)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,29 @@
+import json
+
+from pdftoc import cli
+from pdftoc.metadata.pdf.reader import PDFReader
+from pdftoc.metadata.pdf.reader_test import SAMPLE
+
+
+def test_export_then_apply(tmp_path, capsys):
+    pdf = tmp_path / 'book.pdf'
+    pdf.write_bytes(SAMPLE)
+    (tmp_path / 'broken.pdf').write_bytes(b'not a pdf')
+
+    status = cli.main(['export', '-j', '2', '--read-backend', 'native', str(tmp_path / '*.pdf')])
+    reports = sorted((json.loads(line) for line in capsys.readouterr().out.splitlines()), key=lambda r: r['file'])
+    assert status == 1
+    assert [(r['file'], r['status']) for r in reports] == [
+        (str(tmp_path / 'book.pdf'), 'ok'),
+        (str(tmp_path / 'broken.pdf'), 'error'),
+    ]
+    assert reports[0]['bookmarks'] == 3
+    toc = (tmp_path / 'book.toc.txt').read_text(encoding='utf8')
+    assert 'BookmarkTitle: Été\nBookmarkPageNumber: 2\nBookmarkLevel: 2' in toc
+
+    (tmp_path / 'new.toc.txt').write_text(toc.replace('Chapter 2', 'Appendix'), encoding='utf8')
+    status = cli.main(['apply', str(tmp_path / 'new.toc.txt'), str(pdf), '--write-backend', 'incremental'])
+    assert status == 0
+    assert json.loads(capsys.readouterr().out)['status'] == 'ok'
+    with PDFReader.open(str(pdf)) as reader:
+        assert [title for _, title, _ in reader.iter_outline()] == ['Chapter (1)', 'Été', 'Appendix']
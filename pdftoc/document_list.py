@@ -0,0 +1,181 @@
+from collections import deque
+from os.path import abspath, basename
+from typing import Deque, Optional
+
+from gi.repository import GObject, GLib, Gtk
+
+from .metadata import loader
+from .metadata.cache import MetadataCache
+from .metadata.document import Document
+from .metadata.model import DocumentModel
+
+
+class DocumentEntry:
+    """
+    A document opened in a window.
+
+    Only the model of the document is kept, the widgets of the window are shared by all its documents.
+    """
+
+    __slots__ = ('path', 'model', 'loader', 'state', 'error')
+
+    QUEUED = 'queued'
+    LOADING = 'loading'
+    LOADED = 'loaded'
+    FAILED = 'failed'
+
+    def __init__(self, path: str):
+        self.path = path
+        self.model: Optional[DocumentModel] = None
+        self.loader: Optional[loader.Loader] = None
+        self.state = self.QUEUED
+        self.error = None
+
+
+class DocumentList(Gtk.ListStore):
+    """
+    The documents opened in a window.
+
+    Documents are loaded in the order they were added, at most `max_loads` at once,
+    so that opening many files does not start as many loads.
+    """
+
+    __gsignals__ = {
+        # args=(DocumentEntry,)
+        'loaded': (GObject.SIGNAL_RUN_FIRST, None, (object,)),
+        # args=(DocumentEntry, error)
+        'load-error': (GObject.SIGNAL_RUN_FIRST, None, (object, object)),
+        # args=(DocumentEntry, number of bookmarks loaded so far)
+        'load-progress': (GObject.SIGNAL_RUN_FIRST, None, (object, int)),
+    }
+
+    NAME = 0
+    STATUS = 1
+    ENTRY = 2
+    COLUMNS = (str, str, object)
+
+    DEFAULT_MAX_LOADS = 2
+
+    def __init__(self, max_loads: int = DEFAULT_MAX_LOADS):
+        super().__init__(*self.COLUMNS)
+        self.max_loads = max_loads
+        # Priority of the pdftk invocations, relative to those of the other windows
+        self.priority = GLib.PRIORITY_DEFAULT
+        self._queue: Deque[DocumentEntry] = deque()
+        self._loading = 0
+
+    def get_entry(self, it) -> DocumentEntry:
+        return self.get_value(it, self.ENTRY)
+
+    def find(self, entry: DocumentEntry) -> Optional[Gtk.TreeIter]:
+        it = self.get_iter_first()
+        while it is not None and self.get_entry(it) is not entry:
+            it = self.iter_next(it)
+        return it
+
+    def add(self, path: str) -> Gtk.TreeIter:
+        """
+        Appends a document and queues its loading.
+        """
+        entry = DocumentEntry(abspath(path))
+        it = self.append((basename(entry.path), 'Queued', entry))
+        self._queue.append(entry)
+        self._start_loads()
+        return it
+
+    def remove(self, it):
+        entry = self.get_entry(it)
+        if entry.state == entry.QUEUED:
+            self._queue.remove(entry)
+        elif entry.state == entry.LOADING:
+            entry.loader.cancel()
+            self._end_load(entry)
+        return super().remove(it)
+
+    def prioritize(self, it):
+        """
+        Moves a queued document to the front of the queue.
+        """
+        entry = self.get_entry(it)
+        if entry.state == entry.QUEUED:
+            self._queue.remove(entry)
+            self._queue.appendleft(entry)
+
+    def set_priority(self, priority: int):
+        self.priority = priority
+        for row in self:
+            entry = row[self.ENTRY]
+            if entry.state == entry.LOADING:
+                entry.loader.set_priority(priority)
+
+    def cancel_loads(self):
+        """
+        Cancels the pending and running loads.
+        """
+        for entry in self._queue:
+            entry.state = entry.FAILED
+            entry.error = 'Cancelled'
+        self._queue.clear()
+        for row in self:
+            entry = row[self.ENTRY]
+            if entry.state == entry.LOADING:
+                entry.loader.cancel()
+                entry.state = entry.FAILED
+                entry.error = 'Cancelled'
+                self._end_load(entry)
+
+    def set_path(self, entry: DocumentEntry, path: str):
+        entry.path = path
+        it = self.find(entry)
+        if it is not None:
+            self.set_value(it, self.NAME, basename(path))
+
+    def _start_loads(self):
+        while self._queue and self._loading < self.max_loads:
+            entry = self._queue.popleft()
+            entry.state = entry.LOADING
+            self._loading += 1
+            self._set_status(entry, 'Loading')
+            entry.loader = self._load(entry)
+
+    def _load(self, entry: DocumentEntry) -> loader.Loader:
+        ldr = loader.Loader(loader.Loader.MODE_THREADED, loader.Loader.BACKEND_WORKER, cache=MetadataCache.get_default())
+        ldr.connect('success', self._on_loaded, entry)
+        ldr.connect('error', self._on_load_error, entry)
+        ldr.connect('progress', self._on_load_progress, entry)
+        ldr.load(Document(entry.path), priority=self.priority)
+        return ldr
+
+    def _end_load(self, entry: DocumentEntry):
+        entry.loader = None
+        self._loading -= 1
+        self._start_loads()
+
+    def _set_status(self, entry: DocumentEntry, status: str):
+        it = self.find(entry)
+        if it is not None:
+            self.set_value(it, self.STATUS, status)
+
+    def _on_loaded(self, ldr, doc, entry: DocumentEntry):
+        if entry.loader is not ldr:
+            return
+        entry.model = DocumentModel(doc)
+        entry.state = entry.LOADED
+        self._set_status(entry, '')
+        self._end_load(entry)
+        self.emit('loaded', entry)
+
+    def _on_load_error(self, ldr, error, entry: DocumentEntry):
+        if entry.loader is not ldr:
+            return
+        entry.state = entry.FAILED
+        entry.error = error
+        self._set_status(entry, 'Error')
+        self._end_load(entry)
+        self.emit('load-error', entry, error)
+
+    def _on_load_progress(self, ldr, count, entry: DocumentEntry):
+        if entry.loader is not ldr:
+            return
+        self._set_status(entry, f'{count} bookmarks')
+        self.emit('load-progress', entry, count)
@@ -0,0 +1,50 @@
+import gi
+gi.require_version('Gtk', '3.0')
+
+from pdftoc.document_list import DocumentList
+from pdftoc.metadata.document import Document
+
+
+class Loader:
+
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class FakeLoadDocumentList(DocumentList):
+
+    def __init__(self, max_loads):
+        super().__init__(max_loads)
+        self.started = []
+
+    def _load(self, entry):
+        self.started.append(entry.path)
+        return Loader()
+
+    def finish(self, path):
+        entry = next(row[self.ENTRY] for row in self if row[self.ENTRY].path == path)
+        self._on_loaded(entry.loader, Document(path), entry)
+
+
+def test_queued_loads():
+    documents = FakeLoadDocumentList(max_loads=2)
+    loaded = []
+    documents.connect('loaded', lambda store, entry: loaded.append(entry.path))
+    its = [documents.add(f'/{i}.pdf') for i in range(5)]
+    assert documents.started == ['/0.pdf', '/1.pdf']
+    documents.prioritize(its[4])
+    documents.finish('/1.pdf')
+    assert documents.started == ['/0.pdf', '/1.pdf', '/4.pdf']
+    assert loaded == ['/1.pdf']
+    assert documents.get_entry(its[1]).model.path == '/1.pdf'
+    # removing a document being loaded frees its slot
+    loader = documents.get_entry(its[0]).loader
+    documents.remove(its[0])
+    assert loader.cancelled
+    assert documents.started == ['/0.pdf', '/1.pdf', '/4.pdf', '/2.pdf']
+    documents.cancel_loads()
+    assert documents.started == ['/0.pdf', '/1.pdf', '/4.pdf', '/2.pdf']
+    assert [row[DocumentList.ENTRY].state for row in documents] == ['loaded', 'failed', 'failed', 'failed']
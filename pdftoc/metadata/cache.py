@@ -0,0 +1,144 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from .document import Document
+from .packing import pack_document, unpack_document, unpack_header
+
+
+class FileIdentity(NamedTuple):
+    """
+    Identifies a version of a file without reading it.
+    """
+    size: int
+    mtime_ns: int
+    inode: int
+    device: int
+
+    @classmethod
+    def of(cls, path: str) -> 'FileIdentity':
+        st = os.stat(path)
+        return cls(st.st_size, st.st_mtime_ns, st.st_ino, st.st_dev)
+
+
+class MetadataCache:
+    """
+    On-disk cache of parsed documents (info dictionary, page count and outline),
+    so that unchanged files can be reopened without running pdftk or parsing them again.
+
+    Each entry is a file named after a hash of the document path, holding the identity of the document file
+    (size, modification time, inode and device) at the time it was read. An entry whose identity does not match
+    the current one is stale and dropped. Once the entries take more than `max_size` bytes,
+    the least recently used ones are evicted.
+
+    The cache is best effort: I/O errors are ignored and corrupted entries are treated as missing.
+    """
+
+    DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+    _default: Optional['MetadataCache'] = None
+
+    @classmethod
+    def get_default(cls) -> 'MetadataCache':
+        """
+        Returns the cache of the user, in `$XDG_CACHE_HOME/pdftoc/metadata`.
+        """
+        if cls._default is None:
+            base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+            cls._default = cls(Path(base) / 'pdftoc' / 'metadata')
+        return cls._default
+
+    def __init__(self, directory: Path, max_size: int = DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+
+    def read(self, doc: Document, identity: FileIdentity) -> bool:
+        """
+        Fills `doc` from the entry of `doc.path` and returns True if it matches `identity`.
+        """
+        entry = self._entry_path(doc.path)
+        try:
+            with open(entry, 'rb') as fp:
+                data = fp.read()
+        except OSError:
+            return False
+        try:
+            header = unpack_header(data)
+            if os.path.abspath(header['path']) != os.path.abspath(doc.path) or FileIdentity(*header['identity']) != identity:
+                raise ValueError('Stale cache entry')
+            unpack_document(data, doc, header)
+        except (ValueError, KeyError, TypeError):
+            self._remove(entry)
+            return False
+        try:
+            # Marks the entry as recently used
+            os.utime(entry)
+        except OSError:
+            pass
+        return True
+
+    def write(self, doc: Document, identity: FileIdentity):
+        """
+        Stores `doc`, as read from its file when it had the given `identity`.
+        """
+        try:
+            data = pack_document(doc, identity=identity)
+        except (TypeError, ValueError):
+            # i.e. unexpected value types
+            return
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with open(fd, 'wb') as fp:
+                    fp.write(data)
+                os.replace(tmp, self._entry_path(doc.path))
+            except BaseException:
+                self._remove(tmp)
+                raise
+            self._evict()
+        except OSError:
+            pass
+
+    def clear(self):
+        try:
+            entries = list(self.directory.iterdir())
+        except OSError:
+            return
+        for entry in entries:
+            self._remove(entry)
+
+    def _entry_path(self, path: str) -> Path:
+        key = hashlib.sha256(os.fsencode(os.path.abspath(path))).hexdigest()
+        return self.directory / key
+
+    def _evict(self):
+        """
+        Removes the least recently used entries until the cache fits in `max_size`.
+        """
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime_ns, st.st_size, entry.path))
+                total += st.st_size
+        if total <= self.max_size:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,52 @@
+import datetime
+import os
+
+from pdftoc.metadata.cache import FileIdentity, MetadataCache
+from pdftoc.metadata.document import Document
+from pdftoc.metadata.parser import Parser
+from pdftoc.metadata.parser_test import DUMP
+
+
+def write_pdf(tmp_path, name):
+    path = tmp_path / name
+    path.write_bytes(b'%PDF-1.4\n')
+    return str(path)
+
+
+def test_read_write(tmp_path):
+    cache = MetadataCache(tmp_path / 'cache')
+    path = write_pdf(tmp_path, 'a.pdf')
+    doc = Parser().parse(DUMP, Document(path))
+    doc.creation_date = datetime.datetime(2020, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+    identity = FileIdentity.of(path)
+    assert not cache.read(Document(path), identity)
+    cache.write(doc, identity)
+    cached = Document(path)
+    assert cache.read(cached, identity)
+    for name in Document.__slots__:
+        if name != 'outline':
+            assert getattr(cached, name) == getattr(doc, name), name
+    assert list(cached.outline.iter_bookmarks()) == list(doc.outline.iter_bookmarks())
+    # stale entries are dropped
+    os.utime(path, ns=(0, 0))
+    assert not cache.read(Document(path), FileIdentity.of(path))
+    assert not list(cache.directory.iterdir())
+
+
+def test_evict_least_recently_used(tmp_path):
+    doc = Parser().parse(DUMP, Document())
+    cache = MetadataCache(tmp_path / 'cache', max_size=1 << 20)
+    paths = [write_pdf(tmp_path, f'{i}.pdf') for i in range(3)]
+    for i, path in enumerate(paths):
+        doc.path = path
+        cache.write(doc, FileIdentity.of(path))
+        for entry in cache.directory.iterdir():
+            os.utime(entry, ns=(i, i))
+    entry_size = next(cache.directory.iterdir()).stat().st_size
+    assert cache.read(Document(paths[0]), FileIdentity.of(paths[0]))
+    cache.max_size = entry_size * 2
+    doc.path = paths[2]
+    cache.write(doc, FileIdentity.of(paths[2]))
+    assert len(list(cache.directory.iterdir())) == 2
+    assert cache.read(Document(paths[0]), FileIdentity.of(paths[0]))
+    assert not cache.read(Document(paths[1]), FileIdentity.of(paths[1]))
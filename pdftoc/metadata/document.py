@@ -0,0 +1,51 @@
+import datetime
+from typing import Dict, List, Optional
+
+from .outline import OutlineTree
+
+
+class Document:
+    """
+    Plain python document metadata, used by the parser, serializer and backends.
+
+    Importing this module does not require Gtk, see `pdftoc.metadata.model` for the UI adapter.
+    """
+
+    __slots__ = (
+        'path', 'num_pages',
+        'title', 'subject', 'author', 'creator', 'creation_date',
+        'modification_date', 'producer',
+        'outline', 'page_medias', 'infos', 'unknown',
+    )
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.num_pages = 1
+        self.title = ''
+        self.subject = ''
+        self.author = ''
+        self.creator = ''
+        self.creation_date: Optional[datetime.datetime] = None
+        # Read-only values
+        self.modification_date: Optional[datetime.datetime] = None
+        self.producer: Optional[str] = None
+        self.outline = OutlineTree()
+        self.page_medias: List[dict] = []
+        # Unknown key-value pairs
+        self.infos: Dict[str, str] = {}
+        # Unknown lines
+        self.unknown: List[str] = []
+
+    def copy(self, outline: Optional[OutlineTree] = None) -> 'Document':
+        """
+        Returns a shallow copy of the document, with `outline` if given.
+        """
+        doc = Document.__new__(Document)
+        for name in self.__slots__:
+            setattr(doc, name, getattr(self, name))
+        doc.page_medias = list(self.page_medias)
+        doc.infos = dict(self.infos)
+        doc.unknown = list(self.unknown)
+        if outline is not None:
+            doc.outline = outline
+        return doc
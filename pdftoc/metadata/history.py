@@ -0,0 +1,188 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, List, Optional
+
+from gi.repository import GObject
+
+
+class Operation:
+    """
+    A recorded change, holding just enough data to revert and re-apply it.
+    """
+
+    __slots__ = ()
+
+    # Rough per-operation overhead (object, slots, paths), in bytes
+    BASE_SIZE = 200
+
+    def undo(self):
+        raise NotImplementedError
+
+    def redo(self):
+        raise NotImplementedError
+
+    def size(self) -> int:
+        """
+        Approximate memory used by the operation, in bytes.
+        """
+        return self.BASE_SIZE
+
+    def merge(self, other: 'Operation') -> bool:
+        """
+        Absorbs `other`, a later operation on the same target, so that both are undone at once.
+        Returns False if the operations cannot be merged.
+        """
+        return False
+
+
+class _Step:
+
+    __slots__ = ('operations', 'size')
+
+    def __init__(self, operations: List[Operation]):
+        self.operations = operations
+        self.size = sum(op.size() for op in operations)
+
+
+class History(GObject.GObject):
+    """
+    Bounded undo/redo stacks of recorded operations.
+
+    Operations recorded in a `group()` block are undone and redone as a single step.
+    Consecutive edits of the same target made less than `COALESCE_INTERVAL` seconds apart are merged,
+    so that typing in an entry does not produce a step per keystroke.
+    Once the recorded steps take more than `max_size` bytes, the oldest ones are dropped.
+    """
+
+    __gsignals__ = {
+        # Emitted when the undo or redo stack changes
+        'changed': (GObject.SIGNAL_RUN_FIRST, None, ()),
+    }
+
+    COALESCE_INTERVAL = 1.0
+    DEFAULT_MAX_SIZE = 16 * 1024 * 1024
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, clock: Callable[[], float] = time.monotonic):
+        super().__init__()
+        self.max_size = max_size
+        self._clock = clock
+        self._undo: Deque[_Step] = deque()
+        self._redo: List[_Step] = []
+        self._size = 0
+        self._group: Optional[List[Operation]] = None
+        self._group_depth = 0
+        # Whether operations are being undone or redone, in which case the changes they make are not recorded
+        self._applying = False
+        # Time of the last recorded operation, None if it must not be merged with the next one
+        self._last_time: Optional[float] = None
+
+    @property
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    @property
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    @property
+    def recording(self) -> bool:
+        """
+        Whether operations are recorded, i.e. no step is being undone or redone.
+        """
+        return not self._applying
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __len__(self):
+        return len(self._undo)
+
+    def record(self, op: Operation):
+        if self._applying:
+            return
+        if self._group is not None:
+            if not (self._group and self._group[-1].merge(op)):
+                self._group.append(op)
+            return
+        now = self._clock()
+        last = self._undo[-1] if self._undo else None
+        if (
+            last is not None and not self._redo
+            and self._last_time is not None and now - self._last_time < self.COALESCE_INTERVAL
+            and len(last.operations) == 1 and last.operations[0].merge(op)
+        ):
+            self._size -= last.size
+            last.size = last.operations[0].size()
+            self._size += last.size
+            self._last_time = now
+            return
+        self._push(_Step([op]))
+        self._last_time = now
+
+    @contextmanager
+    def group(self):
+        """
+        Records the operations of the block as a single step.
+        """
+        self._group_depth += 1
+        if self._group is None:
+            self._group = []
+        try:
+            yield
+        finally:
+            self._group_depth -= 1
+            if not self._group_depth:
+                operations, self._group = self._group, None
+                if operations:
+                    self._push(_Step(operations))
+                    self._last_time = None
+
+    def undo(self) -> bool:
+        if not self._undo:
+            return False
+        step = self._undo.pop()
+        with self._applying_step():
+            for op in reversed(step.operations):
+                op.undo()
+        self._redo.append(step)
+        self.emit('changed')
+        return True
+
+    def redo(self) -> bool:
+        if not self._redo:
+            return False
+        step = self._redo.pop()
+        with self._applying_step():
+            for op in step.operations:
+                op.redo()
+        self._undo.append(step)
+        self.emit('changed')
+        return True
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+        self._size = 0
+        self._last_time = None
+        self.emit('changed')
+
+    def _push(self, step: _Step):
+        self._size -= sum(s.size for s in self._redo)
+        self._redo.clear()
+        self._undo.append(step)
+        self._size += step.size
+        # The latest step is always kept
+        while self._size > self.max_size and len(self._undo) > 1:
+            self._size -= self._undo.popleft().size
+        self.emit('changed')
+
+    @contextmanager
+    def _applying_step(self):
+        self._applying = True
+        self._last_time = None
+        try:
+            yield
+        finally:
+            self._applying = False
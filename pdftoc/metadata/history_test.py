@@ -0,0 +1,124 @@
+import random
+
+import gi
+gi.require_version('Gtk', '3.0')
+
+from pdftoc.metadata.document import Document
+from pdftoc.metadata.history import History
+from pdftoc.metadata.model import DocumentModel, OutlineStore
+from pdftoc.metadata.model_test import assert_aggregates
+from pdftoc.metadata.outline import OutlineTree
+from pdftoc.toc.tree_store import MOVE_DIRECTIONS
+
+
+class Clock:
+
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+
+def random_edit(store: OutlineStore, rng: random.Random):
+    paths = []
+    store.foreach(lambda model, path, it: paths.append(path.copy()))
+    it = store.get_iter(rng.choice(paths)) if paths else None
+    action = rng.random()
+    if it is None or action < 0.3:
+        store.append(it, (f'row {len(paths)}', rng.randint(1, 100)))
+    elif action < 0.4:
+        store.insert_after(None, it, ('', rng.randint(1, 100)))
+    elif action < 0.5:
+        store.set_title(it, rng.choice(('a', 'b', 'c')))
+    elif action < 0.6:
+        store.set_page(it, rng.randint(1, 100))
+    elif action < 0.75:
+        rng.choice((store.move_row_left, store.move_row_right, store.move_row_up, store.move_row_down))(it)
+    elif action < 0.8:
+        store.duplicate_row(it)
+    elif action < 0.9:
+        store.move_rows(rng.sample(paths, min(3, len(paths))), rng.choice(MOVE_DIRECTIONS))
+    else:
+        store.remove(it)
+
+
+def test_undo_redo_edits():
+    rng = random.Random(17)
+    clock = Clock()
+    history = History(clock=clock)
+    store = OutlineStore(history)
+    store.populate(OutlineTree.from_bookmarks((1 + rng.randint(0, 3), str(i), i) for i in range(50)))
+    snapshots = [list(store.iter_bookmarks())]
+    for _ in range(200):
+        # no coalescing
+        clock.time += History.COALESCE_INTERVAL
+        count = len(history)
+        random_edit(store, rng)
+        if len(history) != count:
+            snapshots.append(list(store.iter_bookmarks()))
+    assert len(history) == len(snapshots) - 1
+    for snapshot in reversed(snapshots[:-1]):
+        assert history.undo()
+        assert list(store.iter_bookmarks()) == snapshot
+        assert_aggregates(store)
+    assert not history.can_undo
+    for snapshot in snapshots[1:]:
+        assert history.redo()
+        assert list(store.iter_bookmarks()) == snapshot
+        assert_aggregates(store)
+    assert not history.can_redo
+
+
+def test_coalesce_edits():
+    clock = Clock()
+    history = History(clock=clock)
+    store = OutlineStore(history)
+    it = store.append(None, ('', 1))
+    for title in ('C', 'Ch', 'Cha'):
+        clock.time += 0.1
+        store.set_title(it, title)
+    clock.time += History.COALESCE_INTERVAL
+    store.set_page(it, 5)
+    assert len(history) == 3
+    history.undo()
+    assert store.get_title(it) == 'Cha' and store.get_page(it) == 1
+    history.undo()
+    assert store.get_title(it) == ''
+    with store.group_changes():
+        store.set_title(it, 'Chapter')
+        store.set_page(it, 3)
+    assert len(history) == 2
+    assert not history.can_redo
+
+
+def test_memory_budget():
+    outline = OutlineTree.from_bookmarks((1 + i % 3, f'Bookmark {i}', i) for i in range(20000))
+    history = History(max_size=outline.nbytes() * 3)
+    store = OutlineStore(history)
+    store.populate(outline)
+    assert not history.can_undo
+    for _ in range(10):
+        store.remove(store.get_iter('0'))
+        store.move_row_down(store.get_iter('0'))
+        assert history.size <= history.max_size
+    for i in range(2000):
+        store.set_page(store.get_iter('1'), i)
+    assert history.size <= history.max_size
+
+
+def test_document_properties():
+    clock = Clock()
+    model = DocumentModel(Document())
+    model.history._clock = clock
+    model.title = 'T'
+    model.title = 'Title'
+    clock.time += History.COALESCE_INTERVAL
+    model.author = 'Author'
+    assert len(model.history) == 2
+    model.history.undo()
+    model.history.undo()
+    assert (model.title, model.author) == ('', '')
+    model.history.redo()
+    assert model.title == 'Title'
+    assert model.to_document().title == 'Title'
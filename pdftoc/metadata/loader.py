@@ -1,53 +1,328 @@
+import subprocess
+import threading
+import time
+from functools import partial
 from shutil import which
 from os.path import abspath, dirname
 
 from gi.repository import GObject, GLib, Gio
 
+from . import native
+from .cache import FileIdentity, MetadataCache
 from .parser import Parser
+from .scheduler import Job, SubprocessScheduler
+from .worker import FALLBACK_ERRORS, WorkerPool
 
 
-def load(doc, on_success=None, on_error=None):
-    loader = Loader()
+def load(doc, on_success=None, on_error=None, on_progress=None, cancellable=None, mode=None, backend=None,
+         priority=GLib.PRIORITY_DEFAULT):
+    loader = Loader(mode or Loader.MODE_CHUNKED, backend or Loader.BACKEND_PDFTK)
     if callable(on_success):
         loader.connect('success', on_success)
     if callable(on_error):
         loader.connect('error', on_error)
-    loader.load(doc)
+    if callable(on_progress):
+        loader.connect('progress', on_progress)
+    loader.load(doc, cancellable, priority)
+    return loader
 
 
 class Loader(GObject.GObject):
 
     __gsignals__ = {
+        # args=(Document,)
         'success': (GObject.SIGNAL_RUN_FIRST, None, (object,)),
         'error': (GObject.SIGNAL_RUN_FIRST, None, (object,)),
+        # args=(number of bookmarks loaded so far,)
+        'progress': (GObject.SIGNAL_RUN_FIRST, None, (int,)),
+        'cancelled': (GObject.SIGNAL_RUN_FIRST, None, ()),
     }
 
-    def __init__(self):
+    # Parses in idle callbacks on the main thread.
+    # The output of pdftk is not streamed: it is read whole, then parsed in slices.
+    MODE_CHUNKED = 'chunked'
+    # Parses in a worker thread.
+    MODE_THREADED = 'threaded'
+
+    # Runs `pdftk dump_data_utf8` and parses its output.
+    BACKEND_PDFTK = 'pdftk'
+    # Reads the PDF file directly, in a worker thread.
+    BACKEND_NATIVE = 'native'
+    # Tries the native backend first, falling back to pdftk for files it cannot handle.
+    BACKEND_AUTO = 'auto'
+    # Same as BACKEND_AUTO, in a long-lived helper process shared with the other loaders and writers.
+    BACKEND_WORKER = 'worker'
+
+    # Maximum time (in seconds) spent parsing in a single main loop iteration
+    SLICE_DURATION = 0.01
+    # Minimum interval (in seconds) between two progress notifications from the worker thread
+    PROGRESS_INTERVAL = 0.1
+
+    def __init__(self, mode: str = MODE_CHUNKED, backend: str = BACKEND_PDFTK, scheduler: SubprocessScheduler = None,
+                 cache: MetadataCache = None, workers: WorkerPool = None):
         super().__init__()
+        if mode not in (self.MODE_CHUNKED, self.MODE_THREADED):
+            raise ValueError(mode)
+        if backend not in (self.BACKEND_PDFTK, self.BACKEND_NATIVE, self.BACKEND_AUTO, self.BACKEND_WORKER):
+            raise ValueError(backend)
+        self.mode = mode
+        self.backend = backend
+        self.scheduler = scheduler if scheduler is not None else SubprocessScheduler.get_default()
+        # Documents are read from the cache when their file is unchanged, and stored in it otherwise
+        self.cache = cache
+        # Helper processes of BACKEND_WORKER, defaults to the shared pool
+        self.workers = workers
+        # Identity of the file when it started being read
+        self._identity = None
+        self._cancellable = Gio.Cancellable()
+        self._priority = GLib.PRIORITY_DEFAULT
+        # Scheduler slot of the pdftk process
+        self._job = None
+        self._idle_id = 0
+        self._rows_loaded = 0
 
     def do_error(self, err):
         print(err)
 
-    def load(self, doc):
+    def load(self, doc, cancellable=None, priority=GLib.PRIORITY_DEFAULT):
+        """
+        Starts loading `doc`. pdftk is run once the scheduler has a free slot, `priority` being the GLib priority
+        of the load relative to the other pdftk invocations.
+        """
+        if cancellable:
+            self._cancellable = cancellable
+        self._priority = priority
+        if self.cache is not None and doc.path:
+            thread = threading.Thread(target=self._read_cache_in_thread, args=(doc,), daemon=True)
+            thread.start()
+            return
+        self._start(doc)
+
+    def _start(self, doc):
+        if self.backend == self.BACKEND_WORKER:
+            self._job = self.scheduler.submit(
+                partial(self._start_worker_request, doc),
+                self._priority,
+                self._cancellable,
+                self._on_job_cancelled
+            )
+            return GLib.SOURCE_REMOVE
         pdftk = which('pdftk')
+        if self.backend != self.BACKEND_PDFTK:
+            thread = threading.Thread(target=self._read_in_thread, args=(pdftk, doc), daemon=True)
+            thread.start()
+            return GLib.SOURCE_REMOVE
         if not pdftk:
-            return self.emit('error', 'pdftk executable not found')
-        p = Gio.Subprocess.new(
-            argv=[pdftk, doc.path, 'dump_data_utf8'],
-            flags=Gio.SubprocessFlags.STDOUT_PIPE|Gio.SubprocessFlags.STDERR_PIPE
+            self.emit('error', 'pdftk executable not found')
+            return GLib.SOURCE_REMOVE
+        return self._schedule_pdftk(pdftk, doc)
+
+    def set_priority(self, priority: int):
+        """
+        Changes the priority of the load, if pdftk is still waiting for a scheduler slot.
+        """
+        self._priority = priority
+        if self._job:
+            self.scheduler.set_priority(self._job, priority)
+
+    def _schedule_pdftk(self, pdftk, doc):
+        self._job = self.scheduler.submit(
+            partial(self._start_pdftk, pdftk, doc),
+            self._priority,
+            self._cancellable,
+            self._on_job_cancelled
+        )
+        return GLib.SOURCE_REMOVE
+
+    def _start_pdftk(self, pdftk, doc, job: Job):
+        if self.mode == self.MODE_THREADED:
+            thread = threading.Thread(target=self._parse_in_thread, args=(pdftk, doc, job), daemon=True)
+            thread.start()
+            return
+        try:
+            p = Gio.Subprocess.new(
+                argv=[pdftk, doc.path, 'dump_data_utf8'],
+                flags=Gio.SubprocessFlags.STDOUT_PIPE|Gio.SubprocessFlags.STDERR_PIPE
+            )
+        except GLib.Error as err:
+            job.release()
+            return self.emit('error', err)
+        p.communicate_utf8_async(
+            cancellable=self._cancellable,
+            callback=self._on_subprocess_complete,
+            user_data=(doc, job)
         )
-        p.communicate_utf8_async(callback=self._on_subprocess_complete, user_data=doc)
 
-    def _on_subprocess_complete(self, subprocess, result, doc):
+    def _start_worker_request(self, doc, job: Job):
+        thread = threading.Thread(target=self._load_with_worker_in_thread, args=(doc, job), daemon=True)
+        thread.start()
+
+    def _on_job_cancelled(self):
+        self.emit('cancelled')
+
+    def cancel(self):
+        """
+        Aborts the current load, either while pdftk is running or between two parsing slices.
+        """
+        self._cancellable.cancel()
+        if self._idle_id:
+            GLib.source_remove(self._idle_id)
+            self._idle_id = 0
+            self.emit('cancelled')
+
+    def _on_subprocess_complete(self, subprocess, result, user_data):
+        doc, job = user_data
+        job.release()
         try:
             success, stdout, stderr = subprocess.communicate_utf8_finish(result)
             retcode = subprocess.get_exit_status()
         except GLib.Error as err:
+            if err.matches(Gio.io_error_quark(), Gio.IOErrorEnum.CANCELLED):
+                subprocess.force_exit()
+                return self.emit('cancelled')
             return self.emit('error', err)
         if retcode != 0:
             return self.emit('error', f'pdftk command failed with exit code {retcode}')
+        rows = Parser().iter_parse(stdout, doc)
+        self._idle_id = GLib.idle_add(self._parse_slice, rows, doc)
+
+    def _parse_slice(self, rows, doc):
+        """
+        Idle callback parsing records until the slice duration is exhausted.
+        """
+        if self._cancellable.is_cancelled():
+            self._idle_id = 0
+            self.emit('cancelled')
+            return GLib.SOURCE_REMOVE
+        deadline = time.monotonic() + self.SLICE_DURATION
         try:
-            Parser().parse(stdout, doc)
-            self.emit('success', doc)
+            for self._rows_loaded in rows:
+                if time.monotonic() >= deadline:
+                    self.emit('progress', self._rows_loaded)
+                    return GLib.SOURCE_CONTINUE
         except Exception as err:
+            self._idle_id = 0
             self.emit('error', err)
+            return GLib.SOURCE_REMOVE
+        self._idle_id = 0
+        self._store(doc)
+        self.emit('progress', self._rows_loaded)
+        self.emit('success', doc)
+        return GLib.SOURCE_REMOVE
+
+    def _read_cache_in_thread(self, doc):
+        """
+        Runs in a worker thread: reads the document from the cache, or starts loading it if it is not cached.
+        """
+        try:
+            self._identity = FileIdentity.of(doc.path)
+        except OSError:
+            # Let the backend report the error
+            self._identity = None
+        if self._identity and self.cache.read(doc, self._identity):
+            GLib.idle_add(self._finish, doc, len(doc.outline))
+            return
+        GLib.idle_add(self._start, doc)
+
+    def _store(self, doc):
+        if self.cache is not None and self._identity:
+            self.cache.write(doc, self._identity)
+
+    def _read_in_thread(self, pdftk, doc):
+        """
+        Runs in a worker thread: reads the document with the native backend.
+        """
+        try:
+            native.read_document(doc, self._cancellable)
+        except native.Cancelled:
+            GLib.idle_add(self._emit_in_main_thread, 'cancelled')
+            return
+        except FALLBACK_ERRORS as err:
+            if self.backend == self.BACKEND_AUTO and pdftk:
+                GLib.idle_add(self._schedule_pdftk, pdftk, doc)
+                return
+            GLib.idle_add(self._emit_in_main_thread, 'error', err)
+            return
+        except Exception as err:
+            GLib.idle_add(self._emit_in_main_thread, 'error', err)
+            return
+        self._finish_in_thread(doc, len(doc.outline))
+
+    def _load_with_worker_in_thread(self, doc, job: Job):
+        """
+        Runs in a worker thread: waits for a helper process to read the document.
+        """
+        try:
+            (self.workers or WorkerPool.get_default()).load(doc)
+        except Exception as err:
+            GLib.idle_add(self._emit_in_main_thread, 'error', err)
+            return
+        finally:
+            GLib.idle_add(self._release_in_main_thread, job)
+        self._finish_in_thread(doc, len(doc.outline))
+
+    def _parse_in_thread(self, pdftk, doc, job: Job):
+        """
+        Runs in a worker thread: streams pdftk output through the parser.
+
+        The document is a plain python object that is not shared with the main thread
+        until the 'success' signal is emitted.
+        """
+        try:
+            self._run_pdftk_in_thread(pdftk, doc)
+        finally:
+            GLib.idle_add(self._release_in_main_thread, job)
+
+    def _run_pdftk_in_thread(self, pdftk, doc):
+        count = 0
+        last_progress = time.monotonic()
+        try:
+            with subprocess.Popen(
+                [pdftk, doc.path, 'dump_data_utf8'],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL
+            ) as p:
+                for count in Parser().iter_parse(p.stdout, doc):
+                    if self._cancellable.is_cancelled():
+                        p.kill()
+                        GLib.idle_add(self._emit_in_main_thread, 'cancelled')
+                        return
+                    now = time.monotonic()
+                    if now - last_progress >= self.PROGRESS_INTERVAL:
+                        last_progress = now
+                        GLib.idle_add(self._emit_in_main_thread, 'progress', count)
+            retcode = p.returncode
+        except Exception as err:
+            GLib.idle_add(self._emit_in_main_thread, 'error', err)
+            return
+        if retcode != 0:
+            GLib.idle_add(self._emit_in_main_thread, 'error', f'pdftk command failed with exit code {retcode}')
+            return
+        self._finish_in_thread(doc, count)
+
+    def _finish_in_thread(self, doc, count: int):
+        """
+        Stores a document read in a worker thread, and reports it from the main thread,
+        unless the load was cancelled in the meantime.
+        """
+        if self._cancellable.is_cancelled():
+            GLib.idle_add(self._emit_in_main_thread, 'cancelled')
+            return
+        self._store(doc)
+        GLib.idle_add(self._finish, doc, count)
+
+    def _finish(self, doc, count: int):
+        if self._cancellable.is_cancelled():
+            self.emit('cancelled')
+            return GLib.SOURCE_REMOVE
+        self.emit('progress', count)
+        self.emit('success', doc)
+        return GLib.SOURCE_REMOVE
+
+    def _emit_in_main_thread(self, signal, *args):
+        self.emit(signal, *args)
+        return GLib.SOURCE_REMOVE
+
+    def _release_in_main_thread(self, job: Job):
+        job.release()
+        return GLib.SOURCE_REMOVE
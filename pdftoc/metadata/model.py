@@ -1,57 +1,647 @@
-from typing import Optional, List, Dict
+from array import array
+from contextlib import contextmanager, nullcontext
+from typing import Any, List, Optional, Tuple, Iterator
 
 from gi.repository import GObject, Gtk
 
 from pdftoc.toc.types import ModelKeyType
 from pdftoc.toc.tree_store import TreeStore
+from .document import Document
+from .history import History, Operation
+from .outline import OutlineTree
 
 
-class Document(GObject.GObject):
+def _document_property(name: str, type_, default=None) -> GObject.Property:
+    """
+    GObject property stored on the wrapped plain document.
+    """
+    def getter(self):
+        return getattr(self.document, name)
 
-    num_pages: int = GObject.property(type=int, default=1)
-    title: str = GObject.property(type=str, default='')
-    subject: str = GObject.property(type=str, default='')
-    author: str = GObject.property(type=str, default='')
-    creator: str = GObject.property(type=str, default='')
-    creation_date = GObject.property(type=object, default=None)
+    def setter(self, value):
+        setattr(self.document, name, value)
 
-    def __init__(self, path: Optional[str] = None):
+    return GObject.Property(getter=getter, setter=setter, type=type_, default=default)
+
+
+class DocumentModel(GObject.GObject):
+    """
+    UI adapter for a plain `Document`: exposes its metadata as bindable GObject properties,
+    and its outline as an `OutlineStore`.
+
+    Once wrapped, the outline store is the reference: the outline of the wrapped document is not kept in sync.
+    Changes to the outline and to the `RECORDED_PROPERTIES` are recorded in `history`.
+    """
+
+    RECORDED_PROPERTIES = ('title', 'subject', 'author', 'creator', 'creation_date')
+
+    num_pages: int = _document_property('num_pages', int, 1)
+    title: str = _document_property('title', str, '')
+    subject: str = _document_property('subject', str, '')
+    author: str = _document_property('author', str, '')
+    creator: str = _document_property('creator', str, '')
+    creation_date = _document_property('creation_date', object)
+
+    def __init__(self, document: Optional[Document] = None):
         super().__init__()
-        self.path = path
-        self.outline: OutlineStore = OutlineStore()
-        self.page_medias = []
-        # Read-only values
-        self.modification_date = None
-        self.producer = None
-        # Unknown key-value pairs
-        self.infos: Dict[str, str] = {}
-        # Unknown lines
-        self.unknown: List[str] = []
+        self.document = document or Document()
+        self.history = History()
+        self.outline: OutlineStore = OutlineStore(self.history)
+        self.outline.populate(self.document.outline)
+        # Notifications do not carry the previous value
+        self._recorded_values = {name: getattr(self, name) for name in self.RECORDED_PROPERTIES}
+        self.connect('notify', self._on_notify)
+
+    @property
+    def path(self) -> Optional[str]:
+        return self.document.path
+
+    @path.setter
+    def path(self, path: Optional[str]):
+        self.document.path = path
+
+    def to_document(self) -> Document:
+        """
+        Returns a copy of the wrapped document holding a snapshot of the outline store,
+        that can safely be handed to another thread.
+        """
+        return self.document.copy(self.outline.get_outline())
+
+    def _on_notify(self, obj, pspec):
+        name = pspec.name.replace('-', '_')
+        if name not in self._recorded_values:
+            return
+        old, new = self._recorded_values[name], getattr(self, name)
+        self._recorded_values[name] = new
+        if old != new:
+            self.history.record(_SetProperty(self, name, old, new))
+
+
+class _SetProperty(Operation):
+
+    __slots__ = ('model', 'name', 'old', 'new')
+
+    def __init__(self, model: DocumentModel, name: str, old: Any, new: Any):
+        self.model, self.name, self.old, self.new = model, name, old, new
+
+    def undo(self):
+        setattr(self.model, self.name, self.old)
+
+    def redo(self):
+        setattr(self.model, self.name, self.new)
+
+    def size(self) -> int:
+        return self.BASE_SIZE + sum(len(v) for v in (self.old, self.new) if isinstance(v, str))
+
+    def merge(self, other: Operation) -> bool:
+        if not (isinstance(other, _SetProperty) and other.model is self.model and other.name == self.name):
+            return False
+        self.new = other.new
+        return True
 
 
 class OutlineStore(TreeStore):
+    """
+    Outline rows, with cached aggregates of each subtree (maximum page number and number of descendants),
+    so that `get_last_chapter_page` does not have to walk the subtree.
+
+    Aggregates are kept up to date from the store's own signals,
+    so that they also follow changes made outside of python (i.e. drag and drop).
+    Rows can be inserted with only the (title, page) columns.
+
+    Rows are loaded lazily from `OutlineTree`s: the children of a row are only inserted once it is expanded
+    (see `load_children()`). Until then, a single placeholder row stands for them, holding their aggregates
+    and a reference to the (never modified) source outline. Rows inserted below a row load its children first,
+    so that a placeholder never has siblings. Placeholders are skipped by `foreach()` and the traversal helpers,
+    which thus only visit loaded rows, `iter_bookmarks()` and `get_outline()` returning the whole outline.
+    They are still counted by `iter_n_children()` and `iter_has_child()`, since the view only draws an expander
+    for rows that have a child: `get_child_count()` gives the actual number of children.
+
+    If a `History` is given, insertions, removals, moves and title/page edits made through the python API
+    are recorded as operations storing only the affected paths and rows,
+    compound changes (i.e. `move_row`) being recorded as a single operation.
+    """
 
     (
         COLUMN_TITLE,
-        COLUMN_PAGE
-    ) = range(2)
+        COLUMN_PAGE,
+        # Maximum page number of the row and its descendants
+        COLUMN_MAX_PAGE,
+        # Number of descendants of the row
+        COLUMN_DESCENDANTS,
+        # (outline, maximum pages of its subtrees, index) of the node whose children a placeholder stands for,
+        # None for actual rows
+        COLUMN_SOURCE,
+    ) = range(5)
 
-    COLUMNS = (str, int)
+    COLUMNS = (str, int, int, int, object)
 
-    def __init__(self):
+    def __init__(self, history: Optional[History] = None):
         super().__init__(*self.COLUMNS)
+        self.history = history
+        # Nesting level of compound changes, whose inner changes are not recorded
+        self._compound_depth = 0
+        # Whether aggregates are being written, or maintained by the caller
+        self._updating = False
+        # Nesting level of `_deferred_aggregates()` blocks, and rows to refresh at the end of the outermost one
+        self._defer_depth = 0
+        self._stale: List[Gtk.TreeIter] = []
+        self.connect('row-inserted', self._on_row_inserted)
+        self.connect('row-changed', self._on_row_changed)
+        self.connect('row-deleted', self._on_row_deleted)
+
+    def append(self, parent, row=None):
+        self._load_parent(parent)
+        return self._record_insert(super().append(parent, self._full_row(row)))
+
+    def prepend(self, parent, row=None):
+        self._load_parent(parent)
+        return self._record_insert(super().prepend(parent, self._full_row(row)))
+
+    def insert(self, parent, position, row=None):
+        self._load_parent(parent)
+        return self._record_insert(super().insert(parent, position, self._full_row(row)))
+
+    def insert_before(self, parent, sibling, row=None):
+        self._load_parent(parent, sibling)
+        return self._record_insert(super().insert_before(parent, sibling, self._full_row(row)))
+
+    def insert_after(self, parent, sibling, row=None):
+        self._load_parent(parent, sibling)
+        return self._record_insert(super().insert_after(parent, sibling, self._full_row(row)))
+
+    def remove(self, it: Gtk.TreeIter) -> bool:
+        if not self._is_recording():
+            return super().remove(it)
+        op = _InsertRows(self, self._get_indices(it), self.get_outline(it), inserted=False)
+        removed = super().remove(it)
+        self.history.record(op)
+        return removed
+
+    def swap(self, a: Gtk.TreeIter, b: Gtk.TreeIter):
+        if not self._is_recording():
+            return super().swap(a, b)
+        op = _SwapRows(self, self._get_indices(a), self._get_indices(b))
+        super().swap(a, b)
+        self.history.record(op)
+
+    def move_before(self, it: Gtk.TreeIter, position: Optional[Gtk.TreeIter]):
+        src = self._get_move_source(it)
+        super().move_before(it, position)
+        self._record_move(src, it)
+
+    def move_after(self, it: Gtk.TreeIter, position: Optional[Gtk.TreeIter]):
+        src = self._get_move_source(it)
+        super().move_after(it, position)
+        self._record_move(src, it)
+
+    def copy_row(self, src_iter: Gtk.TreeIter, dest_path) -> Optional[Gtk.TreeIter]:
+        with self._compound(), self._deferred_aggregates():
+            # Copied rows keep the aggregates of their source, only the new parent needs a refresh
+            dest_iter = super().copy_row(src_iter, dest_path)
+            if dest_iter is not None:
+                self._mark_stale(self.iter_parent(dest_iter))
+        return self._record_insert(dest_iter)
+
+    def duplicate_row(self, src: Gtk.TreeIter) -> Optional[Gtk.TreeIter]:
+        with self._compound(), self._deferred_aggregates():
+            self._mark_stale(self.iter_parent(src))
+            dest = super().duplicate_row(src)
+        return self._record_insert(dest)
+
+    def move_row(self, src_iter: Gtk.TreeIter, dest_path) -> Optional[Gtk.TreeIter]:
+        src = self._get_move_source(src_iter)
+        with self._compound(), self._deferred_aggregates():
+            self._mark_stale(self.iter_parent(src_iter))
+            dest_iter = super().move_row(src_iter, dest_path)
+        if dest_iter is not None:
+            self._record_move(src, dest_iter)
+        return dest_iter
+
+    def move_rows(self, keys, direction: str) -> List[Gtk.TreePath]:
+        with self.group_changes(), self._deferred_aggregates():
+            return super().move_rows(keys, direction)
+
+    def move_row_right(self, src_iter: Gtk.TreeIter) -> Gtk.TreeIter:
+        # The destination is computed from the children of the previous sibling
+        prev = self.iter_previous(src_iter)
+        if prev is not None:
+            self.load_children(prev)
+        return super().move_row_right(src_iter)
+
+    def _move_run_right(self, run):
+        prev = self.iter_previous(run[0][1])
+        if prev is not None:
+            self.load_children(prev)
+        return super()._move_run_right(run)
+
+    def _move_to_parent(self, src_iter: Gtk.TreeIter, dest_path: Gtk.TreePath) -> Optional[Gtk.TreeIter]:
+        """
+        Inserts a copy of the row at `dest_path` and removes the original, without copying its descendants:
+        the copy gets a placeholder standing for them, loaded when it is expanded.
+        Called from `move_row()`, that maintains the aggregates.
+        """
+        child = self.iter_children(src_iter)
+        if child is None:
+            return super()._move_to_parent(src_iter, dest_path)
+        if self.is_placeholder(child):
+            # the children were never loaded, the placeholder moves along
+            placeholder = self._get_row_values(child)
+        else:
+            outline = OutlineTree.from_bookmarks(self.iter_bookmarks(src_iter))
+            max_pages = outline.subtree_max_pages()
+            children_max = max(max_pages[c] for c in outline.children(0))
+            placeholder = ('', 0, children_max, len(outline) - 2, (outline, max_pages, 0))
+        dest_iter = self._insert_at(dest_path, self._get_row_values(src_iter))
+        if dest_iter is None:
+            return None
+        self._updating = True
+        try:
+            super().append(dest_iter, placeholder)
+        finally:
+            self._updating = False
+        self._mark_stale(self.iter_parent(dest_iter))
+        self.remove(src_iter)
+        return dest_iter
+
+    def group_changes(self):
+        """
+        Returns a context manager recording the changes made in the block as a single undo step.
+        """
+        return self.history.group() if self.history is not None else nullcontext()
 
     def get_title(self, key: ModelKeyType):
         return self[key][self.COLUMN_TITLE]
 
     def set_title(self, key: ModelKeyType, title: str):
-        self[key][self.COLUMN_TITLE] = title
+        self._set_column(key, self.COLUMN_TITLE, title)
 
     def get_page(self, key: ModelKeyType):
         return self[key][self.COLUMN_PAGE]
 
     def set_page(self, key: ModelKeyType, page: str):
-        self[key][self.COLUMN_PAGE] = page
+        self._set_column(key, self.COLUMN_PAGE, page)
 
     def get_last_chapter_page(self, key: ModelKeyType) -> int:
-        return max(row[self.COLUMN_PAGE] for row in self.descendants(key))
+        return self[key][self.COLUMN_MAX_PAGE]
+
+    def get_descendant_count(self, key: ModelKeyType) -> int:
+        return self[key][self.COLUMN_DESCENDANTS]
+
+    def get_child_count(self, key: ModelKeyType = None) -> int:
+        """
+        Returns the number of children of the row at `key` (of top-level rows if None), whether they are loaded or not.
+        """
+        it = None if key is None else self[key].iter
+        child = self.iter_children(it)
+        if child is not None and self.is_placeholder(child):
+            outline, _, index = self.get_value(child, self.COLUMN_SOURCE)
+            return sum(1 for _ in outline.children(index))
+        return self.iter_n_children(it)
+
+    def get_outline(self, key: ModelKeyType = None) -> OutlineTree:
+        """
+        Returns a copy of the row at `key` and its descendants (of all rows if `key` is None).
+        """
+        return OutlineTree.from_bookmarks(self.iter_bookmarks(key))
+
+    def populate(self, outline: OutlineTree, parent: Optional[Gtk.TreeIter] = None, position: int = -1):
+        """
+        Inserts the top-level nodes of `outline` below `parent`, starting at `position` (at the end if negative).
+        Their descendants are inserted by `load_children()`. Populating the store is not recorded in its history.
+
+        `outline` must not be modified afterwards.
+        """
+        self._load_parent(parent)
+        self._insert_children(outline, outline.subtree_max_pages(), None, parent, position)
+        if parent is not None:
+            self._refresh(parent)
+
+    def load_children(self, it: Gtk.TreeIter):
+        """
+        Replaces the placeholder standing for the children of a row, if any, with the actual children.
+        This is meant to be called when the row is about to be expanded.
+        """
+        placeholder = self.iter_children(it)
+        if placeholder is None:
+            return
+        source = self.get_value(placeholder, self.COLUMN_SOURCE)
+        if source is None:
+            return
+        # The children are inserted before the placeholder is removed,
+        # so that the row does not look childless to the view in the meantime
+        self._insert_children(*source, it, 1)
+        self._updating = True
+        try:
+            super().remove(placeholder)
+        finally:
+            self._updating = False
+
+    def is_placeholder(self, it: Gtk.TreeIter) -> bool:
+        return self.get_value(it, self.COLUMN_SOURCE) is not None
+
+    def _is_hidden(self, it: Gtk.TreeIter) -> bool:
+        return self.is_placeholder(it)
+
+    def _is_recording(self) -> bool:
+        return self.history is not None and self.history.recording and not self._compound_depth
+
+    @contextmanager
+    def _compound(self):
+        """
+        Changes made in the block are not recorded, the caller records the compound change instead.
+        """
+        self._compound_depth += 1
+        try:
+            yield
+        finally:
+            self._compound_depth -= 1
+
+    def _get_indices(self, it: Gtk.TreeIter) -> Tuple[int, ...]:
+        return tuple(self.get_path(it).get_indices())
+
+    def _record_insert(self, it: Optional[Gtk.TreeIter]) -> Optional[Gtk.TreeIter]:
+        if it is not None and self._is_recording():
+            self.history.record(_InsertRows(self, self._get_indices(it), self.get_outline(it), inserted=True))
+        return it
+
+    def _get_move_source(self, it: Gtk.TreeIter) -> Optional[Tuple[int, ...]]:
+        return self._get_indices(it) if self._is_recording() else None
+
+    def _record_move(self, src: Optional[Tuple[int, ...]], it: Gtk.TreeIter):
+        if src is None:
+            return
+        dest = self._get_indices(it)
+        if dest != src:
+            self.history.record(_MoveRow(self, src, dest))
+
+    def _set_column(self, key: ModelKeyType, column: int, value):
+        row = self[key]
+        if not self._is_recording():
+            row[column] = value
+            return
+        old = self.get(row.iter, self.COLUMN_TITLE, self.COLUMN_PAGE)
+        row[column] = value
+        new = self.get(row.iter, self.COLUMN_TITLE, self.COLUMN_PAGE)
+        if new != old:
+            self.history.record(_SetRow(self, self._get_indices(row.iter), old, new))
+
+    def _get_loaded_iter(self, indices: Tuple[int, ...]) -> Optional[Gtk.TreeIter]:
+        """
+        Returns the row at `indices` (None for an empty path), loading the children of its ancestors.
+
+        Since placeholders have no siblings, rows have the same path as in the fully loaded tree,
+        in which recorded operations are expressed.
+        """
+        it = None
+        for index in indices:
+            if it is not None:
+                self.load_children(it)
+            it = self.iter_nth_child(it, index)
+        return it
+
+    def _insert_outline(self, indices: Tuple[int, ...], outline: OutlineTree):
+        self.populate(outline, self._get_loaded_iter(indices[:-1]), indices[-1])
+
+    def _relocate(self, src: Tuple[int, ...], dest: Tuple[int, ...]):
+        """
+        Moves the row at `src` so that it ends up at `dest`.
+        """
+        # `move_row()` takes the position to insert before, in the tree from before the move
+        before = list(dest)
+        depth = len(src) - 1
+        if len(dest) > depth and dest[:depth] == src[:depth] and dest[depth] >= src[depth]:
+            before[depth] += 1
+        dest_parent = self._get_loaded_iter(before[:-1])
+        if dest_parent is not None:
+            self.load_children(dest_parent)
+        self.move_row(self._get_loaded_iter(src), Gtk.TreePath.new_from_indices(before))
+
+    def _full_row(self, row):
+        if row is None or len(row) == len(self.COLUMNS):
+            return row
+        title, page = row
+        return title, page, page, 0, None
+
+    def _load_parent(self, parent: Optional[Gtk.TreeIter], sibling: Optional[Gtk.TreeIter] = None):
+        if sibling is not None:
+            parent = self.iter_parent(sibling)
+        if parent is not None and not self._updating:
+            self.load_children(parent)
+
+    def _insert_children(
+        self,
+        outline: OutlineTree,
+        max_pages: array,
+        index: Optional[int],
+        parent: Optional[Gtk.TreeIter],
+        position: int
+    ):
+        """
+        Inserts the children of the node at `index` (the top-level nodes if None) below `parent`, at `position`,
+        each followed by a placeholder for its own children. The aggregates of `parent` are left untouched.
+        """
+        self._updating = True
+        try:
+            for child in outline.children(index):
+                size = outline.subtree_size(child)
+                row = (outline.get_title(child), outline.get_page(child), max_pages[child], size - 1, None)
+                it = super().insert(parent, position, row)
+                if position >= 0:
+                    position += 1
+                if size > 1:
+                    children_max = max(max_pages[c] for c in outline.children(child))
+                    # The placeholder counts as one of the descendants
+                    super().append(it, ('', 0, children_max, size - 2, (outline, max_pages, child)))
+        finally:
+            self._updating = False
+
+    @contextmanager
+    def _deferred_aggregates(self):
+        """
+        Suspends aggregate updates for the rows changed in the block,
+        the parents of which must be registered with `_mark_stale()`. They are refreshed once at the end.
+        """
+        self._defer_depth += 1
+        try:
+            yield
+        finally:
+            self._defer_depth -= 1
+            if not self._defer_depth:
+                stale, self._stale = self._stale, []
+                for it in stale:
+                    self._refresh(it)
+
+    def _mark_stale(self, it: Optional[Gtk.TreeIter]):
+        if it is not None:
+            self._stale.append(it)
+
+    def _on_row_inserted(self, model, path, it):
+        if self._updating or self._defer_depth:
+            return
+        # New rows never have children yet (copied rows may carry the aggregates of their source)
+        page, max_page, count = self.get(it, self.COLUMN_PAGE, self.COLUMN_MAX_PAGE, self.COLUMN_DESCENDANTS)
+        page = page or 0
+        if (max_page, count) != (page, 0):
+            self._set_aggregates(it, page, 0)
+        self._propagate(it, None, page, 1)
+
+    def _on_row_changed(self, model, path, it):
+        if self._updating or self._defer_depth:
+            return
+        self._refresh(it)
+
+    def _on_row_deleted(self, model, path):
+        if self._updating or self._defer_depth or path.get_depth() < 2:
+            return
+        parent_path = path.copy()
+        parent_path.up()
+        self._refresh(self.get_iter(parent_path))
+
+    def _refresh(self, it: Gtk.TreeIter):
+        """
+        Recomputes the aggregates of a row from its page and the aggregates of its children,
+        then updates its ancestors.
+        """
+        old_max, old_count = self.get(it, self.COLUMN_MAX_PAGE, self.COLUMN_DESCENDANTS)
+        max_page, count = self._compute_aggregates(it)
+        if (max_page, count) == (old_max, old_count):
+            return
+        self._set_aggregates(it, max_page, count)
+        self._propagate(it, old_max, max_page, count - old_count)
+
+    def _propagate(self, it: Gtk.TreeIter, old_max: Optional[int], new_max: int, count_delta: int):
+        """
+        Updates the ancestors of a row whose maximum page went from `old_max` to `new_max` (None for a new row),
+        adding `count_delta` to their number of descendants.
+
+        Only the ancestors whose maximum came from the row need to look at their other children.
+        """
+        parent = self.iter_parent(it)
+        while parent is not None:
+            parent_max, parent_count = self.get(parent, self.COLUMN_MAX_PAGE, self.COLUMN_DESCENDANTS)
+            if new_max >= parent_max:
+                max_page = new_max
+            elif old_max is not None and old_max >= parent_max:
+                max_page, _ = self._compute_aggregates(parent)
+            else:
+                max_page = parent_max
+            count = parent_count + count_delta
+            if (max_page, count) == (parent_max, parent_count):
+                return
+            self._set_aggregates(parent, max_page, count)
+            old_max, new_max = parent_max, max_page
+            parent = self.iter_parent(parent)
+
+    def _compute_aggregates(self, it: Gtk.TreeIter) -> Tuple[int, int]:
+        max_page = self.get_value(it, self.COLUMN_PAGE) or 0
+        descendants = 0
+        child = self.iter_children(it)
+        while child is not None:
+            child_max, child_count = self.get(child, self.COLUMN_MAX_PAGE, self.COLUMN_DESCENDANTS)
+            max_page = max(max_page, child_max)
+            descendants += child_count + 1
+            child = self.iter_next(child)
+        return max_page, descendants
+
+    def _set_aggregates(self, it: Gtk.TreeIter, max_page: int, count: int):
+        self._updating = True
+        try:
+            self.set(it, (self.COLUMN_MAX_PAGE, self.COLUMN_DESCENDANTS), (max_page, count))
+        finally:
+            self._updating = False
+
+    def iter_bookmarks(self, key: ModelKeyType = None) -> Iterator[Tuple[int, str, int]]:
+        """
+        Yields a (level, title, page) tuple for each row (or the row at `key` and its descendants), in pre-order.
+        Levels are 1-indexed, relative to `key`.
+        """
+        for it, _, depth in self._walk(key):
+            title, page, source = self.get(it, self.COLUMN_TITLE, self.COLUMN_PAGE, self.COLUMN_SOURCE)
+            if source is None:
+                yield depth, title, page
+                continue
+            outline, _, index = source
+            shift = depth - outline.get_level(index) - 1
+            for level, title, page in outline.iter_bookmarks(index + 1, index + outline.subtree_size(index)):
+                yield level + shift, title, page
+
+
+class _InsertRows(Operation):
+    """
+    Insertion (or removal if `inserted` is False) of a branch, the rows of which are kept in a compact `OutlineTree`.
+    """
+
+    __slots__ = ('store', 'indices', 'outline', 'inserted')
+
+    def __init__(self, store: OutlineStore, indices: Tuple[int, ...], outline: OutlineTree, inserted: bool):
+        self.store, self.indices, self.outline, self.inserted = store, indices, outline, inserted
+
+    def undo(self):
+        self._apply(not self.inserted)
+
+    def redo(self):
+        self._apply(self.inserted)
+
+    def size(self) -> int:
+        return self.BASE_SIZE + self.outline.nbytes()
+
+    def _apply(self, insert: bool):
+        if insert:
+            self.store._insert_outline(self.indices, self.outline)
+        else:
+            self.store.remove(self.store._get_loaded_iter(self.indices))
+
+
+class _MoveRow(Operation):
+
+    __slots__ = ('store', 'src', 'dest')
+
+    def __init__(self, store: OutlineStore, src: Tuple[int, ...], dest: Tuple[int, ...]):
+        self.store, self.src, self.dest = store, src, dest
+
+    def undo(self):
+        self.store._relocate(self.dest, self.src)
+
+    def redo(self):
+        self.store._relocate(self.src, self.dest)
+
+
+class _SwapRows(Operation):
+
+    __slots__ = ('store', 'a', 'b')
+
+    def __init__(self, store: OutlineStore, a: Tuple[int, ...], b: Tuple[int, ...]):
+        self.store, self.a, self.b = store, a, b
+
+    def undo(self):
+        self.store.swap(self.store._get_loaded_iter(self.a), self.store._get_loaded_iter(self.b))
+
+    redo = undo
+
+
+class _SetRow(Operation):
+
+    __slots__ = ('store', 'indices', 'old', 'new')
+
+    def __init__(self, store: OutlineStore, indices: Tuple[int, ...], old: Tuple[str, int], new: Tuple[str, int]):
+        self.store, self.indices, self.old, self.new = store, indices, old, new
+
+    def undo(self):
+        self._apply(self.old)
+
+    def redo(self):
+        self._apply(self.new)
+
+    def size(self) -> int:
+        return self.BASE_SIZE + len(self.old[0]) + len(self.new[0])
+
+    def merge(self, other: Operation) -> bool:
+        if not (isinstance(other, _SetRow) and other.store is self.store and other.indices == self.indices):
+            return False
+        self.new = other.new
+        return True
+
+    def _apply(self, values: Tuple[str, int]):
+        it = self.store._get_loaded_iter(self.indices)
+        self.store.set(it, (self.store.COLUMN_TITLE, self.store.COLUMN_PAGE), values)
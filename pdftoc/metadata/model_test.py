@@ -0,0 +1,135 @@
+import random
+
+import gi
+gi.require_version('Gtk', '3.0')
+
+from pdftoc.metadata.model import OutlineStore
+from pdftoc.metadata.outline import OutlineTree
+from pdftoc.toc.tree_store import MOVE_DIRECTIONS
+
+
+def expected_aggregates(store: OutlineStore, it):
+    source = store.get_value(it, store.COLUMN_SOURCE)
+    if source is not None:
+        # a placeholder counts as one of the descendants
+        outline, _, index = source
+        pages = outline.pages[index + 1:index + outline.subtree_size(index)]
+        return max(pages), len(pages) - 1
+    max_page, count = store.get_page(it), 0
+    child = store.iter_children(it)
+    while child is not None:
+        child_max, child_count = expected_aggregates(store, child)
+        max_page, count = max(max_page, child_max), count + child_count + 1
+        child = store.iter_next(child)
+    return max_page, count
+
+
+def assert_aggregates(store: OutlineStore):
+    paths = []
+    store.foreach(lambda model, path, it: paths.append(path.copy()))
+    for path in paths:
+        it = store.get_iter(path)
+        actual = store.get_last_chapter_page(it), store.get_descendant_count(it)
+        assert actual == expected_aggregates(store, it), str(path)
+
+
+def count_rows(store: OutlineStore) -> int:
+    paths = []
+    store.foreach(lambda model, path, it: paths.append(path))
+    return len(paths)
+
+
+def test_populate():
+    bookmarks = [(1, 'A', 1), (2, 'B', 7), (3, 'C', 3), (1, 'D', 8)]
+    store = OutlineStore()
+    store.populate(OutlineTree.from_bookmarks(bookmarks))
+    assert list(store.iter_bookmarks()) == bookmarks
+    assert store.get_last_chapter_page('0') == 7
+    assert store.get_descendant_count('0') == 2
+    assert_aggregates(store)
+    store.load_children(store.get_iter('0'))
+    store.populate(OutlineTree.from_bookmarks([(1, 'E', 20), (2, 'F', 30)]), store.get_iter('0:0'))
+    assert store.get_last_chapter_page('0') == 30
+    assert store.get_descendant_count('0') == 4
+    assert store.get_title('0:0:1') == 'E'
+    assert_aggregates(store)
+
+
+def test_load_children_on_demand():
+    outline = OutlineTree.from_bookmarks((1 + i % 4, str(i), i) for i in range(1000))
+    store = OutlineStore()
+    store.populate(outline)
+    # only top-level rows, with a placeholder for the children of each of them
+    assert count_rows(store) == 250
+    assert store.is_placeholder(store.get_iter('0:0'))
+    assert [str(path) for path, _, _ in store.iter_preorder('0')] == ['0']
+    assert sum(1 for _ in store.descendants()) == 250
+    assert list(store.iter_bookmarks()) == list(outline.iter_bookmarks())
+
+    store.load_children(store.get_iter('1'))
+    assert store.get_title('1:0') == '5'
+    assert store.is_placeholder(store.get_iter('1:0:0'))
+    # inserting a row loads the children of its parent
+    store.append(store.get_iter('2'), ('new', 1000))
+    assert [store.get_title(path) for path in ('2:0', '2:1')] == ['9', 'new']
+    store.move_row_right(store.get_iter('4'))
+    assert store.get_title('3:1') == '16'
+    assert_aggregates(store)
+    assert len(list(store.iter_bookmarks())) == 1001
+
+
+def test_child_count_of_unloaded_rows():
+    store = OutlineStore()
+    store.populate(OutlineTree.from_bookmarks([(1, 'A', 1), (2, 'B', 2), (2, 'C', 3), (3, 'D', 4), (1, 'E', 5)]))
+    # the placeholder keeps the expander of unloaded rows
+    assert store.iter_n_children(store.get_iter('0')) == 1
+    assert [store.get_child_count(key) for key in (None, '0', '1')] == [2, 2, 0]
+    store.load_children(store.get_iter('0'))
+    assert [store.get_child_count(key) for key in ('0', '0:0', '0:1')] == [2, 0, 1]
+
+def test_aggregates_follow_edits():
+    rng = random.Random(42)
+    store = OutlineStore()
+    for _ in range(300):
+        paths = []
+        store.foreach(lambda model, path, it: paths.append(path.copy()))
+        it = store.get_iter(rng.choice(paths)) if paths else None
+        action = rng.random()
+        if it is None or action < 0.4:
+            store.append(it, ('', rng.randint(1, 100)))
+        elif action < 0.55:
+            store.insert_after(None, it, ('', rng.randint(1, 100)))
+        elif action < 0.7:
+            store.set_page(it, rng.randint(1, 100))
+        elif action < 0.85:
+            rng.choice((store.move_row_left, store.move_row_right, store.move_row_up, store.move_row_down))(it)
+        elif action < 0.88:
+            store.duplicate_row(it)
+        elif action < 0.92:
+            store.move_rows(rng.sample(paths, min(3, len(paths))), rng.choice(MOVE_DIRECTIONS))
+        else:
+            store.remove(it)
+        assert_aggregates(store)
+
+
+def test_moving_to_another_parent_does_not_copy_descendants():
+    bookmarks = [(1, 'A', 1)] + [(2 + i % 3, str(i), i + 2) for i in range(300)] + [(1, 'B', 400)]
+    store = OutlineStore()
+    store.populate(OutlineTree.from_bookmarks(bookmarks))
+    store.load_children(store.get_iter('0'))
+    store.load_children(store.get_iter('0:0'))
+    inserted = []
+    store.connect('row-inserted', lambda model, path, it: inserted.append(str(path)))
+
+    # outdent a loaded branch, then indent it back
+    it = store.move_row_left(store.get_iter('0:0'))
+    assert store.get_title(it) == '0' and str(store.get_path(it)) == '1'
+    assert store.get_descendant_count(it) == 2 and store.get_last_chapter_page(it) == 4
+    assert inserted == ['1', '1:0']
+    it = store.move_row_right(it)
+    assert str(store.get_path(it)) == '0:99'
+    assert len(inserted) == 4
+    assert_aggregates(store)
+    store.load_children(it)
+    assert [store.get_title(child.iter) for child in store[it].iterchildren()] == ['1']
+    assert list(store.iter_bookmarks()) == bookmarks[:1] + bookmarks[4:-1] + bookmarks[1:4] + bookmarks[-1:]
@@ -0,0 +1,171 @@
+"""
+Loader and writer backend working straight on the PDF file, without pdftk.
+"""
+import datetime
+import os
+import shutil
+import tempfile
+from os.path import dirname
+from typing import Iterable, List, Optional, Tuple
+
+from ..utils import copy_file_data
+from .document import Document
+from .outline import OutlineTree
+from .parser import set_info, format_date, INFO_KEYS
+from .pdf.objects import PDFError, UnsupportedPDF, Name, Ref
+from .pdf.reader import PDFReader
+from .pdf.writer import IncrementalUpdate
+
+
+# Number of outline items read between two cancellation checks
+CANCEL_CHECK_INTERVAL = 256
+
+
+class Cancelled(Exception):
+    pass
+
+
+def read_document(doc: Document, cancellable=None) -> Document:
+    """
+    Reads the info dictionary, page count and outline of `doc.path` into `doc`,
+    filling the same fields as the pdftk `dump_data_utf8` parser, except for page medias.
+    Like with pdftk, bookmarks without a destination in the document get page 0.
+
+    Raises `PDFError` for files that cannot be handled, in which case `doc` is left untouched.
+    Raises `Cancelled` if `cancellable` (i.e. a `Gio.Cancellable`) is cancelled while the outline is read.
+    """
+    with PDFReader.open(doc.path) as reader:
+        if reader.is_encrypted:
+            raise UnsupportedPDF('Encrypted documents are not supported')
+        # Read everything before touching the document, so that it is left untouched on failure.
+        info = reader.info
+        ids = reader.ids
+        num_pages = reader.num_pages
+        bookmarks = []
+        for bookmark in reader.iter_outline():
+            bookmarks.append(bookmark)
+            if cancellable is not None and not len(bookmarks) % CANCEL_CHECK_INTERVAL and cancellable.is_cancelled():
+                raise Cancelled()
+    if cancellable is not None and cancellable.is_cancelled():
+        raise Cancelled()
+
+    for key, value in info.items():
+        set_info(doc, key, value)
+    for i, pdf_id in enumerate(ids):
+        doc.unknown.append(f'PdfID{i}: {pdf_id.hex()}')
+    doc.num_pages = num_pages
+    doc.outline = OutlineTree.from_bookmarks(bookmarks)
+    return doc
+
+
+def update_document(doc: Document, dst: Optional[str] = None, in_place: bool = False) -> str:
+    """
+    Saves the info dictionary and outline of `doc` as an incremental update appended to `doc.path`,
+    so that the cost of saving depends on the size of the outline, not the size of the document.
+
+    Unless `in_place` is true, the update is appended to a copy of the original file
+    which then atomically replaces `dst`.
+
+    Returns the path of the saved file.
+    """
+    dst = dst or doc.path
+    with PDFReader.open(doc.path) as reader:
+        data = build_update(reader, doc).build()
+        size = len(reader.buf)
+
+    if in_place and os.path.exists(dst) and os.path.samefile(doc.path, dst):
+        with open(dst, 'r+b') as fp:
+            if os.fstat(fp.fileno()).st_size != size:
+                raise PDFError(f'{dst} was modified while saving')
+            fp.seek(size)
+            fp.write(data)
+        return dst
+
+    fd, tmp = tempfile.mkstemp(dir=dirname(dst))
+    try:
+        with os.fdopen(fd, 'wb') as fp, open(doc.path, 'rb') as src:
+            if copy_file_data(src, fp) != size:
+                raise PDFError(f'{doc.path} was modified while saving')
+            fp.write(data)
+        shutil.copymode(doc.path, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return dst
+
+
+def build_update(reader: PDFReader, doc: Document) -> IncrementalUpdate:
+    update = IncrementalUpdate(reader)
+    root = reader.trailer.get('Root')
+    if not isinstance(root, Ref):
+        raise UnsupportedPDF('Document catalog is not an indirect object')
+
+    update.trailer['Info'] = update.add(_build_info(reader, doc))
+
+    catalog = dict(reader.catalog)
+    outlines = _build_outline(update, doc.outline.iter_bookmarks(), reader.page_refs)
+    if outlines:
+        catalog['Outlines'] = outlines
+    else:
+        catalog.pop('Outlines', None)
+    update.replace(root, catalog)
+    return update
+
+
+def _build_info(reader: PDFReader, doc: Document) -> dict:
+    # Keep entries that are not text strings (i.e. /Trapped)
+    original = reader.resolve(reader.trailer.get('Info'))
+    info = {k: v for k, v in original.items() if k not in reader.info} if isinstance(original, dict) else {}
+    for key, attr in INFO_KEYS.items():
+        value = getattr(doc, attr)
+        if isinstance(value, datetime.datetime):
+            value = format_date(value)
+        if value:
+            info[key] = value
+    info.update(doc.infos)
+    return info
+
+
+def _build_outline(update: IncrementalUpdate, bookmarks: Iterable[Tuple[int, str, int]], page_refs: List[Ref]) -> Optional[Ref]:
+    """
+    Adds the outline dictionary and outline items to the update, returning a reference to the former.
+    """
+    root_ref = None
+    items = {}
+    children = {}
+    parents = []
+    for level, title, page in bookmarks:
+        if root_ref is None:
+            root_ref = update.allocate()
+            items[root_ref] = {'Type': Name('Outlines')}
+            children[root_ref] = []
+            parents.append(root_ref)
+        # levels can only increase one at a time
+        level = min(level, len(parents))
+        del parents[level:]
+        ref = update.allocate()
+        item = items[ref] = {'Title': title, 'Parent': parents[-1]}
+        # page 0 (or out of range) leaves the item without destination
+        if 0 < page <= len(page_refs):
+            item['Dest'] = [page_refs[page - 1], Name('Fit')]
+        children[parents[-1]].append(ref)
+        children[ref] = []
+        parents.append(ref)
+    if root_ref is None:
+        return None
+
+    for ref, kids in children.items():
+        if not kids:
+            continue
+        node = items[ref]
+        node['First'] = kids[0]
+        node['Last'] = kids[-1]
+        # The outline is open at the first level, items are closed.
+        node['Count'] = len(kids) if ref == root_ref else -len(kids)
+        for prev, next_ in zip(kids, kids[1:]):
+            items[prev]['Next'] = next_
+            items[next_]['Prev'] = prev
+    for ref, item in items.items():
+        update.replace(ref, item)
+    return root_ref
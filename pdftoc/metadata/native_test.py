@@ -0,0 +1,35 @@
+import pytest
+from gi.repository import Gio
+
+from pdftoc.metadata import native
+from pdftoc.metadata.document import Document
+from pdftoc.metadata.outline import OutlineTree
+from pdftoc.metadata.pdf.reader import PDFReader
+from pdftoc.metadata.pdf.reader_test import SAMPLE
+
+
+def test_read_document_cancelled(tmp_path):
+    path = tmp_path / 'sample.pdf'
+    path.write_bytes(SAMPLE)
+    cancellable = Gio.Cancellable()
+    cancellable.cancel()
+    doc = Document(str(path))
+    with pytest.raises(native.Cancelled):
+        native.read_document(doc, cancellable)
+    assert len(doc.outline) == 0 and not doc.infos
+    assert native.read_document(Document(str(path)), Gio.Cancellable()).num_pages == 2
+
+
+def test_update_document_to_a_copy(tmp_path):
+    src, dst = tmp_path / 'sample.pdf', tmp_path / 'updated.pdf'
+    src.write_bytes(SAMPLE)
+    doc = native.read_document(Document(str(src)))
+    doc.title = 'New title'
+    doc.outline = OutlineTree.from_bookmarks([(1, 'Only', 2), (2, 'No destination', 0)])
+    assert native.update_document(doc, str(dst), in_place=False) == str(dst)
+    assert src.read_bytes() == SAMPLE
+    data = dst.read_bytes()
+    assert data.startswith(SAMPLE) and len(data) > len(SAMPLE)
+    with PDFReader.open(str(dst)) as reader:
+        assert reader.info['Title'] == 'New title'
+        assert list(reader.iter_outline()) == [(1, 'Only', 2), (2, 'No destination', 0)]
@@ -0,0 +1,295 @@
+import struct
+from array import array
+from itertools import accumulate
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+
+# Number of nodes and size of the encoded text, at the start of `OutlineTree.to_bytes()`
+BYTES_HEADER = struct.Struct('<II')
+
+
+class OutlineTree:
+    """
+    Compact plain python outline, used to build and process outlines outside of the main thread or without Gtk.
+
+    Nodes are stored in pre-order in parallel arrays (title offsets and lengths, page numbers, levels and subtree sizes),
+    and are identified by their index in that order. Titles are slices of a single text buffer.
+    A full traversal is a linear scan of the arrays, and a subtree is the contiguous range
+    `index:index + subtree_size(index)`.
+
+    Implements the subset of the `OutlineStore` API used by the parser:
+    nodes must be appended in pre-order, below the last node or one of its ancestors.
+    """
+
+    __slots__ = (
+        'title_offsets', 'title_lengths', 'pages', 'levels', 'sizes',
+        '_text', '_pending', '_text_size', '_garbage', '_open',
+    )
+
+    def __init__(self):
+        self.title_offsets = array('Q')
+        self.title_lengths = array('I')
+        self.pages = array('I')
+        # 1-indexed
+        self.levels = array('H')
+        # Number of nodes in the subtree rooted at each node, including the node itself
+        self.sizes = array('I')
+        self._text = ''
+        # Titles appended since the text buffer was last joined
+        self._pending: List[str] = []
+        self._text_size = 0
+        # Number of characters of the text buffer that are no longer referenced
+        self._garbage = 0
+        # Indices of the last node and its ancestors, by level. None if it must be recomputed.
+        self._open: Optional[List[int]] = []
+
+    @classmethod
+    def from_bookmarks(cls, bookmarks: Iterable[Tuple[int, str, int]]) -> 'OutlineTree':
+        """
+        Builds an outline from (level, title, page) tuples in pre-order, i.e. from `OutlineStore.iter_bookmarks()`.
+        """
+        outline = cls()
+        for level, title, page in bookmarks:
+            outline._append(level, title, page)
+        return outline
+
+    def __len__(self):
+        return len(self.levels)
+
+    def nbytes(self) -> int:
+        """
+        Approximate memory used by the nodes and the text buffer, in bytes.
+        """
+        arrays = (self.title_offsets, self.title_lengths, self.pages, self.levels, self.sizes)
+        return sum(a.itemsize * len(a) for a in arrays) + self._text_size
+
+    def to_bytes(self) -> bytes:
+        """
+        Returns the arrays and titles of the outline in a compact binary form, read by `from_bytes()`.
+        Arrays are stored in native byte order, so the output is not portable between platforms.
+        """
+        text = ''.join(title for _, title, _ in self.iter_bookmarks()).encode('utf8')
+        return b''.join((
+            BYTES_HEADER.pack(len(self), len(text)),
+            self.title_lengths.tobytes(),
+            self.pages.tobytes(),
+            self.levels.tobytes(),
+            self.sizes.tobytes(),
+            text,
+        ))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'OutlineTree':
+        """
+        Rebuilds an outline from the output of `to_bytes()`. Raises ValueError if `data` is invalid.
+        """
+        outline = cls()
+        try:
+            count, text_size = BYTES_HEADER.unpack_from(data)
+        except struct.error as err:
+            raise ValueError(err) from None
+        offset = BYTES_HEADER.size
+        for values in (outline.title_lengths, outline.pages, outline.levels, outline.sizes):
+            end = offset + count * values.itemsize
+            values.frombytes(data[offset:end])
+            offset = end
+        if len(outline.sizes) != count or len(data) != offset + text_size:
+            raise ValueError('Truncated outline data')
+        text = data[offset:].decode('utf8')
+        offsets = array('Q', accumulate(outline.title_lengths))
+        if len(text) != (offsets[-1] if offsets else 0):
+            raise ValueError('Outline titles do not match their lengths')
+        offsets.insert(0, 0)
+        offsets.pop()
+        outline.title_offsets = offsets
+        outline._text = text
+        outline._text_size = len(text)
+        outline._open = None
+        return outline
+
+    def append(self, parent: Optional[int], row: Tuple[str, int]) -> int:
+        level = 1 if parent is None else self.levels[parent] + 1
+        open_ = self._get_open()
+        if parent is not None and (level - 2 >= len(open_) or open_[level - 2] != parent):
+            raise ValueError(f'Node {parent} is neither the last node nor one of its ancestors')
+        return self._append(level, *row)
+
+    def get_title(self, index: int) -> str:
+        start = self.title_offsets[index]
+        end = start + self.title_lengths[index]
+        if end > len(self._text):
+            self._join_text()
+        return self._text[start:end]
+
+    def set_title(self, index: int, title: str):
+        self._garbage += self.title_lengths[index]
+        self.title_offsets[index] = self._store_text(title)
+        self.title_lengths[index] = len(title)
+        self._maybe_compact()
+
+    def get_page(self, index: int) -> int:
+        return self.pages[index]
+
+    def set_page(self, index: int, page: int):
+        self.pages[index] = page
+
+    def get_level(self, index: int) -> int:
+        return self.levels[index]
+
+    def subtree_size(self, index: int) -> int:
+        return self.sizes[index]
+
+    def subtree_max_pages(self) -> array:
+        """
+        Returns the maximum page number of each subtree, in a single pass.
+        """
+        max_pages = array('I', self.pages)
+        open_ = []
+        for i, level in enumerate(self.levels):
+            del open_[level - 1:]
+            page = max_pages[i]
+            for ancestor in open_:
+                if max_pages[ancestor] < page:
+                    max_pages[ancestor] = page
+            open_.append(i)
+        return max_pages
+
+    def children(self, parent: Optional[int] = None) -> Iterator[int]:
+        if parent is None:
+            index, end = 0, len(self)
+        else:
+            index, end = parent + 1, parent + self.sizes[parent]
+        while index < end:
+            yield index
+            index += self.sizes[index]
+
+    def parent(self, index: int) -> Optional[int]:
+        level = self.levels[index]
+        for i in range(index - 1, -1, -1):
+            if self.levels[i] < level:
+                return i
+        return None
+
+    def ancestors(self, index: int) -> List[int]:
+        """
+        Returns the indices of the ancestors of a node, from the root down.
+        """
+        ancestors = []
+        level = self.levels[index]
+        for i in range(index - 1, -1, -1):
+            if self.levels[i] < level:
+                ancestors.append(i)
+                level = self.levels[i]
+                if level == 1:
+                    break
+        ancestors.reverse()
+        return ancestors
+
+    def iter_bookmarks(self, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, str, int]]:
+        """
+        Yields a (level, title, page) tuple for each node (or each node in the `start:end` range), in pre-order.
+        """
+        self._join_text()
+        text = self._text
+        offsets, lengths, pages, levels = self.title_offsets, self.title_lengths, self.pages, self.levels
+        for i in range(start, len(self) if end is None else end):
+            offset = offsets[i]
+            yield levels[i], text[offset:offset + lengths[i]], pages[i]
+
+    def subtree(self, index: int) -> 'OutlineTree':
+        """
+        Returns a copy of the subtree rooted at `index`, with its root at level 1.
+        """
+        shift = self.levels[index] - 1
+        end = index + self.sizes[index]
+        return OutlineTree.from_bookmarks(
+            (level - shift, title, page) for level, title, page in self.iter_bookmarks(index, end)
+        )
+
+    def insert(self, index: int, parent: Optional[int], subtree: 'OutlineTree'):
+        """
+        Inserts the top-level nodes of `subtree` as children of `parent`, starting at pre-order position `index`,
+        which must be the position of a child of `parent` or the end of its subtree.
+        """
+        if not len(subtree):
+            return
+        level = 1 if parent is None else self.levels[parent] + 1
+        if parent is not None and not parent < index <= parent + self.sizes[parent]:
+            raise ValueError(f'Position {index} is not inside node {parent}')
+        subtree._join_text()
+        offset = self._store_text(subtree._text)
+        count = len(subtree)
+        self.title_offsets[index:index] = array('Q', (o + offset for o in subtree.title_offsets))
+        self.title_lengths[index:index] = subtree.title_lengths
+        self.pages[index:index] = subtree.pages
+        self.levels[index:index] = array('H', (lv + level - 1 for lv in subtree.levels))
+        self.sizes[index:index] = subtree.sizes
+        self._garbage += subtree._garbage
+        for ancestor in ([] if parent is None else self.ancestors(parent) + [parent]):
+            self.sizes[ancestor] += count
+        self._open = None
+
+    def remove(self, index: int):
+        """
+        Removes the node at `index` and its descendants.
+        """
+        count = self.sizes[index]
+        for ancestor in self.ancestors(index):
+            self.sizes[ancestor] -= count
+        end = index + count
+        self._garbage += sum(self.title_lengths[index:end])
+        for values in (self.title_offsets, self.title_lengths, self.pages, self.levels, self.sizes):
+            del values[index:end]
+        self._open = None
+        self._maybe_compact()
+
+    def _append(self, level: int, title: str, page: int) -> int:
+        open_ = self._get_open()
+        # levels can only increase one at a time
+        level = min(level, len(open_) + 1)
+        del open_[level - 1:]
+        for ancestor in open_:
+            self.sizes[ancestor] += 1
+        index = len(self)
+        self.title_offsets.append(self._store_text(title))
+        self.title_lengths.append(len(title))
+        self.pages.append(page)
+        self.levels.append(level)
+        self.sizes.append(1)
+        open_.append(index)
+        return index
+
+    def _get_open(self) -> List[int]:
+        if self._open is None:
+            last = len(self) - 1
+            self._open = self.ancestors(last) + [last] if last >= 0 else []
+        return self._open
+
+    def _store_text(self, text: str) -> int:
+        offset = self._text_size
+        self._pending.append(text)
+        self._text_size += len(text)
+        return offset
+
+    def _join_text(self):
+        if self._pending:
+            self._text = ''.join((self._text, *self._pending))
+            self._pending.clear()
+
+    def _maybe_compact(self):
+        """
+        Rebuilds the text buffer once most of it is made of replaced or removed titles.
+        """
+        if self._garbage <= self._text_size // 2:
+            return
+        self._join_text()
+        text = self._text
+        parts = []
+        offset = 0
+        for i, (start, length) in enumerate(zip(self.title_offsets, self.title_lengths)):
+            parts.append(text[start:start + length])
+            self.title_offsets[i] = offset
+            offset += length
+        self._text = ''.join(parts)
+        self._text_size = offset
+        self._garbage = 0
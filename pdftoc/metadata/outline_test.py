@@ -0,0 +1,69 @@
+import pytest
+
+from pdftoc.metadata.outline import OutlineTree
+
+
+BOOKMARKS = [
+    (1, 'Chapter 1', 1),
+    (2, 'Section 1.1', 2),
+    (3, 'Section 1.1.1', 3),
+    (2, 'Section 1.2', 4),
+    (1, 'Chapter 2', 5),
+]
+
+
+def test_append_in_pre_order():
+    outline = OutlineTree()
+    chapter = outline.append(None, ('Chapter 1', 1))
+    section = outline.append(chapter, ('Section 1.1', 2))
+    outline.append(section, ('Section 1.1.1', 3))
+    outline.append(chapter, ('Section 1.2', 4))
+    outline.append(None, ('Chapter 2', 5))
+    assert list(outline.iter_bookmarks()) == BOOKMARKS
+    assert list(outline.sizes) == [4, 2, 1, 1, 1]
+    assert list(outline.children()) == [0, 4]
+    assert list(outline.children(0)) == [1, 3]
+    assert outline.parent(3) == 0
+    assert outline.ancestors(2) == [0, 1]
+    with pytest.raises(ValueError):
+        outline.append(section, ('Too late', 6))
+
+
+def test_from_bookmarks_normalizes_levels():
+    outline = OutlineTree.from_bookmarks([(1, 'A', 1), (3, 'B', 2), (2, 'C', 3)])
+    assert list(outline.iter_bookmarks()) == [(1, 'A', 1), (2, 'B', 2), (2, 'C', 3)]
+
+
+def test_edit_subtrees():
+    outline = OutlineTree.from_bookmarks(BOOKMARKS)
+    subtree = outline.subtree(1)
+    assert list(subtree.iter_bookmarks()) == [(1, 'Section 1.1', 2), (2, 'Section 1.1.1', 3)]
+
+    outline.remove(1)
+    assert list(outline.iter_bookmarks()) == [(1, 'Chapter 1', 1), (2, 'Section 1.2', 4), (1, 'Chapter 2', 5)]
+    assert list(outline.sizes) == [2, 1, 1]
+
+    # move Section 1.1 below Chapter 2
+    outline.insert(3, 2, subtree)
+    assert list(outline.iter_bookmarks())[2:] == [(1, 'Chapter 2', 5), (2, 'Section 1.1', 2), (3, 'Section 1.1.1', 3)]
+    assert list(outline.sizes) == [2, 1, 3, 2, 1]
+
+    for i in range(len(outline)):
+        outline.set_title(i, outline.get_title(i).upper())
+    assert outline.get_title(4) == 'SECTION 1.1.1'
+    outline.append(4, ('Appended', 6))
+    assert list(outline.sizes) == [2, 1, 4, 3, 2, 1]
+
+
+def test_bytes_round_trip():
+    outline = OutlineTree.from_bookmarks(BOOKMARKS)
+    outline.set_title(1, 'Séction 1.1')
+    outline.remove(3)
+    copy = OutlineTree.from_bytes(outline.to_bytes())
+    assert list(copy.iter_bookmarks()) == list(outline.iter_bookmarks())
+    assert list(copy.sizes) == list(outline.sizes)
+    copy.append(3, ('Section 2.1', 6))
+    assert copy.get_title(4) == 'Section 2.1' and copy.get_level(4) == 2
+    assert list(OutlineTree.from_bytes(OutlineTree().to_bytes()).iter_bookmarks()) == []
+    with pytest.raises(ValueError):
+        OutlineTree.from_bytes(outline.to_bytes()[:-1])
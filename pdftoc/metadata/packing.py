@@ -0,0 +1,76 @@
+"""
+Compact binary form of a parsed `Document`, used by the metadata cache and the worker protocol.
+"""
+import datetime
+import json
+import struct
+import sys
+
+from .document import Document
+from .outline import OutlineTree
+
+
+# Magic number (including the format version), byte order of the outline arrays and size of the JSON header
+HEADER = struct.Struct('<8sBI')
+MAGIC = b'PDFTOC\x00\x01'
+BYTE_ORDERS = {'little': 0, 'big': 1}
+DATE_FIELDS = ('creation_date', 'modification_date')
+FIELDS = (
+    'path', 'num_pages', 'title', 'subject', 'author', 'creator', 'creation_date', 'modification_date', 'producer',
+    'page_medias', 'infos', 'unknown',
+)
+
+
+def pack_document(doc: Document, **extra) -> bytes:
+    """
+    Returns the fields and outline of `doc`, along with the JSON serializable `extra` values.
+    Raises TypeError or ValueError if a field cannot be serialized.
+    """
+    header = {name: getattr(doc, name) for name in FIELDS}
+    for name in DATE_FIELDS:
+        if header[name]:
+            header[name] = header[name].isoformat()
+    header.update(extra)
+    header = json.dumps(header, separators=(',', ':')).encode('utf8')
+    return b''.join((
+        HEADER.pack(MAGIC, BYTE_ORDERS[sys.byteorder], len(header)),
+        header,
+        doc.outline.to_bytes(),
+    ))
+
+
+def unpack_header(data: bytes) -> dict:
+    """
+    Returns the fields and extra values of a packed document, without decoding its outline.
+    Raises ValueError if `data` is invalid.
+    """
+    try:
+        magic, byte_order, size = HEADER.unpack_from(data)
+    except struct.error as err:
+        raise ValueError(err) from None
+    if magic != MAGIC or byte_order != BYTE_ORDERS[sys.byteorder]:
+        raise ValueError('Unsupported document data')
+    header = json.loads(data[HEADER.size:HEADER.size + size])
+    if not isinstance(header, dict) or not all(name in header for name in FIELDS):
+        raise ValueError('Invalid document header')
+    return header
+
+
+def unpack_document(data: bytes, doc: Document, header: dict = None) -> Document:
+    """
+    Fills `doc` from the output of `pack_document()`, except for its path.
+    `header` is the result of `unpack_header(data)`, if already known.
+    Raises ValueError if `data` is invalid, in which case `doc` is left untouched.
+    """
+    if header is None:
+        header = unpack_header(data)
+    start = HEADER.size + HEADER.unpack_from(data)[2]
+    outline = OutlineTree.from_bytes(data[start:])
+    fields = {name: header[name] for name in FIELDS if name != 'path'}
+    for name in DATE_FIELDS:
+        if fields[name]:
+            fields[name] = datetime.datetime.fromisoformat(fields[name])
+    for name, value in fields.items():
+        setattr(doc, name, value)
+    doc.outline = outline
+    return doc
@@ -1,9 +1,10 @@
+import io
 import re
 import datetime
-from typing import Optional, Iterable, Tuple
+from typing import Optional, Iterable, Iterator, Tuple, Union, TextIO
 
-from .model import Document
 from ..utils import local_timezone
+from .document import Document
 
 
 PDFTK_DATE_RE = re.compile(r'''
@@ -17,7 +18,7 @@ PDFTK_DATE_RE = re.compile(r'''
     (?P<sec>   \d{2})
     (?:
         (?P<tzh> [+-]\d{2}) '(?P<tzm> \d{2})'
-        | Z
+        | (?P<utc> Z)
     )?
 $
 ''', re.X)
@@ -46,23 +47,109 @@ class EOF(Exception):
     pass
 
 
+def parse_info_value(value: str):
+    m = PDFTK_DATE_RE.match(value)
+    if m:
+        tz = local_timezone()
+        if m.group('utc'):
+            tz = datetime.timezone.utc
+        elif m.group('tzh'):
+            hours = int(m.group('tzh'))
+            # the minutes have the same sign as the hours
+            minutes = -int(m.group('tzm')) if m.group('tzh').startswith('-') else int(m.group('tzm'))
+            tz = datetime.timezone(datetime.timedelta(hours=hours, minutes=minutes))
+        return datetime.datetime(
+            int(m.group('year')),
+            int(m.group('month')),
+            int(m.group('day')),
+            hour=int(m.group('hour')),
+            minute=int(m.group('min')),
+            second=int(m.group('sec')),
+            tzinfo=tz
+        )
+
+    return value
+
+
+def format_date(date: datetime.datetime) -> str:
+    """
+    Formats a date like pdftk does, the reverse of `parse_info_value`.
+    """
+    value = date.strftime('D:%Y%m%d%H%M%S')
+    offset = date.utcoffset()
+    if offset is None:
+        return value
+    minutes = int(offset.total_seconds()) // 60
+    sign = '-' if minutes < 0 else '+'
+    hours, minutes = divmod(abs(minutes), 60)
+    return f"{value}{sign}{hours:02d}'{minutes:02d}'"
+
+
+def set_info(doc: Document, key: str, value: str):
+    """
+    Stores an info dictionary entry either as a document property or in `doc.infos`.
+    """
+    if key in INFO_KEYS:
+        setattr(doc, INFO_KEYS[key], parse_info_value(value))
+    else:
+        doc.infos[key] = value
+
+
+def iter_lines(source: Union[str, Iterable[str], Iterable[bytes], TextIO]) -> Iterator[str]:
+    """
+    Lazily yields the lines of `source` without their line terminators.
+
+    `source` can be a string, a (text or binary) file-like object such as a subprocess pipe,
+    or any iterable of lines.
+    """
+    if isinstance(source, str):
+        source = io.StringIO(source)
+    for line in source:
+        if isinstance(line, bytes):
+            line = line.decode('utf8')
+        yield line.rstrip('\r\n')
+
+
 class BookmarkParsingState:
     def __init__(self):
         self.previous = None
         self.stack = []
+        self.count = 0
 
 
 class Parser:
 
-    def __init__(self):
-        self.lines: list = []
-        self.curline: int = -1
-        self.num_lines: int = 0
-
-    def parse(self, text: str, doc: Document) -> Document:
-        self.lines = text.splitlines()
-        self.curline = -1
-        self.num_lines = len(self.lines)
+    def __init__(self, outline=None):
+        """
+        If `outline` is given (i.e. an `OutlineStore`), bookmarks are appended to it
+        instead of the document's outline.
+        """
+        self.outline = outline
+        self.lines: Iterator[str] = iter(())
+        self.current: Optional[str] = None
+        self.lookahead: Optional[str] = None
+
+    def parse(self, source: Union[str, Iterable[str], TextIO], doc: Document) -> Document:
+        """
+        Parses pdftk `dump_data_utf8` output into `doc`.
+
+        The input is consumed line by line with a single line of lookahead,
+        so `source` can be a pipe or file object that is never fully read into memory.
+        """
+        for _ in self.iter_parse(source, doc):
+            pass
+        return doc
+
+    def iter_parse(self, source: Union[str, Iterable[str], TextIO], doc: Document) -> Iterator[int]:
+        """
+        Incremental version of `parse`.
+
+        Parses one record each time the generator is advanced,
+        and yields the number of bookmarks added to the outline so far.
+        """
+        self.lines = iter_lines(source)
+        self.current = None
+        self.lookahead = None
         state = BookmarkParsingState()
         while True:
             try:
@@ -80,16 +167,12 @@ class Parser:
                 self._parse_page_media(doc)
             else:
                 doc.unknown.append(line)
-
-        return doc
+            yield state.count
 
     def _parse_info(self, doc: Document):
         key = self._next_value('InfoKey')
         value = self._next_value('InfoValue')
-        if key in INFO_KEYS:
-            setattr(doc, INFO_KEYS[key], self._parse_info_value(value))
-        else:
-            doc.infos[key] = value
+        set_info(doc, key, value)
 
     def _parse_bookmark(self, doc: Document, state: BookmarkParsingState):
         stack, prev = state.stack, state.previous
@@ -108,7 +191,8 @@ class Parser:
                 page = int(v)
             elif k == 'BookmarkLevel':
                 level = int(v)
-        if not title or not page or not level:
+        # Empty titles are valid, and page 0 stands for a bookmark without destination
+        if title is None or page is None or not level or level < 1:
             raise ParseError('Invalid Bookmark')
         if not prev:
             pass
@@ -122,8 +206,10 @@ class Parser:
         if level > 1:
             # level is 1-indexed
             parent = stack[level - 1 - 1]
-        it = doc.outline.append(parent, row=(title, page))
+        outline = doc.outline if self.outline is None else self.outline
+        it = outline.append(parent, row=(title, page))
         state.previous = {'iter': it, 'level': level}
+        state.count += 1
 
     def _parse_page_media(self, doc: Document):
         media = {}
@@ -139,21 +225,21 @@ class Parser:
             media[k] = v
         doc.page_medias.append(media)
 
-    def _advance(self, n: int = 1):
-        self.curline += n
-
-    def _recede(self, n: int = 1):
-        self.curline -= n
+    def _recede(self):
+        """
+        Pushes back the current line so that the next call to `_next` returns it again.
+        """
+        self.lookahead = self.current
 
-    def _current(self) -> str:
+    def _next(self) -> str:
+        if self.lookahead is not None:
+            self.current, self.lookahead = self.lookahead, None
+            return self.current
         try:
-            return self.lines[self.curline]
-        except IndexError:
+            self.current = next(self.lines)
+        except StopIteration:
             raise EOF()
-
-    def _next(self) -> str:
-        self._advance()
-        return self._current()
+        return self.current
 
     def _next_pair(self, valid_keys: Optional[Iterable[str]] = None) -> Tuple[str, str]:
         line = self._next()
@@ -173,23 +259,3 @@ class Parser:
             return k.strip(), v.strip()
         except ValueError:
             raise ParseError('Expected key-value pair, got <{}>'.format(string))
-
-    def _parse_info_value(self, value: str):
-        m = PDFTK_DATE_RE.match(value)
-        if m:
-            tz = local_timezone()
-            if m.group('tzh'):
-                hours = int(m.group('tzh'))
-                minutes = int(m.group('tzm'))
-                tz = datetime.timezone(datetime.timedelta(hours=hours, minutes=minutes))
-            return datetime.datetime(
-                int(m.group('year')),
-                int(m.group('month')),
-                int(m.group('day')),
-                hour=int(m.group('hour')),
-                minute=int(m.group('min')),
-                second=int(m.group('sec')),
-                tzinfo=tz
-            )
-
-        return value
@@ -0,0 +1,92 @@
+import datetime
+import io
+import time
+
+from pdftoc.metadata.document import Document
+from pdftoc.metadata.outline import OutlineTree
+from pdftoc.metadata.parser import Parser, format_date, parse_info_value
+from pdftoc.metadata.serializer import Serializer
+
+
+DUMP = '''\
+InfoBegin
+InfoKey: Title
+InfoValue: A Book
+InfoBegin
+InfoKey: Custom
+InfoValue: Value: with colon
+PdfID0: 8b7a6f
+NumberOfPages: 12
+BookmarkBegin
+BookmarkTitle: Chapter 1
+BookmarkLevel: 1
+BookmarkPageNumber: 1
+BookmarkBegin
+BookmarkTitle: Section 1.1
+BookmarkLevel: 2
+BookmarkPageNumber: 2
+BookmarkBegin
+BookmarkTitle: Section 1.1.1
+BookmarkLevel: 3
+BookmarkPageNumber: 3
+BookmarkBegin
+BookmarkTitle: Chapter 2
+BookmarkLevel: 1
+BookmarkPageNumber: 5
+PageMediaBegin
+PageMediaNumber: 1
+PageMediaRotation: 0
+PageMediaRect: 0 0 612 792
+PageMediaDimensions: 612 792
+'''
+
+
+def summarize(doc: Document):
+    outline = list(doc.outline.iter_bookmarks())
+    return doc.title, doc.num_pages, doc.infos, doc.unknown, doc.page_medias, outline
+
+
+def test_parse_string():
+    doc = Parser().parse(DUMP, Document())
+    assert doc.title == 'A Book'
+    assert doc.num_pages == 12
+    assert doc.infos == {'Custom': 'Value: with colon'}
+    assert doc.unknown == ['PdfID0: 8b7a6f']
+    assert doc.page_medias == [{'number': '1', 'rotation': '0', 'rect': '0 0 612 792', 'dimensions': '612 792'}]
+    assert summarize(doc)[-1] == [
+        (1, 'Chapter 1', 1),
+        (2, 'Section 1.1', 2),
+        (3, 'Section 1.1.1', 3),
+        (1, 'Chapter 2', 5),
+    ]
+
+
+def test_parse_streams_produce_the_same_document():
+    expected = summarize(Parser().parse(DUMP, Document()))
+    for source in (
+        io.StringIO(DUMP),
+        io.BytesIO(DUMP.encode('utf8')),
+        iter(DUMP.replace('\n', '\r\n').splitlines(keepends=True)),
+    ):
+        assert summarize(Parser().parse(source, Document())) == expected
+
+
+def test_bookmarks_without_destination_or_title_round_trip():
+    doc = Document()
+    doc.num_pages = 3
+    doc.outline = OutlineTree.from_bookmarks([(1, 'No destination', 0), (2, '', 2), (1, 'Last', 3)])
+    parsed = Parser().parse(Serializer().serialize(doc), Document())
+    assert list(parsed.outline.iter_bookmarks()) == [(1, 'No destination', 0), (2, '', 2), (1, 'Last', 3)]
+
+
+def test_utc_dates_keep_their_timezone(monkeypatch):
+    monkeypatch.setenv('TZ', 'Europe/Paris')
+    time.tzset()
+    try:
+        date = parse_info_value('D:20200101120000Z')
+        assert date == datetime.datetime(2020, 1, 1, 12, tzinfo=datetime.timezone.utc)
+        assert date.utcoffset() == datetime.timedelta(0)
+        assert format_date(date) == "D:20200101120000+00'00'"
+    finally:
+        monkeypatch.undo()
+        time.tzset()
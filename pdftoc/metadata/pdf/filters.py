@@ -0,0 +1,70 @@
+import zlib
+
+from .objects import UnsupportedPDF
+
+
+FLATE_FILTERS = ('FlateDecode', 'Fl')
+
+
+def decode(data: bytes, filters, parms) -> bytes:
+    """
+    Applies the stream filters `filters` (a name, a list of names or None)
+    with their respective decode parameters `parms`.
+    """
+    if not filters:
+        return data
+    if not isinstance(filters, list):
+        filters = [filters]
+    if not isinstance(parms, list):
+        parms = [parms] * len(filters)
+    for name, params in zip(filters, parms):
+        if name not in FLATE_FILTERS:
+            raise UnsupportedPDF(f'Unsupported stream filter: {name}')
+        # Don't choke on streams with trailing garbage or a missing end marker.
+        data = zlib.decompressobj().decompress(data)
+        if params and params.get('Predictor', 1) > 1:
+            data = apply_predictor(data, params)
+    return data
+
+
+def apply_predictor(data: bytes, params) -> bytes:
+    predictor = params.get('Predictor', 1)
+    if predictor < 10:
+        raise UnsupportedPDF(f'Unsupported predictor: {predictor}')
+    colors = params.get('Colors', 1)
+    bpc = params.get('BitsPerComponent', 8)
+    columns = params.get('Columns', 1)
+    bpp = max(1, colors * bpc // 8)
+    row_length = (colors * bpc * columns + 7) // 8
+    out = bytearray()
+    prev = bytearray(row_length)
+    for start in range(0, len(data), row_length + 1):
+        filter_type = data[start]
+        row = bytearray(data[start + 1:start + 1 + row_length])
+        if filter_type == 1:
+            for i in range(bpp, len(row)):
+                row[i] = (row[i] + row[i - bpp]) & 0xFF
+        elif filter_type == 2:
+            for i in range(len(row)):
+                row[i] = (row[i] + prev[i]) & 0xFF
+        elif filter_type == 3:
+            for i in range(len(row)):
+                left = row[i - bpp] if i >= bpp else 0
+                row[i] = (row[i] + ((left + prev[i]) >> 1)) & 0xFF
+        elif filter_type == 4:
+            for i in range(len(row)):
+                a = row[i - bpp] if i >= bpp else 0
+                b = prev[i]
+                c = prev[i - bpp] if i >= bpp else 0
+                p = a + b - c
+                pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+                if pa <= pb and pa <= pc:
+                    pred = a
+                elif pb <= pc:
+                    pred = b
+                else:
+                    pred = c
+                row[i] = (row[i] + pred) & 0xFF
+        out += row
+        prev = row
+    return bytes(out)
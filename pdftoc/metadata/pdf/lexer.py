@@ -0,0 +1,213 @@
+import re
+from typing import Any, Callable, Optional, Tuple
+
+from .objects import PDFError, Name, Keyword, Ref, Stream
+
+
+WHITESPACE_RE = re.compile(rb'(?:[\x00\t\n\x0c\r ]+|%[^\r\n]*)*')
+NUMBER_RE = re.compile(rb'[+-]?(?:\d+\.?\d*|\.\d+)')
+REGULAR_RE = re.compile(rb'[^\x00\t\n\x0c\r ()<>\[\]{}/%]*')
+REF_TAIL_RE = re.compile(rb'[\x00\t\n\x0c\r ]+(\d+)[\x00\t\n\x0c\r ]+R(?![^\x00\t\n\x0c\r ()<>\[\]{}/%])')
+INDIRECT_RE = re.compile(rb'[\x00\t\n\x0c\r ]*(\d+)[\x00\t\n\x0c\r ]+(\d+)[\x00\t\n\x0c\r ]+obj')
+STREAM_RE = re.compile(rb'stream(?:\r\n|\n|\r)?')
+LITERAL_SPECIAL_RE = re.compile(rb'[()\\]')
+OCTAL_RE = re.compile(rb'[0-7]{1,3}')
+HEX_STRING_RE = re.compile(rb'<([0-9A-Fa-f\x00\t\n\x0c\r ]*)>')
+NAME_ESCAPE_RE = re.compile(rb'#([0-9A-Fa-f]{2})')
+
+ESCAPES = {
+    b'n': b'\n',
+    b'r': b'\r',
+    b't': b'\t',
+    b'b': b'\b',
+    b'f': b'\f',
+    b'(': b'(',
+    b')': b')',
+    b'\\': b'\\',
+}
+
+KEYWORDS = {
+    b'true': True,
+    b'false': False,
+    b'null': None,
+}
+
+Resolver = Callable[[Any], Any]
+
+
+class ObjectParser:
+    """
+    Parses PDF objects from a bytes-like buffer (bytes, memoryview, mmap...), starting at a given offset.
+
+    Strings are returned as `bytes`, names as `Name`, dictionaries as `dict` and arrays as `list`.
+    """
+
+    def __init__(self, buf, resolve: Optional[Resolver] = None):
+        self.buf = buf
+        # Used to resolve indirect stream lengths
+        self.resolve = resolve or (lambda obj: obj)
+
+    def parse_indirect(self, pos: int) -> Tuple[Ref, Any]:
+        """
+        Parses the indirect object (`<num> <gen> obj ... endobj`) starting at `pos`.
+        """
+        m = INDIRECT_RE.match(self.buf, pos)
+        if not m:
+            raise PDFError(f'Expected an indirect object at offset {pos}')
+        ref = Ref(int(m.group(1)), int(m.group(2)))
+        obj, pos = self.parse(m.end())
+        if isinstance(obj, dict):
+            pos = self.skip_whitespace(pos)
+            m = STREAM_RE.match(self.buf, pos)
+            if m:
+                obj = self._parse_stream_data(obj, m.end())
+        return ref, obj
+
+    def parse(self, pos: int) -> Tuple[Any, int]:
+        """
+        Parses the direct object at `pos`, returning it along with the offset following it.
+        """
+        buf = self.buf
+        pos = self.skip_whitespace(pos)
+        c = buf[pos:pos + 1]
+        if not c:
+            raise PDFError('Unexpected end of data')
+        if c == b'/':
+            return self._parse_name(pos + 1)
+        if c == b'(':
+            return self._parse_literal_string(pos + 1)
+        if c == b'<':
+            if buf[pos + 1:pos + 2] == b'<':
+                return self._parse_dict(pos + 2)
+            return self._parse_hex_string(pos)
+        if c == b'[':
+            return self._parse_array(pos + 1)
+        if c in b'+-.0123456789':
+            return self._parse_number(pos)
+        m = REGULAR_RE.match(buf, pos)
+        token = bytes(m.group())
+        if token in KEYWORDS:
+            return KEYWORDS[token], m.end()
+        if not token:
+            raise PDFError(f'Unexpected delimiter {c!r} at offset {pos}')
+        return Keyword(token.decode('latin-1')), m.end()
+
+    def skip_whitespace(self, pos: int) -> int:
+        return WHITESPACE_RE.match(self.buf, pos).end()
+
+    def _parse_number(self, pos: int) -> Tuple[Any, int]:
+        m = NUMBER_RE.match(self.buf, pos)
+        if not m:
+            raise PDFError(f'Invalid number at offset {pos}')
+        token = m.group()
+        if b'.' in token:
+            return float(token), m.end()
+        num = int(token)
+        # An unsigned integer might be the start of an indirect reference (`<num> <gen> R`)
+        if token[0] not in b'+-':
+            ref = REF_TAIL_RE.match(self.buf, m.end())
+            if ref:
+                return Ref(num, int(ref.group(1))), ref.end()
+        return num, m.end()
+
+    def _parse_name(self, pos: int) -> Tuple[Name, int]:
+        m = REGULAR_RE.match(self.buf, pos)
+        raw = bytes(m.group())
+        if b'#' in raw:
+            raw = NAME_ESCAPE_RE.sub(lambda e: bytes.fromhex(e.group(1).decode()), raw)
+        try:
+            name = raw.decode('utf8')
+        except UnicodeDecodeError:
+            name = raw.decode('latin-1')
+        return Name(name), m.end()
+
+    def _parse_literal_string(self, pos: int) -> Tuple[bytes, int]:
+        buf = self.buf
+        out = bytearray()
+        depth = 1
+        while True:
+            m = LITERAL_SPECIAL_RE.search(buf, pos)
+            if not m:
+                raise PDFError('Unterminated string')
+            # An unescaped end-of-line is always read as a line feed
+            out += bytes(buf[pos:m.start()]).replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+            pos = m.end()
+            c = m.group()
+            if c == b'(':
+                depth += 1
+                out += c
+            elif c == b')':
+                depth -= 1
+                if depth == 0:
+                    return bytes(out), pos
+                out += c
+            else:
+                e = bytes(buf[pos:pos + 1])
+                if e in ESCAPES:
+                    out += ESCAPES[e]
+                    pos += 1
+                elif e and e in b'01234567':
+                    octal = OCTAL_RE.match(buf, pos)
+                    out.append(int(octal.group(), 8) & 0xFF)
+                    pos = octal.end()
+                elif e == b'\r':
+                    # Line continuation
+                    pos += 2 if buf[pos + 1:pos + 2] == b'\n' else 1
+                elif e == b'\n':
+                    pos += 1
+
+    def _parse_hex_string(self, pos: int) -> Tuple[bytes, int]:
+        m = HEX_STRING_RE.match(self.buf, pos)
+        if not m:
+            raise PDFError(f'Invalid hexadecimal string at offset {pos}')
+        digits = re.sub(rb'[\x00\t\n\x0c\r ]', b'', m.group(1))
+        if len(digits) % 2:
+            digits += b'0'
+        return bytes.fromhex(digits.decode('ascii')), m.end()
+
+    def _parse_array(self, pos: int) -> Tuple[list, int]:
+        buf = self.buf
+        items = []
+        while True:
+            pos = self.skip_whitespace(pos)
+            c = buf[pos:pos + 1]
+            if c == b']':
+                return items, pos + 1
+            if not c:
+                raise PDFError('Unterminated array')
+            obj, pos = self.parse(pos)
+            items.append(obj)
+
+    def _parse_dict(self, pos: int) -> Tuple[dict, int]:
+        buf = self.buf
+        items = {}
+        while True:
+            pos = self.skip_whitespace(pos)
+            c = buf[pos:pos + 2]
+            if c == b'>>':
+                return items, pos + 2
+            if not c:
+                raise PDFError('Unterminated dictionary')
+            key, pos = self.parse(pos)
+            if not isinstance(key, Name):
+                raise PDFError(f'Expected a name as dictionary key, got {key!r}')
+            value, pos = self.parse(pos)
+            items[key] = value
+
+    def _parse_stream_data(self, attrs: dict, start: int) -> Stream:
+        buf = self.buf
+        length = self.resolve(attrs.get('Length'))
+        if isinstance(length, int) and length >= 0:
+            end = start + length
+            if self.skip_whitespace(end) == buf.find(b'endstream', end, end + 64):
+                return Stream(attrs, buf[start:end])
+        # Missing or wrong /Length, look for the end marker instead
+        end = buf.find(b'endstream', start)
+        if end < 0:
+            raise PDFError('Unterminated stream')
+        data = buf[start:end]
+        if data.endswith(b'\r\n'):
+            data = data[:-2]
+        elif data.endswith(b'\n') or data.endswith(b'\r'):
+            data = data[:-1]
+        return Stream(attrs, data)
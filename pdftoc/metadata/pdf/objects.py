@@ -0,0 +1,48 @@
+from typing import NamedTuple, Dict, Any
+
+
+class PDFError(Exception):
+    pass
+
+
+class UnsupportedPDF(PDFError):
+    """
+    Raised for valid PDF features that are not implemented (encryption, some stream filters...)
+    """
+    pass
+
+
+class Name(str):
+    def __repr__(self):
+        return f'/{self}'
+
+
+class Keyword(str):
+    pass
+
+
+class Ref(NamedTuple):
+    num: int
+    gen: int
+
+    def __repr__(self):
+        return f'{self.num} {self.gen} R'
+
+
+class Stream:
+
+    __slots__ = ('dict', 'raw')
+
+    def __init__(self, dict_: Dict[str, Any], raw: bytes):
+        self.dict = dict_
+        # Encoded stream data
+        self.raw = raw
+
+    def get(self, key, default=None):
+        return self.dict.get(key, default)
+
+    def __getitem__(self, key):
+        return self.dict[key]
+
+    def __contains__(self, key):
+        return key in self.dict
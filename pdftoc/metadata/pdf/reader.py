@@ -0,0 +1,329 @@
+import mmap
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .filters import decode
+from .lexer import ObjectParser
+from .objects import PDFError, UnsupportedPDF, Name, Ref, Stream
+from .xref import XRefIndex, XREF_OFFSET
+
+
+STARTXREF_RE = re.compile(rb'startxref[\x00\t\n\x0c\r ]+(\d+)')
+
+# PDFDocEncoding code points that differ from latin-1
+PDF_DOC_ENCODING = {
+    0x18: '˘', 0x19: 'ˇ', 0x1a: 'ˆ', 0x1b: '˙',
+    0x1c: '˝', 0x1d: '˛', 0x1e: '˚', 0x1f: '˜',
+    0x80: '•', 0x81: '†', 0x82: '‡', 0x83: '…',
+    0x84: '—', 0x85: '–', 0x86: 'ƒ', 0x87: '⁄',
+    0x88: '‹', 0x89: '›', 0x8a: '−', 0x8b: '‰',
+    0x8c: '„', 0x8d: '“', 0x8e: '”', 0x8f: '‘',
+    0x90: '’', 0x91: '‚', 0x92: '™', 0x93: 'ﬁ',
+    0x94: 'ﬂ', 0x95: 'Ł', 0x96: 'Œ', 0x97: 'Š',
+    0x98: 'Ÿ', 0x99: 'Ž', 0x9a: 'ı', 0x9b: 'ł',
+    0x9c: 'œ', 0x9d: 'š', 0x9e: 'ž', 0xa0: '€',
+}
+PDF_DOC_DECODING_TABLE = str.maketrans({chr(k): v for k, v in PDF_DOC_ENCODING.items()})
+
+
+def decode_text(value) -> str:
+    """
+    Decodes a PDF text string (UTF-16BE or UTF-8 with a byte order mark, PDFDocEncoding otherwise).
+    """
+    if isinstance(value, str):
+        return value
+    if not isinstance(value, bytes):
+        return ''
+    if value.startswith(b'\xfe\xff'):
+        return value[2:].decode('utf-16-be', errors='replace')
+    if value.startswith(b'\xef\xbb\xbf'):
+        return value[3:].decode('utf8', errors='replace')
+    return value.decode('latin-1').translate(PDF_DOC_DECODING_TABLE)
+
+
+class PDFReader:
+    """
+    Reads document-level structures (trailer, info dictionary, page tree, outlines) from a PDF buffer.
+
+    Only the cross-reference sections are parsed upfront,
+    objects are looked up by offset and parsed when they are first needed.
+    When opened from a path, the file is memory-mapped so that page content streams
+    and other unused objects are never read from disk.
+    """
+
+    def __init__(self, buf):
+        self.buf = buf
+        self.parser = ObjectParser(buf, self.resolve)
+        self.xref = XRefIndex()
+        self.trailer: Dict[str, Any] = {}
+        # Offset of the newest cross-reference section
+        self.startxref: int = 0
+        # Whether the newest cross-reference section is a stream
+        self.has_xref_stream: bool = False
+        self._objects: Dict[int, Any] = {}
+        self._object_streams: Dict[int, Tuple[ObjectParser, List[int]]] = {}
+        self._page_refs: Optional[List[Ref]] = None
+        self._page_numbers: Optional[Dict[int, int]] = None
+        self._read_xref()
+
+    @classmethod
+    def open(cls, path: str) -> 'PDFReader':
+        with open(path, 'rb') as fp:
+            try:
+                buf = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise PDFError('Empty file')
+        try:
+            return cls(buf)
+        except Exception:
+            buf.close()
+            raise
+
+    def close(self):
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def is_encrypted(self) -> bool:
+        return 'Encrypt' in self.trailer
+
+    @property
+    def catalog(self) -> dict:
+        catalog = self.resolve(self.trailer.get('Root'))
+        if not isinstance(catalog, dict):
+            raise PDFError('Missing document catalog')
+        return catalog
+
+    @property
+    def info(self) -> Dict[str, str]:
+        info = self.resolve(self.trailer.get('Info'))
+        if not isinstance(info, dict):
+            return {}
+        values = {}
+        for key, value in info.items():
+            value = self.resolve(value)
+            if isinstance(value, bytes):
+                values[str(key)] = decode_text(value)
+        return values
+
+    @property
+    def ids(self) -> List[bytes]:
+        ids = self.resolve(self.trailer.get('ID'))
+        if not isinstance(ids, list):
+            return []
+        return [i for i in map(self.resolve, ids) if isinstance(i, bytes)]
+
+    @property
+    def num_pages(self) -> int:
+        pages = self.resolve(self.catalog.get('Pages'))
+        if not isinstance(pages, dict):
+            return 0
+        return self.resolve(pages.get('Count', 0))
+
+    def resolve(self, obj):
+        """
+        Returns the object referenced by `obj` if it is an indirect reference, `obj` otherwise.
+        """
+        while isinstance(obj, Ref):
+            obj = self.get_object(obj)
+        return obj
+
+    def get_object(self, ref: Ref):
+        try:
+            return self._objects[ref.num]
+        except KeyError:
+            pass
+        entry = self.xref.get(ref.num)
+        if not entry:
+            obj = None
+        elif entry[0] == XREF_OFFSET:
+            found, obj = self.parser.parse_indirect(entry[1])
+            if found.num != ref.num:
+                raise PDFError(f'Expected object {ref} at offset {entry[1]}, found {found}')
+        else:
+            obj = self._get_compressed_object(entry[1], entry[2])
+        self._objects[ref.num] = obj
+        return obj
+
+    def iter_outline(self) -> Iterator[Tuple[int, str, int]]:
+        """
+        Yields a (level, title, page) tuple for each outline item, in document order.
+
+        Levels and page numbers are 1-indexed, the page number is 0 when the item has no local destination.
+        """
+        outlines = self.resolve(self.catalog.get('Outlines'))
+        if not isinstance(outlines, dict):
+            return
+        seen = set()
+        stack = [(outlines.get('First'), 1)]
+        while stack:
+            ref, level = stack.pop()
+            while ref is not None:
+                # Guard against malformed, cyclic outlines
+                if isinstance(ref, Ref):
+                    if ref in seen:
+                        break
+                    seen.add(ref)
+                item = self.resolve(ref)
+                if not isinstance(item, dict):
+                    break
+                yield level, decode_text(self.resolve(item.get('Title'))), self._get_item_page(item)
+                ref = item.get('Next')
+                first = item.get('First')
+                if first is not None:
+                    # visit the children before the next sibling
+                    stack.append((ref, level))
+                    ref, level = first, level + 1
+
+    def _read_xref(self):
+        m = None
+        for m in STARTXREF_RE.finditer(self.buf, max(0, len(self.buf) - 2048)):
+            pass
+        if not m:
+            raise PDFError('startxref not found')
+        offset = self.startxref = int(m.group(1))
+        visited = set()
+        while offset is not None and offset not in visited:
+            visited.add(offset)
+            trailer = self._read_xref_section(offset)
+            if not self.trailer:
+                self.trailer = trailer
+            # Hybrid-reference files store compressed objects in an additional xref stream
+            hybrid = trailer.get('XRefStm')
+            if isinstance(hybrid, int) and hybrid not in visited:
+                visited.add(hybrid)
+                self._read_xref_section(hybrid)
+            self.xref.end_section()
+            offset = trailer.get('Prev')
+
+    def _read_xref_section(self, offset: int) -> dict:
+        pos = self.parser.skip_whitespace(offset)
+        if self.buf[pos:pos + 4] == b'xref':
+            return self._read_xref_table(pos + 4)
+        _, stream = self.parser.parse_indirect(offset)
+        if not isinstance(stream, Stream) or stream.get('Type') != 'XRef':
+            raise PDFError(f'No cross-reference section at offset {offset}')
+        if offset == self.startxref:
+            self.has_xref_stream = True
+        self.xref.read_stream(stream)
+        return stream.dict
+
+    def _read_xref_table(self, pos: int) -> dict:
+        pos = self.xref.read_table(self.buf, pos, self.parser.skip_whitespace)
+        trailer, _ = self.parser.parse(pos + 7)
+        return trailer
+
+    def _get_compressed_object(self, stream_num: int, index: int):
+        try:
+            parser, offsets = self._object_streams[stream_num]
+        except KeyError:
+            stream = self.get_object(Ref(stream_num, 0))
+            if not isinstance(stream, Stream):
+                raise PDFError(f'Object stream {stream_num} not found')
+            data = decode(stream.raw, stream.get('Filter'), stream.get('DecodeParms'))
+            parser = ObjectParser(data, self.resolve)
+            first = stream.get('First', 0)
+            header = parser.buf[:first].split()
+            offsets = [first + int(o) for o in header[1::2]]
+            self._object_streams[stream_num] = parser, offsets
+        if index >= len(offsets):
+            raise PDFError(f'Object #{index} not found in object stream {stream_num}')
+        obj, _ = parser.parse(offsets[index])
+        return obj
+
+    def _get_item_page(self, item: dict) -> int:
+        dest = self.resolve(item.get('Dest'))
+        if dest is None:
+            action = self.resolve(item.get('A'))
+            if not isinstance(action, dict) or action.get('S') != 'GoTo':
+                return 0
+            dest = self.resolve(action.get('D'))
+        if isinstance(dest, (bytes, Name)):
+            dest = self._get_named_destination(dest)
+            if isinstance(dest, dict):
+                dest = self.resolve(dest.get('D'))
+        if not isinstance(dest, list) or not dest:
+            return 0
+        page = dest[0]
+        if isinstance(page, Ref):
+            return self._get_page_numbers().get(page.num, 0)
+        if isinstance(page, int):
+            return page + 1
+        return 0
+
+    def _get_named_destination(self, name):
+        catalog = self.catalog
+        if isinstance(name, Name):
+            dests = self.resolve(catalog.get('Dests'))
+            if isinstance(dests, dict) and name in dests:
+                return self.resolve(dests[name])
+            name = name.encode('utf8')
+        names = self.resolve(catalog.get('Names'))
+        if not isinstance(names, dict):
+            return None
+        return self._lookup_name_tree(names.get('Dests'), name)
+
+    def _lookup_name_tree(self, node, key: bytes):
+        visited = set()
+        node = self.resolve(node)
+        while isinstance(node, dict) and id(node) not in visited:
+            visited.add(id(node))
+            names = self.resolve(node.get('Names'))
+            if isinstance(names, list):
+                for i in range(0, len(names) - 1, 2):
+                    if self.resolve(names[i]) == key:
+                        return self.resolve(names[i + 1])
+                return None
+            kids = self.resolve(node.get('Kids'))
+            if not isinstance(kids, list):
+                return None
+            for kid in kids:
+                kid = self.resolve(kid)
+                limits = self.resolve(kid.get('Limits')) if isinstance(kid, dict) else None
+                if not limits or self.resolve(limits[0]) <= key <= self.resolve(limits[-1]):
+                    node = kid
+                    break
+            else:
+                return None
+        return None
+
+    @property
+    def page_refs(self) -> List[Ref]:
+        """
+        References to the page objects, in page order. The page tree is walked on first use.
+        """
+        if self._page_refs is not None:
+            return self._page_refs
+        refs = []
+        visited = set()
+        stack = [self.catalog.get('Pages')]
+        while stack:
+            ref = stack.pop()
+            if isinstance(ref, Ref):
+                if ref.num in visited:
+                    continue
+                visited.add(ref.num)
+            node = self.resolve(ref)
+            if not isinstance(node, dict):
+                continue
+            kids = self.resolve(node.get('Kids'))
+            if node.get('Type') == 'Pages' or isinstance(kids, list):
+                stack.extend(reversed(kids or []))
+            elif isinstance(ref, Ref):
+                refs.append(ref)
+        self._page_refs = refs
+        return refs
+
+    def _get_page_numbers(self) -> Dict[int, int]:
+        """
+        Maps page object numbers to 1-indexed page numbers.
+        """
+        if self._page_numbers is None:
+            self._page_numbers = {ref.num: i for i, ref in enumerate(self.page_refs, 1)}
+        return self._page_numbers
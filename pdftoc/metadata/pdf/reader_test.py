@@ -0,0 +1,130 @@
+from typing import Dict
+
+from pdftoc.metadata.pdf.lexer import ObjectParser
+from pdftoc.metadata.pdf.objects import Name, Ref
+from pdftoc.metadata.pdf.reader import PDFReader, decode_text
+
+
+def build_pdf(objects: Dict[int, bytes], trailer: bytes) -> bytes:
+    """
+    Builds a PDF file with a classic cross-reference table from the bodies of its indirect objects.
+    """
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = {}
+    for num, body in sorted(objects.items()):
+        offsets[num] = len(out)
+        out += b'%d 0 obj\n%s\nendobj\n' % (num, body)
+    size = max(objects) + 1
+    xref_offset = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % size
+    for num in range(1, size):
+        out += b'%010d 00000 n \n' % offsets[num] if num in offsets else b'0000000000 65535 f \n'
+    out += b'trailer\n<< /Size %d %s >>\nstartxref\n%d\n%%%%EOF\n' % (size, trailer, xref_offset)
+    return bytes(out)
+
+
+SAMPLE = build_pdf({
+    1: b'<< /Type /Catalog /Pages 2 0 R /Outlines 5 0 R /Names << /Dests 9 0 R >> >>',
+    2: b'<< /Type /Pages /Kids [3 0 R 4 0 R] /Count 2 >>',
+    3: b'<< /Type /Page /Parent 2 0 R >>',
+    4: b'<< /Type /Page /Parent 2 0 R >>',
+    5: b'<< /Type /Outlines /First 6 0 R /Last 8 0 R >>',
+    6: b'<< /Title (Chapter \\(1\\)) /Parent 5 0 R /Next 8 0 R /First 7 0 R /Dest [3 0 R /Fit] >>',
+    7: b'<< /Title <FEFF00C9007400E9> /Parent 6 0 R /A << /S /GoTo /D (named) >> >>',
+    8: b'<< /Title (Chapter 2) /Parent 5 0 R /Prev 6 0 R /Dest [4 0 R /XYZ null null null] >>',
+    9: b'<< /Names [(named) [4 0 R /Fit]] >>',
+    10: b'<< /Title (A Book) /Author (Me) /Custom (Value) >>',
+}, b'/Root 1 0 R /Info 10 0 R /ID [<0102> <0102>]')
+
+
+def test_parse_objects():
+    parser = ObjectParser(b'<< /A [1 -2 3.5 4 0 R] /B (a\\)b) /C <4142> /D#20E true /F null >>')
+    obj, _ = parser.parse(0)
+    assert obj == {
+        'A': [1, -2, 3.5, Ref(4, 0)],
+        'B': b'a)b',
+        'C': b'AB',
+        'D E': True,
+        'F': None,
+    }
+    assert isinstance(obj['A'][3], Ref)
+    assert isinstance(list(obj)[0], Name)
+
+
+def test_decode_text():
+    assert decode_text(b'\xfe\xff\x00A\x00\xe9') == 'Aé'
+    assert decode_text(b'\x93 \xa0') == 'ﬁ €'
+
+
+def test_reader():
+    reader = PDFReader(SAMPLE)
+    assert reader.num_pages == 2
+    assert reader.info == {'Title': 'A Book', 'Author': 'Me', 'Custom': 'Value'}
+    assert reader.ids == [b'\x01\x02', b'\x01\x02']
+    assert list(reader.iter_outline()) == [
+        (1, 'Chapter (1)', 1),
+        (2, 'Été', 2),
+        (1, 'Chapter 2', 2),
+    ]
+
+
+def test_reader_with_xref_and_object_streams():
+    pages, info = b'<< /Type /Pages /Kids [5 0 R] /Count 1 >>', b'<< /Title (Compressed) >>'
+    header = b'3 0 4 %d ' % (len(pages) + 1)
+    objstm = header + pages + b' ' + info
+    out = bytearray(b'%PDF-1.5\n')
+    offsets = {}
+    for num, body in (
+        (1, b'<< /Type /Catalog /Pages 3 0 R >>'),
+        (2, b'<< /Type /ObjStm /N 2 /First %d /Length %d >>\nstream\n%s\nendstream' % (len(header), len(objstm), objstm)),
+        (5, b'<< /Type /Page /Parent 3 0 R >>'),
+    ):
+        offsets[num] = len(out)
+        out += b'%d 0 obj\n%s\nendobj\n' % (num, body)
+    entries = [
+        (0, 0, 0),
+        (1, offsets[1], 0),
+        (1, offsets[2], 0),
+        (2, 2, 0),
+        (2, 2, 1),
+        (1, offsets[5], 0),
+    ]
+    data = b''.join(bytes([t]) + f.to_bytes(4, 'big') + bytes([i]) for t, f, i in entries)
+    xref_offset = len(out)
+    out += b'6 0 obj\n<< /Type /XRef /Size 6 /W [1 4 1] /Root 1 0 R /Info 4 0 R /Length %d >>\nstream\n' % len(data)
+    out += data + b'\nendstream\nendobj\nstartxref\n%d\n%%%%EOF\n' % xref_offset
+
+    reader = PDFReader(bytes(out))
+    assert reader.xref.get(4) == (2, 2, 1)
+    assert reader.num_pages == 1
+    assert reader.info == {'Title': 'Compressed'}
+
+
+def test_outline_items_without_destination_have_page_0():
+    reader = PDFReader(build_pdf({
+        1: b'<< /Type /Catalog /Pages 2 0 R /Outlines 4 0 R >>',
+        2: b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        3: b'<< /Type /Page /Parent 2 0 R >>',
+        4: b'<< /Type /Outlines /First 5 0 R /Last 7 0 R >>',
+        5: b'<< /Title (No destination) /Parent 4 0 R /Next 6 0 R >>',
+        6: b'<< /Title (Link) /Parent 4 0 R /Prev 5 0 R /Next 7 0 R /A << /S /URI /URI (https://example.com) >> >>',
+        7: b'<< /Title (Missing page) /Parent 4 0 R /Prev 6 0 R /Dest [9 0 R /Fit] >>',
+    }, b'/Root 1 0 R'))
+    assert list(reader.iter_outline()) == [
+        (1, 'No destination', 0),
+        (1, 'Link', 0),
+        (1, 'Missing page', 0),
+    ]
+
+
+def test_objects_freed_by_an_update_are_deleted():
+    body = b'7 0 obj\n<< /Title (Updated) /Parent 6 0 R >>\nendobj\n'
+    xref_offset = len(SAMPLE) + len(body)
+    update = body + b'xref\n0 1\n0000000000 65535 f \n7 1\n%010d 00000 n \n10 1\n0000000000 00001 f \n' % len(SAMPLE)
+    update += b'trailer\n<< /Size 11 /Root 1 0 R /Prev %d >>\nstartxref\n%d\n%%%%EOF\n' % (
+        SAMPLE.rindex(b'\nxref\n') + 1, xref_offset)
+    reader = PDFReader(SAMPLE + update)
+    assert 10 not in reader.xref
+    assert reader.get_object(Ref(10, 0)) is None
+    assert reader.get_object(Ref(7, 0))['Title'] == b'Updated'
+    assert 6 in reader.xref
@@ -0,0 +1,182 @@
+import hashlib
+import re
+import time
+from typing import Any, BinaryIO, Dict, List
+
+from .objects import PDFError, Name, Ref
+from .reader import PDFReader
+from .xref import XREF_OFFSET
+
+
+NAME_ESCAPE_RE = re.compile(rb'[^!-~]|[#()<>\[\]{}/%]')
+LITERAL_ESCAPE_RE = re.compile(rb'[()\\\r\n]')
+LITERAL_ESCAPES = {
+    b'(': b'\\(',
+    b')': b'\\)',
+    b'\\': b'\\\\',
+    b'\r': b'\\r',
+    b'\n': b'\\n',
+}
+
+
+def encode_text(value: str) -> bytes:
+    """
+    Encodes a text string as ASCII when possible, UTF-16BE with a byte order mark otherwise.
+    """
+    try:
+        return value.encode('ascii')
+    except UnicodeEncodeError:
+        return b'\xfe\xff' + value.encode('utf-16-be')
+
+
+def serialize(obj) -> bytes:
+    """
+    Serializes a direct object. `str` values are written as text strings, `Name` values as names.
+    """
+    if obj is None:
+        return b'null'
+    if obj is True:
+        return b'true'
+    if obj is False:
+        return b'false'
+    if isinstance(obj, Ref):
+        return b'%d %d R' % obj
+    if isinstance(obj, int):
+        return b'%d' % obj
+    if isinstance(obj, float):
+        return (b'%.6f' % obj).rstrip(b'0').rstrip(b'.') or b'0'
+    if isinstance(obj, Name):
+        raw = NAME_ESCAPE_RE.sub(lambda m: b'#%02X' % m.group()[0], obj.encode('utf8'))
+        return b'/' + raw
+    if isinstance(obj, str):
+        obj = encode_text(obj)
+    if isinstance(obj, bytes):
+        return b'(' + LITERAL_ESCAPE_RE.sub(lambda m: LITERAL_ESCAPES[m.group()], obj) + b')'
+    if isinstance(obj, list):
+        return b'[' + b' '.join(serialize(item) for item in obj) + b']'
+    if isinstance(obj, dict):
+        items = b' '.join(serialize(Name(k)) + b' ' + serialize(v) for k, v in obj.items())
+        return b'<< ' + items + b' >>'
+    raise PDFError(f'Cannot serialize {obj!r}')
+
+
+class IncrementalUpdate:
+    """
+    Collects new and replaced objects, then appends them to the original file
+    as an incremental update section (objects, cross-reference section and trailer).
+
+    The cross-reference section is written in the same form (table or stream) as the one of the original file.
+    """
+
+    def __init__(self, reader: PDFReader):
+        if reader.is_encrypted:
+            raise PDFError('Cannot update an encrypted document')
+        self.reader = reader
+        self.size: int = max(reader.trailer.get('Size', 0), len(reader.xref))
+        self.objects: Dict[int, Any] = {}
+        self.trailer: Dict[str, Any] = {
+            key: reader.trailer[key] for key in ('Root', 'Info', 'ID') if key in reader.trailer
+        }
+
+    def allocate(self) -> Ref:
+        ref = Ref(self.size, 0)
+        self.size += 1
+        self.objects[ref.num] = None
+        return ref
+
+    def add(self, obj) -> Ref:
+        ref = self.allocate()
+        self.objects[ref.num] = obj
+        return ref
+
+    def replace(self, ref: Ref, obj):
+        self.objects[ref.num] = obj
+
+    def build(self) -> bytes:
+        """
+        Returns the bytes to append to the original file.
+        """
+        buf = self.reader.buf
+        base = len(buf)
+        out = bytearray()
+        if not buf[-1:] in (b'\n', b'\r'):
+            out += b'\n'
+        offsets = {}
+        for num, obj in sorted(self.objects.items()):
+            offsets[num] = base + len(out)
+            out += b'%d %d obj\n%s\nendobj\n' % (num, self._generation(num), serialize(obj))
+
+        trailer = dict(self.trailer)
+        trailer['Size'] = self.size
+        trailer['Prev'] = self.reader.startxref
+        trailer['ID'] = self._update_id(base)
+
+        if self.reader.has_xref_stream:
+            xref_ref = Ref(self.size, 0)
+            offsets[xref_ref.num] = base + len(out)
+            trailer['Size'] = self.size + 1
+            out += self._build_xref_stream(offsets, trailer, xref_ref)
+        else:
+            xref_offset = base + len(out)
+            out += self._build_xref_table(offsets)
+            out += b'trailer\n%s\nstartxref\n%d\n%%%%EOF\n' % (serialize(trailer), xref_offset)
+        return bytes(out)
+
+    def write(self, fp: BinaryIO):
+        """
+        Appends the update to `fp`, which must be a copy of the original file opened for writing.
+        """
+        data = self.build()
+        fp.seek(len(self.reader.buf))
+        fp.write(data)
+        fp.truncate()
+
+    def _generation(self, num: int) -> int:
+        entry = self.reader.xref.get(num)
+        # Objects stored in object streams always have a generation number of zero
+        return entry[2] if entry and entry[0] == XREF_OFFSET else 0
+
+    def _update_id(self, base: int) -> List[bytes]:
+        ids = self.reader.ids
+        digest = hashlib.md5(b'%d %f' % (base, time.time())).digest()
+        return [ids[0] if ids else digest, digest]
+
+    def _build_xref_table(self, offsets: Dict[int, int]) -> bytes:
+        out = bytearray(b'xref\n')
+        for start, nums in self._subsections(offsets):
+            out += b'%d %d\n' % (start, len(nums))
+            for num in nums:
+                out += b'%010d %05d n \n' % (offsets[num], self._generation(num))
+        return bytes(out)
+
+    def _build_xref_stream(self, offsets: Dict[int, int], trailer: dict, ref: Ref) -> bytes:
+        offset_width = max(4, (max(offsets.values()).bit_length() + 7) // 8)
+        index = []
+        data = bytearray()
+        for start, nums in self._subsections(offsets):
+            index.extend((start, len(nums)))
+            for num in nums:
+                data += b'\x01' + offsets[num].to_bytes(offset_width, 'big') + self._generation(num).to_bytes(2, 'big')
+        attrs = {
+            'Type': Name('XRef'),
+            **trailer,
+            'W': [1, offset_width, 2],
+            'Index': index,
+            'Length': len(data),
+        }
+        return b'%d 0 obj\n%s\nstream\n%s\nendstream\nendobj\nstartxref\n%d\n%%%%EOF\n' % (
+            ref.num, serialize(attrs), bytes(data), offsets[ref.num]
+        )
+
+    def _subsections(self, offsets: Dict[int, int]):
+        """
+        Groups consecutive object numbers.
+        """
+        group = []
+        for num in sorted(offsets):
+            if group and num != group[-1] + 1:
+                yield group[0], group
+                group = []
+            group.append(num)
+        if group:
+            yield group[0], group
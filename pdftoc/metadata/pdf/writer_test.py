@@ -0,0 +1,39 @@
+from pdftoc.metadata.pdf.lexer import ObjectParser
+from pdftoc.metadata.pdf.objects import Name, Ref
+from pdftoc.metadata.pdf.reader import PDFReader
+from pdftoc.metadata.pdf.reader_test import SAMPLE
+from pdftoc.metadata.pdf.writer import IncrementalUpdate, serialize
+
+
+def test_serialize_round_trip():
+    obj = {
+        'Type': Name('Foo Bar'),
+        'Title': 'Été (1)',
+        'Raw': b'a\\b\n',
+        'Items': [1, -2.5, None, True, Ref(3, 0)],
+    }
+    parsed, _ = ObjectParser(serialize(obj)).parse(0)
+    assert parsed == {
+        'Type': 'Foo Bar',
+        'Title': b'\xfe\xff\x00\xc9\x00t\x00\xe9\x00 \x00(\x001\x00)',
+        'Raw': b'a\\b\n',
+        'Items': [1, -2.5, None, True, Ref(3, 0)],
+    }
+
+
+def test_incremental_update():
+    reader = PDFReader(SAMPLE)
+    update = IncrementalUpdate(reader)
+    info = update.add({'Title': 'New title'})
+    update.trailer['Info'] = info
+    catalog = dict(reader.catalog)
+    del catalog['Outlines']
+    update.replace(reader.trailer['Root'], catalog)
+
+    updated = PDFReader(SAMPLE + update.build())
+    assert updated.trailer['Prev'] == reader.startxref
+    assert updated.trailer['Info'] == info
+    assert updated.info == {'Title': 'New title'}
+    assert updated.num_pages == 2
+    assert list(updated.iter_outline()) == []
+    assert updated.ids[0] == reader.ids[0]
@@ -0,0 +1,170 @@
+import re
+from array import array
+from typing import List, Optional, Tuple
+
+from .filters import decode
+from .objects import PDFError, Stream
+
+
+XREF_SUBSECTION_RE = re.compile(rb'[\x00\t\n\x0c\r ]*(\d+)[\x00\t\n\x0c\r ]+(\d+)[\x00\t\n\x0c\r ]*(?=[\r\n])')
+XREF_ENTRY_RE = re.compile(rb'[\x00\t\n\x0c\r ]*(\d+)[\x00\t\n\x0c\r ]+(\d+)[\x00\t\n\x0c\r ]+([nf])')
+
+# Cross-reference entry types
+XREF_FREE, XREF_OFFSET, XREF_COMPRESSED = range(3)
+# Type of the entries freed by a newer section, that older sections must not fill
+XREF_DELETED = 0xFF
+
+# Size of a well-formed cross-reference table entry
+XREF_ENTRY_SIZE = 20
+
+
+def zeros(typecode: str, size: int) -> array:
+    return array(typecode, bytes(array(typecode).itemsize * size))
+
+
+class XRefIndex:
+    """
+    Compact cross-reference index: three parallel arrays indexed by object number.
+
+    For each object number, stores the entry type, then either the object offset and generation number,
+    or the number of the object stream containing the object and its index in that stream.
+
+    Sections must be added from the newest to the oldest, entries already present are never overwritten.
+    Free entries are applied by `end_section()`, so that the cross-reference stream of a hybrid-reference file
+    can still provide the objects that its table marks as free.
+    """
+
+    def __init__(self, size: int = 0):
+        self.types = bytearray(size)
+        self.fields = zeros('Q', size)
+        self.indices = zeros('I', size)
+        # Object numbers freed by the current section
+        self._freed: List[int] = []
+
+    def __len__(self):
+        return len(self.types)
+
+    def __contains__(self, num: int) -> bool:
+        return 0 <= num < len(self.types) and self.types[num] in (XREF_OFFSET, XREF_COMPRESSED)
+
+    def get(self, num: int) -> Optional[Tuple[int, int, int]]:
+        if num not in self:
+            return None
+        return self.types[num], self.fields[num], self.indices[num]
+
+    def add(self, num: int, kind: int, field: int, index: int):
+        if num >= len(self.types):
+            self._grow(num + 1)
+        elif self.types[num] != XREF_FREE:
+            return
+        if kind == XREF_FREE:
+            self._freed.append(num)
+            return
+        self.types[num] = kind
+        self.fields[num] = field
+        self.indices[num] = index
+
+    def end_section(self):
+        """
+        Marks the entries freed by the current section as deleted, unless it also provided them.
+        """
+        types = self.types
+        for num in self._freed:
+            if types[num] == XREF_FREE:
+                types[num] = XREF_DELETED
+        self._freed.clear()
+
+    def read_table(self, buf, pos: int, skip_whitespace) -> int:
+        """
+        Reads the subsections of the cross-reference table starting at `pos` (just after the `xref` keyword).
+        Returns the offset of the `trailer` keyword.
+        """
+        while True:
+            pos = skip_whitespace(pos)
+            if buf[pos:pos + 7] == b'trailer':
+                return pos
+            m = XREF_SUBSECTION_RE.match(buf, pos)
+            if not m:
+                raise PDFError(f'Invalid cross-reference table at offset {pos}')
+            start, count = int(m.group(1)), int(m.group(2))
+            pos = skip_whitespace(m.end())
+            if count and start + count > len(self.types):
+                self._grow(start + count)
+            end = pos + count * XREF_ENTRY_SIZE
+            chunk = buf[pos:end]
+            if self._is_well_formed(chunk, count):
+                try:
+                    self._read_fixed_entries(chunk, start, count)
+                except ValueError:
+                    raise PDFError(f'Invalid cross-reference table at offset {pos}')
+                pos = end
+            else:
+                pos = self._read_entries(buf, pos, start, count)
+
+    def read_stream(self, stream: Stream):
+        widths = stream.get('W')
+        if not isinstance(widths, list) or len(widths) != 3:
+            raise PDFError('Invalid cross-reference stream')
+        index = stream.get('Index') or [0, stream.get('Size', 0)]
+        data = decode(stream.raw, stream.get('Filter'), stream.get('DecodeParms'))
+        size = stream.get('Size', 0)
+        if isinstance(size, int) and size > len(self.types):
+            self._grow(size)
+        w1, w2, w3 = widths
+        entry_size = w1 + w2 + w3
+        from_bytes = int.from_bytes
+        pos = 0
+        for i in range(0, len(index) - 1, 2):
+            start, count = index[i], index[i + 1]
+            count = min(count, (len(data) - pos) // entry_size)
+            for num in range(start, start + count):
+                kind = from_bytes(data[pos:pos + w1], 'big') if w1 else XREF_OFFSET
+                field = from_bytes(data[pos + w1:pos + w1 + w2], 'big')
+                idx = from_bytes(data[pos + w1 + w2:pos + entry_size], 'big')
+                pos += entry_size
+                if kind in (XREF_FREE, XREF_OFFSET, XREF_COMPRESSED):
+                    self.add(num, kind, field, idx)
+
+    def _grow(self, size: int):
+        extra = size - len(self.types)
+        self.types.extend(bytes(extra))
+        self.fields.extend(zeros('Q', extra))
+        self.indices.extend(zeros('I', extra))
+
+    def _is_well_formed(self, chunk: bytes, count: int) -> bool:
+        if len(chunk) != count * XREF_ENTRY_SIZE:
+            return False
+        # Check the entry separators of the first and last entries
+        for offset in (0, len(chunk) - XREF_ENTRY_SIZE):
+            if chunk[offset + 10:offset + 11] != b' ' or chunk[offset + 16:offset + 17] != b' ':
+                return False
+            if chunk[offset + 18:offset + 20] not in (b' \n', b' \r', b'\r\n'):
+                return False
+        return True
+
+    def _read_fixed_entries(self, chunk: bytes, start: int, count: int):
+        types, fields, indices, freed = self.types, self.fields, self.indices, self._freed
+        for i in range(count):
+            offset = i * XREF_ENTRY_SIZE
+            num = start + i
+            if types[num] != XREF_FREE:
+                continue
+            if chunk[offset + 17] == 0x6E:  # 'n'
+                types[num] = XREF_OFFSET
+                fields[num] = int(chunk[offset:offset + 10])
+                indices[num] = int(chunk[offset + 11:offset + 16])
+            else:
+                freed.append(num)
+
+    def _read_entries(self, buf, pos: int, start: int, count: int) -> int:
+        """
+        Slow path for tables with non-standard entry sizes.
+        """
+        for num in range(start, start + count):
+            m = XREF_ENTRY_RE.match(buf, pos)
+            if not m:
+                raise PDFError(f'Invalid cross-reference entry at offset {pos}')
+            pos = m.end()
+            kind = XREF_OFFSET if m.group(3) == b'n' else XREF_FREE
+            self.add(num, kind, int(m.group(1)), int(m.group(2)))
+        return pos
@@ -0,0 +1,111 @@
+"""
+Synchronous pdftk backend, for use outside of a GLib main loop.
+"""
+import os
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from os.path import dirname
+from shutil import which
+from typing import Optional
+
+from .document import Document
+from .parser import Parser
+from .serializer import Serializer
+
+
+# Optional semaphore bounding the number of concurrent pdftk processes,
+# possibly shared between several worker processes.
+_slots = None
+
+
+class PdftkError(Exception):
+    pass
+
+
+def set_concurrency_limit(semaphore):
+    """
+    Makes every pdftk invocation acquire `semaphore` (i.e. a `multiprocessing.BoundedSemaphore`) while it runs.
+    """
+    global _slots
+    _slots = semaphore
+
+
+@contextmanager
+def _slot():
+    if _slots is None:
+        yield
+        return
+    with _slots:
+        yield
+
+
+def find_pdftk() -> str:
+    pdftk = which('pdftk')
+    if not pdftk:
+        raise PdftkError('pdftk executable not found')
+    return pdftk
+
+
+def read_document(doc: Document) -> Document:
+    """
+    Parses the output of `pdftk dump_data_utf8` into `doc`, streaming it from the pipe.
+    """
+    # stderr goes to a file, so that pdftk never blocks on it while we are reading its output
+    with _slot(), tempfile.TemporaryFile() as stderr, subprocess.Popen(
+        [find_pdftk(), doc.path, 'dump_data_utf8'],
+        stdout=subprocess.PIPE,
+        stderr=stderr
+    ) as p:
+        Parser().parse(p.stdout, doc)
+        p.wait()
+        stderr.seek(0)
+        message = stderr.read()
+    if p.returncode != 0:
+        raise PdftkError(f'pdftk command failed with exit code {p.returncode}: {message.decode(errors="replace").strip()}')
+    return doc
+
+
+def update_document(doc: Document, dst: Optional[str] = None) -> str:
+    """
+    Rewrites `doc.path` into `dst` (defaults to `doc.path`) with `pdftk update_info_utf8`.
+    Returns the path of the saved file.
+
+    The metadata is streamed to pdftk as it is serialized, blocking writes to the pipe providing backpressure.
+    """
+    dst = dst or doc.path
+    fd, outfile = tempfile.mkstemp(dir=dirname(dst))
+    os.close(fd)
+    try:
+        # stderr goes to a file, so that pdftk never blocks on it while we are blocked writing its input
+        with _slot(), tempfile.TemporaryFile() as stderr, subprocess.Popen(
+            [find_pdftk(), doc.path, 'update_info_utf8', '-', 'output', outfile],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=stderr
+        ) as p:
+            try:
+                for chunk in Serializer().iter_chunks(doc):
+                    p.stdin.write(chunk)
+            except BrokenPipeError:
+                # pdftk exited early, its exit status tells why
+                pass
+            except BaseException:
+                p.kill()
+                raise
+            finally:
+                try:
+                    p.stdin.close()
+                except BrokenPipeError:
+                    pass
+            p.wait()
+            stderr.seek(0)
+            message = stderr.read()
+        if p.returncode != 0:
+            raise PdftkError(f'pdftk command failed with exit code {p.returncode}: {message.decode(errors="replace").strip()}')
+        os.replace(outfile, dst)
+    except BaseException:
+        if os.path.exists(outfile):
+            os.remove(outfile)
+        raise
+    return dst
@@ -0,0 +1,177 @@
+import heapq
+import itertools
+import os
+from typing import Callable, List, Optional
+
+from gi.repository import GLib, GObject, Gio
+
+
+class Job:
+    """
+    A unit of work holding a scheduler slot, from the time it is started until `release()` is called.
+    """
+
+    __slots__ = ('_scheduler', '_start', '_on_cancelled', 'priority', 'cancellable', '_handler', 'state', '_entry')
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    CANCELLED = 'cancelled'
+
+    def __init__(self, scheduler: 'SubprocessScheduler', start: Callable[['Job'], None], priority: int,
+                 cancellable: Optional[Gio.Cancellable], on_cancelled: Optional[Callable[[], None]]):
+        self._scheduler = scheduler
+        self._start = start
+        self._on_cancelled = on_cancelled
+        self.priority = priority
+        self.cancellable = cancellable
+        self._handler = 0
+        self.state = self.QUEUED
+        self._entry = None
+
+    def release(self):
+        """
+        Frees the slot of the job, so that the next queued one can start. Can be called several times.
+        """
+        if self.state == self.RUNNING:
+            self.state = self.DONE
+            self._scheduler._on_job_released(self)
+
+
+class SubprocessScheduler:
+    """
+    Bounds the number of subprocesses running at the same time.
+
+    Jobs are started by priority (lower values first, as for GLib sources), then in submission order.
+    A job that is cancelled through its `Gio.Cancellable` before it starts is dropped from the queue.
+    Must be used from the main thread.
+    """
+
+    DEFAULT_MAX_IN_FLIGHT = min(4, os.cpu_count() or 1)
+
+    _default: Optional['SubprocessScheduler'] = None
+
+    @classmethod
+    def get_default(cls) -> 'SubprocessScheduler':
+        """
+        Returns the scheduler shared by the loaders and writers of the application.
+        """
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def __init__(self, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT):
+        self._max_in_flight = max(1, max_in_flight)
+        self._in_flight = 0
+        # Entries are [priority, sequence number, job], with job set to None once removed
+        self._queue: List[list] = []
+        self._queued = 0
+        self._counter = itertools.count()
+
+    @property
+    def max_in_flight(self) -> int:
+        return self._max_in_flight
+
+    @max_in_flight.setter
+    def max_in_flight(self, value: int):
+        self._max_in_flight = max(1, value)
+        self._start_jobs()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def __len__(self):
+        """
+        Number of queued jobs.
+        """
+        return self._queued
+
+    def submit(self, start: Callable[[Job], None], priority: int = GLib.PRIORITY_DEFAULT,
+               cancellable: Optional[Gio.Cancellable] = None,
+               on_cancelled: Optional[Callable[[], None]] = None) -> Job:
+        """
+        Queues a job, calling `start(job)` once a slot is free. `job.release()` must then be called
+        when the subprocess has exited, or could not be spawned.
+
+        `on_cancelled()` is called instead if `cancellable` is cancelled before the job starts.
+        """
+        job = Job(self, start, priority, cancellable, on_cancelled)
+        if cancellable is not None:
+            if cancellable.is_cancelled():
+                self._cancel(job)
+                return job
+            # Gio.Cancellable.connect() is g_cancellable_connect(), which shadows the signal API
+            job._handler = GObject.Object.connect(cancellable, 'cancelled', self._on_cancellable_cancelled, job)
+        self._push(job)
+        self._start_jobs()
+        return job
+
+    def set_priority(self, job: Job, priority: int):
+        """
+        Changes the priority of a job that has not started yet.
+        """
+        if job.state != job.QUEUED or job.priority == priority:
+            return
+        self._remove(job)
+        job.priority = priority
+        self._push(job)
+
+    def _push(self, job: Job):
+        job._entry = [job.priority, next(self._counter), job]
+        heapq.heappush(self._queue, job._entry)
+        self._queued += 1
+
+    def _remove(self, job: Job):
+        # Removed entries stay in the heap until they reach its top
+        job._entry[-1] = None
+        job._entry = None
+        self._queued -= 1
+
+    def _pop(self) -> Optional[Job]:
+        while self._queue:
+            job = heapq.heappop(self._queue)[-1]
+            if job is not None:
+                job._entry = None
+                self._queued -= 1
+                return job
+        return None
+
+    def _start_jobs(self):
+        while self._in_flight < self._max_in_flight:
+            job = self._pop()
+            if job is None:
+                return
+            self._disconnect(job)
+            job.state = job.RUNNING
+            self._in_flight += 1
+            try:
+                job._start(job)
+            except Exception:
+                job.release()
+                raise
+
+    def _on_job_released(self, job: Job):
+        self._in_flight -= 1
+        self._start_jobs()
+
+    def _on_cancellable_cancelled(self, cancellable, job: Job):
+        # The cancellable may be cancelled from another thread
+        GLib.idle_add(self._cancel_queued, job)
+
+    def _cancel_queued(self, job: Job):
+        if job.state == job.QUEUED:
+            self._remove(job)
+            self._cancel(job)
+        return GLib.SOURCE_REMOVE
+
+    def _cancel(self, job: Job):
+        self._disconnect(job)
+        job.state = job.CANCELLED
+        if job._on_cancelled:
+            job._on_cancelled()
+
+    def _disconnect(self, job: Job):
+        if job._handler:
+            GObject.Object.disconnect(job.cancellable, job._handler)
+            job._handler = 0
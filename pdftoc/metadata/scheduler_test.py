@@ -0,0 +1,49 @@
+from gi.repository import GLib, Gio
+
+from pdftoc.metadata.scheduler import SubprocessScheduler
+
+
+def run_pending():
+    context = GLib.MainContext.default()
+    while context.iteration(False):
+        pass
+
+
+def test_scheduling_order():
+    scheduler = SubprocessScheduler(max_in_flight=2)
+    started = []
+    jobs = [
+        scheduler.submit(lambda job, i=i: started.append((i, job)), priority)
+        for i, priority in enumerate((0, 0, 0, 0, GLib.PRIORITY_HIGH))
+    ]
+    assert [i for i, _ in started] == [0, 1]
+    assert (scheduler.in_flight, len(scheduler)) == (2, 3)
+    scheduler.set_priority(jobs[3], GLib.PRIORITY_HIGH)
+    started[0][1].release()
+    started[0][1].release()
+    assert [i for i, _ in started] == [0, 1, 4]
+    started[1][1].release()
+    started[2][1].release()
+    assert [i for i, _ in started] == [0, 1, 4, 3, 2]
+    scheduler.max_in_flight = 4
+    assert scheduler.in_flight == 2
+
+
+def test_cancel_queued_job():
+    scheduler = SubprocessScheduler(max_in_flight=1)
+    started, cancelled = [], []
+    running = scheduler.submit(started.append)
+    cancellable = Gio.Cancellable()
+    scheduler.submit(started.append, cancellable=cancellable, on_cancelled=lambda: cancelled.append(1))
+    queued = scheduler.submit(started.append)
+    cancellable.cancel()
+    # cancellation is handled from the main loop
+    assert cancelled == [] and len(scheduler) == 2
+    run_pending()
+    assert cancelled == [1]
+    assert len(scheduler) == 1
+    running.release()
+    assert started == [running, queued]
+    # already cancelled: never queued
+    scheduler.submit(started.append, cancellable=cancellable, on_cancelled=lambda: cancelled.append(2))
+    assert cancelled == [1, 2] and len(scheduler) == 0
@@ -1,64 +1,88 @@
 import datetime
+from typing import Iterator, Optional
+
+from .document import Document
+from .parser import INFO_KEYS, format_date
+
+
+# Records of the output, encoded once. Formatting a whole record at once is faster than appending its fragments.
+NUMBER_OF_PAGES = b'NumberOfPages: %d\n'
+INFO = b'InfoBegin\nInfoKey: %s\nInfoValue: %s\n'
+BOOKMARK = b'BookmarkBegin\nBookmarkTitle: %s\nBookmarkPageNumber: %d\nBookmarkLevel: %d\n'
+PAGE_MEDIA_BEGIN = b'PageMediaBegin\n'
+PAGE_MEDIA_ENTRY = b'PageMedia%s: %s\n'
+
+# Line breaks in a value would start a new record
+LINE_BREAKS = str.maketrans('\r\n', '  ')
+
 
 class Serializer:
+    """
+    Formats a `Document` like `pdftk dump_data_utf8` does, so that parsing the output gives back the same document:
+    info dictionary entries (including `Document.infos`), unknown lines, number of pages, bookmarks and page medias.
 
-    def serialize(self, doc):
-        out = []
-        out.append('NumberOfPages: {}'.format(doc.num_pages))
-        if doc.title:
-            out.append(self._serialize_info('Title', doc.title))
-        if doc.subject:
-            out.append(self._serialize_info('Subject', doc.subject))
-        if doc.author:
-            out.append(self._serialize_info('Author', doc.author))
-        if doc.creation_date:
-            out.append(self._serialize_info('CreationDate', doc.creation_date))
-        if doc.modification_date:
-            out.append(self._serialize_info('ModDate', doc.modification_date))
-        if doc.producer:
-            out.append(self._serialize_info('Producer', doc.producer))
+    The output is written to a reusable byte buffer from pre-encoded record templates.
+    """
 
-        out.append(self._serialize_bookmarks(doc.bookmarks))
+    # Approximate size of the chunks yielded by `iter_chunks()`, in bytes
+    CHUNK_SIZE = 64 * 1024
 
-        # for pm in doc.page_medias:
-            # out.append(self._serialize_page_media(pm))
+    def serialize(self, doc: Document) -> str:
+        """
+        Returns the whole output, without a trailing newline.
+        """
+        buf = bytearray()
+        for _ in self._write(doc, buf, None):
+            pass
+        return buf[:-1].decode('utf8')
 
-        out.extend(doc.unknown)
+    def iter_chunks(self, doc: Document, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Yields the output in chunks of about `chunk_size` bytes, each line ending with a newline,
+        so that it can be streamed to a file or pipe without holding the whole output in memory.
+        """
+        buf = bytearray()
+        for _ in self._write(doc, buf, chunk_size):
+            yield bytes(buf)
+            buf.clear()
+        if buf:
+            yield bytes(buf)
 
-        return "\n".join(out)
+    def _write(self, doc: Document, buf: bytearray, flush_size: Optional[int]) -> Iterator[None]:
+        """
+        Appends the output to `buf`, yielding each time it holds at least `flush_size` bytes
+        (never if None), after which the caller is expected to empty it.
+        """
+        for key, name in INFO_KEYS.items():
+            value = getattr(doc, name)
+            if value:
+                self._write_info(buf, key, value)
+        for key, value in doc.infos.items():
+            self._write_info(buf, key, value)
+            if flush_size and len(buf) >= flush_size:
+                yield
+        for line in doc.unknown:
+            buf += line.encode('utf8')
+            buf += b'\n'
+            if flush_size and len(buf) >= flush_size:
+                yield
+        buf += NUMBER_OF_PAGES % doc.num_pages
 
-    def _serialize_info(self, k, v):
-        if isinstance(v, datetime.datetime):
-            v = v.strftime('D:%Y%m%d%H%M%S')
-            #TODO: timezone
-        return (
-            "InfoBegin\n"
-            "InfoKey: {}\n"
-            "InfoValue: {}"
-        ).format(k, v)
+        for level, title, page in doc.outline.iter_bookmarks():
+            if '\n' in title or '\r' in title:
+                title = title.translate(LINE_BREAKS)
+            buf += BOOKMARK % (title.encode('utf8'), page, level)
+            if flush_size and len(buf) >= flush_size:
+                yield
 
-    def _serialize_bookmarks(self, store, it=None, level=1):
-        if not it:
-            it = store.get_iter_first()
-            level = 1
-        out = []
-        while it is not None:
-            title, page = store[it][:]
-            out.append((
-                "BookmarkBegin\n"
-                "BookmarkTitle: {}\n"
-                "BookmarkPageNumber: {}\n"
-                "BookmarkLevel: {}"
-            ).format(title, page, level))
-            if store.iter_has_child(it):
-                child_it = store.iter_children(it)
-                children = self._serialize_bookmarks(store, child_it, level + 1)
-                out.append(children)
-            it = store.iter_next(it)
-        return "\n".join(out)
+        for media in doc.page_medias:
+            buf += PAGE_MEDIA_BEGIN
+            for key, value in media.items():
+                buf += PAGE_MEDIA_ENTRY % (key.capitalize().encode('utf8'), str(value).encode('utf8'))
+            if flush_size and len(buf) >= flush_size:
+                yield
 
-    def _serialize_page_media(self, pm):
-        out = ['PageMediaBegin']
-        for k, v in pm.items():
-            out.append('PageMedia{}: {}'.format(k, v))
-        return "\n".join(out)
+    def _write_info(self, buf: bytearray, key: str, value):
+        if isinstance(value, datetime.datetime):
+            value = format_date(value)
+        buf += INFO % (key.encode('utf8'), str(value).translate(LINE_BREAKS).encode('utf8'))
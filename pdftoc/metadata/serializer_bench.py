@@ -0,0 +1,35 @@
+"""
+Measures the parse -> serialize round trip throughput on a generated pdftk dump.
+
+Usage: python -m pdftoc.metadata.serializer_bench [NUMBER_OF_BOOKMARKS]
+"""
+import sys
+import time
+
+from .document import Document
+from .parser import Parser
+from .serializer import Serializer
+
+
+def generate_dump(count: int) -> str:
+    lines = ['InfoBegin', 'InfoKey: Title', 'InfoValue: Benchmark', f'NumberOfPages: {count}']
+    for i in range(count):
+        lines += ['BookmarkBegin', f'BookmarkTitle: Bookmark n°{i}', f'BookmarkLevel: {1 + i % 4}', f'BookmarkPageNumber: {i + 1}']
+    return '\n'.join(lines) + '\n'
+
+
+def main(count: int = 100_000):
+    dump = generate_dump(count)
+    start = time.perf_counter()
+    doc = Parser().parse(dump, Document())
+    parsed = time.perf_counter()
+    size = sum(len(chunk) for chunk in Serializer().iter_chunks(doc))
+    serialized = time.perf_counter()
+    assert Serializer().serialize(Parser().parse(Serializer().serialize(doc), Document())) == Serializer().serialize(doc)
+    for label, seconds in (('parse', parsed - start), ('serialize', serialized - parsed)):
+        print(f'{label:>10}: {seconds:.3f}s, {count / seconds:,.0f} bookmarks/s')
+    print(f'{"output":>10}: {size / 1024 / 1024:.1f} MiB')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
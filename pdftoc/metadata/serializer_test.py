@@ -0,0 +1,43 @@
+import datetime
+
+from pdftoc.metadata.document import Document
+from pdftoc.metadata.outline import OutlineTree
+from pdftoc.metadata.parser import Parser
+from pdftoc.metadata.parser_test import DUMP
+from pdftoc.metadata.serializer import Serializer
+
+
+def fields(doc: Document):
+    return {name: getattr(doc, name) for name in Document.__slots__ if name != 'outline'}, list(doc.outline.iter_bookmarks())
+
+
+def test_iter_chunks():
+    doc = Document()
+    doc.title = 'Été'
+    doc.outline = OutlineTree.from_bookmarks((1 + i % 3, f'Bookmark {i}', i + 1) for i in range(1000))
+    serializer = Serializer()
+    chunks = list(serializer.iter_chunks(doc, chunk_size=1024))
+    assert len(chunks) > 10
+    assert all(len(chunk) < 2048 for chunk in chunks)
+    assert b''.join(chunks).decode('utf8') == serializer.serialize(doc) + '\n'
+
+
+def test_iter_chunks_without_bookmarks():
+    doc = Document()
+    doc.num_pages = 1000
+    doc.page_medias = [{'number': i + 1, 'rotation': 0, 'rect': '0 0 612 792', 'dimensions': '612 792'} for i in range(1000)]
+    serializer = Serializer()
+    chunks = list(serializer.iter_chunks(doc, chunk_size=1024))
+    assert len(chunks) > 10
+    assert all(len(chunk) < 2048 for chunk in chunks)
+    assert b''.join(chunks).decode('utf8') == serializer.serialize(doc) + '\n'
+
+
+def test_round_trip():
+    doc = Parser().parse(DUMP, Document())
+    doc.creator = 'Créateur'
+    doc.creation_date = datetime.datetime(2020, 1, 2, 3, 4, 5, tzinfo=datetime.timezone(datetime.timedelta(hours=-5, minutes=-30)))
+    doc.modification_date = datetime.datetime(2021, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+    output = Serializer().serialize(doc)
+    assert Serializer().serialize(Parser().parse(output, Document())) == output
+    assert fields(Parser().parse(output, Document())) == fields(doc)
@@ -0,0 +1,378 @@
+"""
+Long-lived helper processes reading and writing documents on behalf of the application.
+
+A helper serves requests over its stdin and stdout, each message being a JSON header and a binary body
+(a packed document, see `pdftoc.metadata.packing`), both prefixed by their size.
+It reads documents with the native backend and falls back to pdftk, so the Python startup cost
+and module imports are paid once, and parsing happens outside of the application process.
+
+Usage: python -m pdftoc.metadata.worker
+"""
+import atexit
+import itertools
+import json
+import os
+import select
+import struct
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from shutil import which
+from typing import BinaryIO, List, Optional, Tuple
+
+from . import native, pdftk
+from .document import Document
+from .packing import pack_document, unpack_document, unpack_header
+from .pdf.objects import PDFError
+
+
+FRAME = struct.Struct('<I')
+# Directory holding the pdftoc package, so that helpers can import it whatever the working directory
+PACKAGE_ROOT = str(Path(__file__).absolute().parents[2])
+# Errors of the native backend after which pdftk is tried, in 'auto' mode
+FALLBACK_ERRORS = (PDFError, OSError)
+
+
+class WorkerError(Exception):
+    """
+    A request failed in the helper process.
+    """
+
+
+class WorkerCrashed(WorkerError):
+    """
+    The helper process exited or stopped responding.
+    """
+
+
+class WorkerTimeout(WorkerCrashed):
+    """
+    The helper process did not answer in time, and was killed.
+    """
+
+
+def write_message(fp: BinaryIO, header: dict, body: bytes = b''):
+    data = json.dumps(header, separators=(',', ':')).encode('utf8')
+    view = memoryview(b''.join((FRAME.pack(len(data)), data, FRAME.pack(len(body)), body)))
+    # Unbuffered streams may write partially
+    while view:
+        view = view[fp.write(view):]
+    fp.flush()
+
+
+def read_message(fp: BinaryIO, deadline: Optional[float] = None) -> Tuple[dict, bytes]:
+    """
+    Reads a message from `fp`, raising EOFError if the stream ends,
+    or TimeoutError if it is not received before the `time.monotonic()` `deadline`.
+    """
+    header = json.loads(_read_frame(fp, deadline))
+    return header, _read_frame(fp, deadline)
+
+
+def _read_frame(fp: BinaryIO, deadline: Optional[float]) -> bytes:
+    size, = FRAME.unpack(_read_exactly(fp, FRAME.size, deadline))
+    return _read_exactly(fp, size, deadline)
+
+
+def _read_exactly(fp: BinaryIO, size: int, deadline: Optional[float]) -> bytes:
+    parts = []
+    while size:
+        if deadline is not None:
+            ready, _, _ = select.select([fp], [], [], max(0.0, deadline - time.monotonic()))
+            if not ready:
+                raise TimeoutError('No response from the helper process')
+        # Reads are unbuffered, so that select() sees all pending data
+        chunk = fp.read(size)
+        if not chunk:
+            raise EOFError
+        parts.append(chunk)
+        size -= len(chunk)
+    return b''.join(parts)
+
+
+def read_document(doc: Document, backend: str = 'auto') -> Document:
+    """
+    Reads `doc` with the native backend, falling back to pdftk unless `backend` is 'native'.
+    """
+    if backend != 'pdftk':
+        try:
+            return native.read_document(doc)
+        except FALLBACK_ERRORS:
+            if backend == 'native' or not which('pdftk'):
+                raise
+    return pdftk.read_document(doc)
+
+
+def write_document(doc: Document, dst: Optional[str] = None, backend: str = 'auto', in_place: bool = False) -> str:
+    """
+    Saves `doc` with an incremental update, falling back to pdftk unless `backend` is 'incremental'.
+    """
+    if backend != 'pdftk':
+        try:
+            return native.update_document(doc, dst, in_place)
+        except FALLBACK_ERRORS:
+            if backend == 'incremental' or not which('pdftk'):
+                raise
+    return pdftk.update_document(doc, dst)
+
+
+def handle_request(header: dict, body: bytes) -> Tuple[dict, bytes]:
+    op = header.get('op')
+    if op == 'ping':
+        return {'ok': True, 'pid': os.getpid()}, b''
+    if op == 'load':
+        doc = read_document(Document(header['path']), header.get('backend', 'auto'))
+        return {'ok': True}, pack_document(doc)
+    if op == 'write':
+        doc_header = unpack_header(body)
+        doc = unpack_document(body, Document(doc_header['path']), doc_header)
+        path = write_document(doc, header.get('dst'), header.get('backend', 'auto'), header.get('in_place', False))
+        return {'ok': True, 'path': path}, b''
+    raise ValueError(f'Unknown operation: {op}')
+
+
+def serve(requests: BinaryIO, responses: BinaryIO):
+    """
+    Answers requests until the input stream is closed.
+    """
+    while True:
+        try:
+            header, body = read_message(requests)
+        except EOFError:
+            return
+        try:
+            response, data = handle_request(header, body)
+        except Exception as err:
+            response, data = {'ok': False, 'error': str(err) or type(err).__name__}, b''
+        response['id'] = header.get('id')
+        write_message(responses, response, data)
+
+
+class WorkerProcess:
+    """
+    Client side of a helper process, started on first use and restarted when it crashes.
+    Not thread-safe, see `WorkerPool`.
+    """
+
+    # Maximum time (in seconds) a helper may take to answer a health check
+    PING_TIMEOUT = 5.0
+
+    def __init__(self, argv: Optional[List[str]] = None):
+        self.argv = argv or [sys.executable, '-m', __name__]
+        self.process: Optional[subprocess.Popen] = None
+        self.last_used = 0.0
+        self._ids = itertools.count()
+
+    @property
+    def running(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def request(self, header: dict, body: bytes = b'', timeout: Optional[float] = None) -> Tuple[dict, bytes]:
+        """
+        Sends a request and waits for its response. Raises `WorkerCrashed` if the helper died or timed out,
+        in which case it is restarted on the next request.
+        """
+        if not self.running:
+            self.start()
+        header = dict(header, id=next(self._ids))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            write_message(self.process.stdin, header, body)
+            response, data = read_message(self.process.stdout, deadline)
+        except TimeoutError as err:
+            self.kill()
+            raise WorkerTimeout(f'Helper process did not answer within {timeout} seconds') from err
+        except (OSError, EOFError, ValueError) as err:
+            self.kill()
+            raise WorkerCrashed(f'Helper process failed: {err or type(err).__name__}') from err
+        if response.get('id') != header['id']:
+            self.kill()
+            raise WorkerCrashed('Unexpected response from the helper process')
+        self.last_used = time.monotonic()
+        return response, data
+
+    def ping(self) -> bool:
+        """
+        Checks that the helper answers in time.
+        """
+        try:
+            response, _ = self.request({'op': 'ping'}, timeout=self.PING_TIMEOUT)
+        except WorkerCrashed:
+            return False
+        return response.get('ok', False)
+
+    def start(self):
+        self.kill()
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, (PACKAGE_ROOT, env.get('PYTHONPATH'))))
+        self.process = subprocess.Popen(
+            self.argv,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            bufsize=0,
+            env=env
+        )
+        self.last_used = time.monotonic()
+
+    def close(self):
+        """
+        Asks the helper to exit by closing its input.
+        """
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=1)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+    def terminate(self):
+        """
+        Kills the helper from another thread. The thread waiting for its response gets a `WorkerCrashed` error,
+        and releases its resources.
+        """
+        process = self.process
+        if process is not None and process.poll() is None:
+            process.kill()
+
+    def kill(self):
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+        self.process = None
+
+
+class WorkerPool:
+    """
+    Helper processes shared by all loaders and writers, started on demand up to `size`.
+
+    Requests block until a helper is available. A helper that has been idle for longer than
+    `HEALTH_CHECK_INTERVAL` is pinged before being used, and restarted if it does not answer.
+    A helper that does not answer a request within `timeout` seconds is killed, and replaced on the next request.
+    Loads are retried once on a fresh helper if theirs crashed, writes are not, since they may have been applied.
+    Neither is retried after a timeout.
+    """
+
+    # Minimum idle time (in seconds) after which a helper is checked before being used
+    HEALTH_CHECK_INTERVAL = 30.0
+    DEFAULT_SIZE = 2
+    DEFAULT_TIMEOUT = 300.0
+
+    _default: Optional['WorkerPool'] = None
+
+    @classmethod
+    def get_default(cls) -> 'WorkerPool':
+        if cls._default is None:
+            cls._default = cls()
+            atexit.register(cls._default.close)
+        return cls._default
+
+    def __init__(self, size: int = DEFAULT_SIZE, argv: Optional[List[str]] = None,
+                 timeout: Optional[float] = DEFAULT_TIMEOUT):
+        self.size = max(1, size)
+        self.argv = argv
+        self.timeout = timeout
+        self._idle: List[WorkerProcess] = []
+        self._busy: List[WorkerProcess] = []
+        self._count = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def load(self, doc: Document, backend: str = 'auto') -> Document:
+        """
+        Reads `doc.path` into `doc` in a helper process. Blocks until done.
+        """
+        _, data = self._request({'op': 'load', 'path': doc.path, 'backend': backend}, retry=True)
+        return unpack_document(data, doc)
+
+    def write(self, doc: Document, dst: Optional[str] = None, backend: str = 'auto', in_place: bool = False) -> str:
+        """
+        Saves `doc` in a helper process and returns the path of the saved file. Blocks until done.
+        """
+        header = {'op': 'write', 'dst': dst, 'backend': backend, 'in_place': in_place}
+        response, _ = self._request(header, pack_document(doc))
+        return response['path']
+
+    def close(self):
+        """
+        Stops the idle helpers, and kills the busy ones, whose requests fail with `WorkerCrashed`.
+        Requests made afterwards fail with `WorkerError`.
+        """
+        with self._condition:
+            self._closed = True
+            workers, self._idle = self._idle, []
+            busy = list(self._busy)
+            self._count -= len(workers)
+            self._condition.notify_all()
+        for worker in busy:
+            worker.terminate()
+        for worker in workers:
+            worker.close()
+
+    def _request(self, header: dict, body: bytes = b'', retry: bool = False) -> Tuple[dict, bytes]:
+        worker = self._acquire()
+        try:
+            try:
+                response, data = worker.request(header, body, self.timeout)
+            except WorkerTimeout:
+                raise
+            except WorkerCrashed:
+                if not retry or self._closed:
+                    raise
+                response, data = worker.request(header, body, self.timeout)
+        finally:
+            self._release(worker)
+        if not response.get('ok'):
+            raise WorkerError(response.get('error', 'Unknown error'))
+        return response, data
+
+    def _acquire(self) -> WorkerProcess:
+        with self._condition:
+            while not self._closed and not self._idle and self._count >= self.size:
+                self._condition.wait()
+            if self._closed:
+                raise WorkerError('The helper processes were shut down')
+            if self._idle:
+                worker = self._idle.pop()
+            else:
+                worker = WorkerProcess(self.argv)
+                self._count += 1
+            self._busy.append(worker)
+        if worker.running and time.monotonic() - worker.last_used > self.HEALTH_CHECK_INTERVAL and not worker.ping():
+            worker.kill()
+        return worker
+
+    def _release(self, worker: WorkerProcess):
+        with self._condition:
+            self._busy.remove(worker)
+            closed = self._closed
+            if closed:
+                self._count -= 1
+            else:
+                self._idle.append(worker)
+                self._condition.notify()
+        if closed:
+            worker.kill()
+
+
+def main():
+    # Anything printed by the backends must not end up in the responses
+    responses = os.fdopen(os.dup(sys.stdout.fileno()), 'wb', buffering=0)
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    requests = os.fdopen(os.dup(sys.stdin.fileno()), 'rb', buffering=0)
+    serve(requests, responses)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+import sys
+import threading
+import time
+
+import pytest
+
+from pdftoc.metadata import native
+from pdftoc.metadata.document import Document
+from pdftoc.metadata.pdf.reader_test import SAMPLE
+from pdftoc.metadata.worker import WorkerCrashed, WorkerError, WorkerPool, WorkerTimeout
+
+
+@pytest.fixture
+def pool():
+    pool = WorkerPool(size=1)
+    yield pool
+    pool.close()
+
+
+def test_load_and_write(tmp_path, pool):
+    path = tmp_path / 'sample.pdf'
+    path.write_bytes(SAMPLE)
+    doc = pool.load(Document(str(path)))
+    expected = native.read_document(Document(str(path)))
+    assert list(doc.outline.iter_bookmarks()) == list(expected.outline.iter_bookmarks())
+    assert (doc.title, doc.author, doc.num_pages) == ('A Book', 'Me', 2)
+
+    doc.title = 'New title'
+    output = pool.write(doc, str(tmp_path / 'out.pdf'), backend='incremental')
+    assert native.read_document(Document(output)).title == 'New title'
+    with pytest.raises(WorkerError):
+        pool.load(Document(str(tmp_path / 'missing.pdf')))
+
+
+def test_restart_crashed_helper(tmp_path, pool):
+    path = tmp_path / 'sample.pdf'
+    path.write_bytes(SAMPLE)
+    pool.load(Document(str(path)))
+    worker = pool._idle[0]
+    pid = worker.process.pid
+    worker.process.kill()
+    worker.process.wait()
+    assert pool.load(Document(str(path))).title == 'A Book'
+    assert worker.process.pid != pid
+    # a helper that does not answer health checks is replaced
+    worker.last_used -= WorkerPool.HEALTH_CHECK_INTERVAL
+    worker.process.stdin.close()
+    assert pool.load(Document(str(path))).title == 'A Book'
+
+
+def test_helpers_that_never_reply_are_killed(tmp_path):
+    path = tmp_path / 'sample.pdf'
+    path.write_bytes(SAMPLE)
+    # a helper reading requests without ever answering them
+    argv = [sys.executable, '-c', 'import sys, time\nwhile sys.stdin.buffer.read(1): pass\ntime.sleep(60)']
+    pool = WorkerPool(size=1, argv=argv, timeout=0.5)
+    start = time.monotonic()
+    with pytest.raises(WorkerTimeout):
+        pool.load(Document(str(path)))
+    assert time.monotonic() - start < 5
+    assert not pool._idle[0].running
+
+    # without timeout, closing the pool kills the busy helper
+    pool.timeout = None
+    errors = []
+
+    def load():
+        try:
+            pool.load(Document(str(path)))
+        except WorkerCrashed as err:
+            errors.append(err)
+
+    thread = threading.Thread(target=load)
+    thread.start()
+    while not pool._busy or not pool._busy[0].running:
+        time.sleep(0.01)
+    process = pool._busy[0].process
+    pool.close()
+    thread.join(5)
+    assert not thread.is_alive() and len(errors) == 1
+    assert process.poll() is not None
+    with pytest.raises(WorkerError):
+        pool.load(Document(str(path)))
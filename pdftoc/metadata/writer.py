@@ -1,21 +1,29 @@
 import os
+import threading
+from functools import partial
 from os.path import dirname
 from shutil import which
 import tempfile
+from typing import Iterator, Optional
 
 from gi.repository import GObject, GLib, Gio
 
 from ..utils import local_now
+from . import native
+from .scheduler import Job, SubprocessScheduler
+from .worker import FALLBACK_ERRORS, WorkerPool
 from .serializer import Serializer
 
 
-def write(doc, path=None, on_success=None, on_error=None):
-    writer = Writer()
+def write(doc, path=None, on_success=None, on_error=None, backend=None, in_place=False, priority=GLib.PRIORITY_DEFAULT,
+          cancellable=None):
+    writer = Writer(backend or Writer.BACKEND_PDFTK)
     if callable(on_success):
         writer.connect('success', on_success)
     if callable(on_error):
         writer.connect('error', on_error)
-    writer.write(doc, path)
+    writer.write(doc, path, in_place, priority, cancellable)
+    return writer
 
 
 class Writer(GObject.GObject):
@@ -25,49 +33,201 @@ class Writer(GObject.GObject):
         'success': (GObject.SIGNAL_RUN_FIRST, None, (object, str)),
         # args=(Document,)
         'error': (GObject.SIGNAL_RUN_FIRST, None, (object,)),
+        'cancelled': (GObject.SIGNAL_RUN_FIRST, None, ()),
         'complete': (GObject.SIGNAL_RUN_FIRST, None, ())
     }
 
-    def __init__(self):
+    # Rewrites the whole document with `pdftk update_info_utf8`.
+    BACKEND_PDFTK = 'pdftk'
+    # Appends an incremental update section, in a worker thread.
+    BACKEND_INCREMENTAL = 'incremental'
+    # Tries an incremental update first, falling back to pdftk for files it cannot handle.
+    BACKEND_AUTO = 'auto'
+    # Same as BACKEND_AUTO, in a long-lived helper process shared with the other loaders and writers.
+    BACKEND_WORKER = 'worker'
+
+    def __init__(self, backend: str = BACKEND_PDFTK, scheduler: SubprocessScheduler = None, workers: WorkerPool = None):
         super().__init__()
+        if backend not in (self.BACKEND_PDFTK, self.BACKEND_INCREMENTAL, self.BACKEND_AUTO, self.BACKEND_WORKER):
+            raise ValueError(backend)
+        self.backend = backend
+        self.scheduler = scheduler if scheduler is not None else SubprocessScheduler.get_default()
+        # Helper processes of BACKEND_WORKER, defaults to the shared pool
+        self.workers = workers
+        self._priority = GLib.PRIORITY_DEFAULT
+        self._cancellable = None
+
+    def write(self, doc, dst=None, in_place=False, priority=GLib.PRIORITY_DEFAULT, cancellable=None):
+        """
+        Saves `doc` to `dst` (defaults to `doc.path`).
+
+        `doc` is a plain `Document` (i.e. from `DocumentModel.to_document()`),
+        that must not be modified until the 'complete' signal is emitted.
+
+        When using incremental updates and `in_place` is true,
+        the update is appended directly to the original file instead of a copy of it.
+        pdftk is run once the scheduler has a free slot, according to `priority`.
+
+        Cancelling `cancellable` while the save is waiting for a slot drops it, emitting 'cancelled' then 'complete'.
+        Saves that have started are not interrupted.
+        """
+        self._priority = priority
+        self._cancellable = cancellable
+        if self.backend == self.BACKEND_WORKER and doc.path:
+            self.scheduler.submit(
+                partial(self._start_worker_request, doc, dst, in_place),
+                priority,
+                cancellable,
+                self._on_job_cancelled
+            )
+            return
+        if self.backend != self.BACKEND_PDFTK and doc.path:
+            thread = threading.Thread(target=self._update_in_thread, args=(doc, dst, in_place), daemon=True)
+            thread.start()
+            return
+        self._write_with_pdftk(doc, dst)
 
-    def write(self, doc, dst=None):
+    def _on_job_cancelled(self):
+        self.emit('cancelled')
+        self.emit('complete')
+
+    def _start_worker_request(self, doc, dst, in_place, slot: Job):
+        thread = threading.Thread(target=self._write_with_worker_in_thread, args=(doc, dst, in_place, slot), daemon=True)
+        thread.start()
+
+    def _write_with_worker_in_thread(self, doc, dst, in_place, slot: Job):
+        """
+        Runs in a worker thread: waits for a helper process to save the document.
+        """
+        try:
+            path = (self.workers or WorkerPool.get_default()).write(doc, dst, in_place=in_place)
+        except Exception as err:
+            GLib.idle_add(self._emit_in_main_thread, 'error', err)
+            GLib.idle_add(self._emit_in_main_thread, 'complete')
+            return
+        finally:
+            GLib.idle_add(self._release_in_main_thread, slot)
+        GLib.idle_add(self._emit_in_main_thread, 'success', doc, path)
+        GLib.idle_add(self._emit_in_main_thread, 'complete')
+
+    def _release_in_main_thread(self, slot: Job):
+        slot.release()
+        return GLib.SOURCE_REMOVE
+
+    def _update_in_thread(self, doc, dst, in_place):
+        try:
+            path = native.update_document(doc, dst, in_place)
+        except FALLBACK_ERRORS as err:
+            if self.backend == self.BACKEND_AUTO:
+                GLib.idle_add(self._write_with_pdftk, doc, dst)
+                return
+            GLib.idle_add(self._emit_in_main_thread, 'error', err)
+            GLib.idle_add(self._emit_in_main_thread, 'complete')
+            return
+        except Exception as err:
+            GLib.idle_add(self._emit_in_main_thread, 'error', err)
+            GLib.idle_add(self._emit_in_main_thread, 'complete')
+            return
+        GLib.idle_add(self._emit_in_main_thread, 'success', doc, path)
+        GLib.idle_add(self._emit_in_main_thread, 'complete')
+
+    def _emit_in_main_thread(self, signal, *args):
+        self.emit(signal, *args)
+        return GLib.SOURCE_REMOVE
+
+    def _write_with_pdftk(self, doc, dst=None):
         pdftk = which('pdftk')
         if not pdftk:
             self.emit('error', 'pdftk executable not found')
-            return
+            return GLib.SOURCE_REMOVE
         if not doc.path:
             self.emit('error', 'Document was not loaded from disk')
-            return
+            return GLib.SOURCE_REMOVE
         if not dst:
             dst = doc.path
+        self.scheduler.submit(
+            partial(self._start_pdftk, pdftk, doc, dst),
+            self._priority,
+            self._cancellable,
+            self._on_job_cancelled
+        )
+        return GLib.SOURCE_REMOVE
+
+    def _start_pdftk(self, pdftk, doc, dst, slot: Job):
         try:
-            stdin = Serializer().serialize(doc)
-        except Exception as err:
+            fd, outfile = tempfile.mkstemp(dir=dirname(dst))
+            os.close(fd)
+        except OSError as err:
+            slot.release()
+            self.emit('error', err)
+            self.emit('complete')
+            return
+        try:
+            p = Gio.Subprocess.new(
+                argv=[pdftk, doc.path, 'update_info_utf8', '-', 'output', outfile],
+                flags=Gio.SubprocessFlags.STDIN_PIPE
+            )
+        except GLib.Error as err:
+            slot.release()
+            self._maybe_delete_file(outfile)
             self.emit('error', err)
             self.emit('complete')
             return
 
-        _, outfile = tempfile.mkstemp(dir=dirname(dst))
+        job = _PdftkJob(doc, dst, outfile, p, Serializer().iter_chunks(doc), slot)
+        self._write_next_chunk(job)
 
-        p = Gio.Subprocess.new(
-            argv=[pdftk, doc.path, 'update_info_utf8', '-', 'output', outfile],
-            flags=Gio.SubprocessFlags.STDIN_PIPE
-        )
-        p.communicate_utf8_async(
-            stdin_buf=stdin,
-            callback=self._on_subprocess_complete,
-            user_data=(doc, outfile, dst)
-        )
+    def _write_next_chunk(self, job: '_PdftkJob'):
+        """
+        Writes the next chunk of serialized metadata to the stdin of pdftk.
+        Chunks are only serialized once the previous one has been written, so that at most one is held in memory.
+        """
+        try:
+            chunk = next(job.chunks, None)
+        except Exception as err:
+            # pdftk must not save a truncated outline
+            job.error = err
+            job.process.force_exit()
+            chunk = None
+        if chunk is None:
+            job.stdin.close_async(GLib.PRIORITY_DEFAULT, None, self._on_stdin_closed, job)
+            return
+        self._write_bytes(job, GLib.Bytes.new(chunk))
+
+    def _write_bytes(self, job: '_PdftkJob', data: GLib.Bytes):
+        job.stdin.write_bytes_async(data, GLib.PRIORITY_DEFAULT, None, self._on_chunk_written, (job, data))
 
-    def _on_subprocess_complete(self, subprocess, result, user_data):
-        doc, outfile, dst = user_data
+    def _on_chunk_written(self, stream, result, user_data):
+        job, data = user_data
         try:
-            success, stdout, _ = subprocess.communicate_utf8_finish(result)
-            os.replace(outfile, dst)
-            self.emit('success', doc, dst)
+            written = stream.write_bytes_finish(result)
         except GLib.Error as err:
-            self._maybe_delete_file(outfile)
+            # i.e. pdftk exited early: its exit status tells why
+            job.error = err
+            stream.close_async(GLib.PRIORITY_DEFAULT, None, self._on_stdin_closed, job)
+            return
+        if written < data.get_size():
+            self._write_bytes(job, GLib.Bytes.new_from_bytes(data, written, data.get_size() - written))
+            return
+        self._write_next_chunk(job)
+
+    def _on_stdin_closed(self, stream, result, job: '_PdftkJob'):
+        try:
+            stream.close_finish(result)
+        except GLib.Error:
+            pass
+        job.process.wait_check_async(None, self._on_subprocess_complete, job)
+
+    def _on_subprocess_complete(self, subprocess, result, job: '_PdftkJob'):
+        job.slot.release()
+        try:
+            subprocess.wait_check_finish(result)
+            if job.error is not None:
+                raise job.error
+            os.replace(job.outfile, job.dst)
+            self.emit('success', job.doc, job.dst)
+        except Exception as err:
+            self._maybe_delete_file(job.outfile)
             self.emit('error', err)
         self.emit('complete')
 
@@ -77,3 +237,22 @@ class Writer(GObject.GObject):
         except FileNotFoundError:
             pass
 
+
+class _PdftkJob:
+    """
+    State of a pdftk invocation being fed from `Serializer.iter_chunks()`.
+    """
+
+    __slots__ = ('doc', 'dst', 'outfile', 'process', 'stdin', 'chunks', 'slot', 'error')
+
+    def __init__(self, doc, dst: str, outfile: str, process: Gio.Subprocess, chunks: Iterator[bytes], slot: Job):
+        self.doc = doc
+        self.dst = dst
+        self.outfile = outfile
+        self.process = process
+        self.stdin: Gio.OutputStream = process.get_stdin_pipe()
+        self.chunks = chunks
+        # Scheduler slot held until the process exits
+        self.slot = slot
+        # First error that occurred while feeding the process
+        self.error: Optional[Exception] = None
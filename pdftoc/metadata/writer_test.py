@@ -0,0 +1,24 @@
+from gi.repository import GLib, Gio
+
+from pdftoc.metadata.document import Document
+from pdftoc.metadata.scheduler import SubprocessScheduler
+from pdftoc.metadata.scheduler_test import run_pending
+from pdftoc.metadata.writer import Writer
+
+
+def test_cancel_queued_save():
+    scheduler = SubprocessScheduler(max_in_flight=1)
+    running = scheduler.submit(lambda job: None)
+    writer = Writer(Writer.BACKEND_WORKER, scheduler=scheduler)
+    signals = []
+    for name in ('success', 'error', 'cancelled', 'complete'):
+        writer.connect(name, lambda *args, name=name: signals.append(name))
+    cancellable = Gio.Cancellable()
+    writer.write(Document('book.pdf'), priority=GLib.PRIORITY_HIGH, cancellable=cancellable)
+    assert len(scheduler) == 1
+    cancellable.cancel()
+    run_pending()
+    assert signals == ['cancelled', 'complete']
+    assert len(scheduler) == 0
+    running.release()
+    assert scheduler.in_flight == 0
@@ -1,4 +1,5 @@
 import sys
+from contextlib import contextmanager, nullcontext
 from typing import Tuple, List
 
 from gi.repository import GObject, GLib, Gtk, Gdk, Gio
@@ -12,8 +13,13 @@ from .edit_form import EditForm
 
 class TOCController(GObject.GObject):
 
+    # Minimum number of selected rows for which edits are made with the model detached from the view
+    BULK_EDIT_MIN_ROWS = 20
+
     def __init__(self, app, builder):
         super().__init__()
+        self._app = app
+        self._bulk_edit_depth = 0
         self.container = builder.get_object('toc_container')
         self.scrolled_window = builder.get_object('toc_scrolledwindow')
         self.view = builder.get_object('toc_treeview')
@@ -40,15 +46,15 @@ class TOCController(GObject.GObject):
         self.view.append_column(column)
 
         self.view.connect('row-activated', self._on_row_activated)
+        self.view.connect('test-expand-row', self._on_test_expand_row)
         self.view.connect('button-release-event', self._on_button_release_event)
         self.view.connect('popup-menu', self._on_popup_menu)
-        self.view.get_selection().connect('changed', self._on_selection_changed)
-
-        self.edit_form = EditForm(builder)
-        self.edit_form.connect('submit', self._on_edit_form_submit)
+        self.view.connect('drag-data-received', self._on_drag_data_received)
+        self._selection_handler = self.view.get_selection().connect('changed', self._on_selection_changed)
 
-        self.context_menu = TOCContextMenu()
-        self.context_menu.attach_to_widget(self.view)
+        # Built on first use
+        self._edit_form = None
+        self._context_menu = None
 
     def get_model(self):
         return self.view.get_model()
@@ -58,6 +64,69 @@ class TOCController(GObject.GObject):
 
     model = property(get_model, set_model)
 
+    @property
+    def edit_form(self) -> EditForm:
+        if self._edit_form is None:
+            self._edit_form = EditForm(self._app.resources.new_builder('edit_form.ui'))
+            self._edit_form.popover.set_relative_to(self.view)
+            self._edit_form.connect('submit', self._on_edit_form_submit)
+        return self._edit_form
+
+    @property
+    def context_menu(self) -> TOCContextMenu:
+        if self._context_menu is None:
+            self._context_menu = TOCContextMenu()
+            self._context_menu.attach_to_widget(self.view)
+        return self._context_menu
+
+    @contextmanager
+    def bulk_edit(self):
+        """
+        Detaches the model from the view while the block runs, so that the view is laid out once at the end
+        instead of after every change. Yields the model.
+
+        Selected and expanded rows, and the first visible row, are restored afterwards if they still exist.
+        """
+        model = self.view.get_model()
+        if model is None or self._bulk_edit_depth:
+            self._bulk_edit_depth += 1
+            try:
+                yield model
+            finally:
+                self._bulk_edit_depth -= 1
+            return
+
+        selection = self.view.get_selection()
+        _, selected_paths = selection.get_selected_rows()
+        selected = [Gtk.TreeRowReference(model, path) for path in selected_paths]
+        expanded = []
+        self.view.map_expanded_rows(lambda view, path, *data: expanded.append(Gtk.TreeRowReference(model, path)))
+        visible_range = self.view.get_visible_range()
+        first_visible = Gtk.TreeRowReference(model, visible_range[0]) if visible_range else None
+
+        self._bulk_edit_depth += 1
+        selection.handler_block(self._selection_handler)
+        self.view.set_model(None)
+        try:
+            yield model
+        finally:
+            self._bulk_edit_depth -= 1
+            self.view.set_model(model)
+            # expanded rows are listed parents first
+            for ref in expanded:
+                if ref.valid():
+                    self.view.expand_row(ref.get_path(), False)
+            for ref in selected:
+                if ref.valid():
+                    selection.select_path(ref.get_path())
+            if first_visible and first_visible.valid():
+                self.view.scroll_to_cell(first_visible.get_path(), None, True, 0.0, 0.0)
+            selection.handler_unblock(self._selection_handler)
+            self._on_selection_changed(selection)
+
+    def _bulk_edit_for(self, num_rows: int):
+        return self.bulk_edit() if num_rows >= self.BULK_EDIT_MIN_ROWS else nullcontext()
+
     def _on_action_add_row(self, *args):
         it = self.model.append(None, ('', 1))
         self.start_editing(it)
@@ -69,11 +138,12 @@ class TOCController(GObject.GObject):
 
     def _on_action_remove_row(self, action: Gio.Action, param: GLib.Variant, arg):
         model, refs = self._get_selected_refs()
-        for ref in refs:
-            if not ref.valid():
-                continue
-            it = model.get_iter(ref.get_path())
-            model.remove(it)
+        with self._bulk_edit_for(len(refs)), model.group_changes():
+            for ref in refs:
+                if not ref.valid():
+                    continue
+                it = model.get_iter(ref.get_path())
+                model.remove(it)
 
     def _on_action_create_row(self, action: Gio.Action, param: GLib.Variant, arg):
         where = param.get_string()
@@ -103,14 +173,11 @@ class TOCController(GObject.GObject):
         self.view.row_activated(path, self.view.get_column(col))
 
     def _on_action_move_row(self, action: Gio.Action, param: GLib.Variant, *args):
-        model, refs = self._get_selected_refs()
-        if not refs:
+        model, paths = self._get_selected_rows()
+        if not paths:
             return
-        move_row = getattr(model, f'move_row_{param.get_string()}')
-        paths = []
-        for ref in refs:
-            it = move_row(model.get_iter(ref.get_path()))
-            paths.append(model.get_path(it))
+        with self._bulk_edit_for(len(paths)):
+            paths = model.move_rows(paths, param.get_string())
         self._set_selected_paths(paths)
 
     def _on_selection_changed(self, selection: Gtk.TreeSelection):
@@ -122,6 +189,11 @@ class TOCController(GObject.GObject):
         self.actions.lookup_action('delete-row').set_enabled(length >= 1)
         self.actions.lookup_action('move-row').set_enabled(length >= 1)
 
+    def _on_test_expand_row(self, view, it, path):
+        # rows are loaded when their parent is expanded for the first time
+        view.get_model().load_children(it)
+        return False
+
     def _on_row_activated(self, treeview, path, col):
         renderer = col.get_cells()[0]
         coords = renderer.get_activated_cell_coords()
@@ -133,8 +205,37 @@ class TOCController(GObject.GObject):
     def _on_edit_form_submit(self, form, title, page):
         model, paths = self._get_selected_rows()
         if paths:
-            model.set_title(paths[0], title)
-            model.set_page(paths[0], page)
+            with model.group_changes():
+                model.set_title(paths[0], title)
+                model.set_page(paths[0], page)
+
+    def _on_drag_data_received(self, view, context, x, y, selection, info, time):
+        """
+        Moves dropped rows with `OutlineStore.move_row()`, so that the move is recorded in the undo history,
+        instead of letting the store copy the row then remove the original from C.
+        """
+        model = view.get_model()
+        ok, src_model, src_path = Gtk.tree_get_row_drag_data(selection)
+        if not ok or src_model is not model:
+            return
+        view.stop_emission_by_name('drag-data-received')
+        view.set_drag_dest_row(None, Gtk.TreeViewDropPosition.BEFORE)
+        dest = view.get_dest_row_at_pos(x, y)
+        if dest is None:
+            dest_path = Gtk.TreePath.new_from_indices([model.iter_n_children(None)])
+        else:
+            # Same logic as the tree view: rows dropped into another one become its first child
+            dest_path, position = dest
+            if position in (Gtk.TreeViewDropPosition.INTO_OR_BEFORE, Gtk.TreeViewDropPosition.INTO_OR_AFTER):
+                dest_path.down()
+            elif position == Gtk.TreeViewDropPosition.AFTER:
+                dest_path.next()
+        if src_path == dest_path or src_path.is_ancestor(dest_path):
+            Gtk.drag_finish(context, False, False, time)
+            return
+        it = model.move_row(model.get_iter(src_path), dest_path)
+        # The source row is already gone, it must not be deleted again
+        Gtk.drag_finish(context, it is not None, False, time)
 
     def _on_button_release_event(self, treeview, event):
         if event.button == 3:
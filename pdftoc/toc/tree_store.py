@@ -1,10 +1,13 @@
-from typing import Optional, Union, Iterable, Generator
+from typing import Optional, Union, Iterable, Iterator, Generator, List, Tuple
 
 from gi.repository import Gtk
 
 from .types import TreePathType, ModelKeyType
 
 
+MOVE_DIRECTIONS = ('up', 'down', 'left', 'right')
+
+
 def coerce_path(path: TreePathType) -> Gtk.TreePath:
     if isinstance(path, Gtk.TreePath):
         return path
@@ -22,17 +25,49 @@ class TreeStore(Gtk.TreeStore):
         return '\n'.join(buf)
 
     def descendants(self, key: ModelKeyType = None) -> Generator[Gtk.TreeModelRow, None, None]:
-        if not key:
-            for row in self:
-                yield from self.descendants(row.iter)
-        else:
-            row: Gtk.TreeModelRow = self[key]
+        for _, _, row in self.iter_preorder(key or None):
             yield row
-            for child in row.iterchildren():
-                yield from self.descendants(child.iter)
+
+    def iter_preorder(
+        self,
+        key: ModelKeyType = None,
+        max_depth: Optional[int] = None
+    ) -> Iterator[Tuple[Gtk.TreePath, int, Gtk.TreeModelRow]]:
+        """
+        Yields a (path, level, row) tuple for the row at `key` and its descendants
+        (all rows if `key` is None), parents first. Levels are 1-indexed.
+
+        If `max_depth` is given, only rows up to `max_depth` levels below `key` are visited (1 being `key` itself).
+        """
+        for it, indices, _ in self._walk(key, max_depth, post_order=False):
+            if not self._is_hidden(it):
+                yield Gtk.TreePath.new_from_indices(indices), len(indices), self[it]
+
+    def iter_postorder(
+        self,
+        key: ModelKeyType = None,
+        max_depth: Optional[int] = None
+    ) -> Iterator[Tuple[Gtk.TreePath, int, Gtk.TreeModelRow]]:
+        """
+        Same as `iter_preorder`, but children come before their parent.
+
+        The yielded row can be removed before advancing the iterator,
+        in which case the paths yielded afterwards are the ones from before the removal.
+        """
+        for it, indices, _ in self._walk(key, max_depth, post_order=True):
+            if not self._is_hidden(it):
+                yield Gtk.TreePath.new_from_indices(indices), len(indices), self[it]
+
+    def foreach(self, func, *user_data):
+        """
+        Same as `Gtk.TreeModel.foreach`, skipping hidden rows.
+        """
+        def visit(model, path, it, *data):
+            return False if self._is_hidden(it) else func(model, path, it, *data)
+        return super().foreach(visit, *user_data)
 
     def duplicate_row(self, src: Gtk.TreeIter) -> Optional[Gtk.TreeIter]:
-        dest = self.insert_after(None, src, self[src][:])
+        dest = self.insert_after(None, src, self._get_row_values(src))
         if dest and self.iter_has_child(src):
             self._copy_descendants(src, dest)
         return dest
@@ -41,10 +76,59 @@ class TreeStore(Gtk.TreeStore):
         return self._copy_row(src_iter, coerce_path(dest_path))
 
     def move_row(self, src_iter: Gtk.TreeIter, dest_path: TreePathType) -> Optional[Gtk.TreeIter]:
-        dest_iter = self.copy_row(src_iter, dest_path)
-        if dest_iter:
-            self.remove(src_iter)
-        return dest_iter
+        """
+        Moves a row and its descendants before `dest_path`.
+
+        Rows that stay below the same parent are relocated in place, other moves go through `_move_to_parent()`.
+        """
+        dest_path = coerce_path(dest_path)
+        if self._is_sibling_position(src_iter, dest_path):
+            return self._move_among_siblings(src_iter, dest_path)
+        return self._move_to_parent(src_iter, dest_path)
+
+    def move_rows(self, keys: Iterable[ModelKeyType], direction: str) -> List[Gtk.TreePath]:
+        """
+        Moves several rows one step in `direction` (one of `MOVE_DIRECTIONS`), like `move_row_<direction>` does.
+
+        Rows whose ancestor is also given move along with it. The other rows are grouped into runs of
+        adjacent siblings, each of which moves as a block, keeping its order:
+        a run moves up or down by relocating the neighbouring sibling once.
+
+        Returns the new path of each given row, in the same order.
+        """
+        if direction not in MOVE_DIRECTIONS:
+            raise ValueError(direction)
+        rows = []
+        for key in keys:
+            it = self[key].iter
+            rows.append((tuple(self.get_path(it).get_indices()), it))
+        # Only the topmost rows are actually moved
+        tops = []
+        for indices, it in sorted(rows, key=lambda row: row[0]):
+            if tops and indices[:len(tops[-1][0])] == tops[-1][0]:
+                continue
+            tops.append((indices, it))
+        runs = []
+        for indices, it in tops:
+            prev = runs[-1][-1][0] if runs else None
+            if prev and prev[:-1] == indices[:-1] and prev[-1] + 1 == indices[-1]:
+                runs[-1].append((indices, it))
+            else:
+                runs.append([(indices, it)])
+
+        move_run = getattr(self, f'_move_run_{direction}')
+        moved = {}
+        # Runs are moved bottom-up when moving down, so that a run never moves into the next one,
+        # and when moving left, so that runs moved after the same parent keep their order.
+        for run in reversed(runs) if direction in ('down', 'left') else runs:
+            moved.update(move_run(run))
+
+        paths = []
+        for indices, _ in rows:
+            depth = next(d for d in range(1, len(indices) + 1) if indices[:d] in moved)
+            new_indices = self.get_path(moved[indices[:depth]]).get_indices() + list(indices[depth:])
+            paths.append(Gtk.TreePath.new_from_indices(new_indices))
+        return paths
 
     def move_row_up(self, src_iter: Gtk.TreeIter) -> Gtk.TreeIter:
         prev = self.iter_previous(src_iter)
@@ -80,10 +164,106 @@ class TreeStore(Gtk.TreeStore):
         dest_path.append_index(self.iter_n_children(prev))
         return self.move_row(src_iter, dest_path)
 
+    def _move_run_up(self, run: List[Tuple[tuple, Gtk.TreeIter]]) -> List[Tuple[tuple, Gtk.TreeIter]]:
+        prev = self.iter_previous(run[0][1])
+        if prev is not None:
+            self.move_after(prev, run[-1][1])
+            return run
+        # Move the rows before their parent
+        parent = self.iter_parent(run[0][1])
+        if parent is None:
+            return run
+        return self._move_run_to(run, self.get_path(parent))
+
+    def _move_run_down(self, run: List[Tuple[tuple, Gtk.TreeIter]]) -> List[Tuple[tuple, Gtk.TreeIter]]:
+        next_ = self.iter_next(run[-1][1])
+        if next_ is not None:
+            self.move_before(next_, run[0][1])
+        return run
+
+    def _move_run_left(self, run: List[Tuple[tuple, Gtk.TreeIter]]) -> List[Tuple[tuple, Gtk.TreeIter]]:
+        parent = self.iter_parent(run[0][1])
+        if parent is None:
+            return run
+        dest_path = self.get_path(parent)
+        dest_path.next()
+        return self._move_run_to(run, dest_path)
+
+    def _move_run_right(self, run: List[Tuple[tuple, Gtk.TreeIter]]) -> List[Tuple[tuple, Gtk.TreeIter]]:
+        prev = self.iter_previous(run[0][1])
+        if prev is None:
+            return run
+        dest_path = self.get_path(prev)
+        dest_path.append_index(self.iter_n_children(prev))
+        return self._move_run_to(run, dest_path)
+
+    def _move_run_to(self, run: List[Tuple[tuple, Gtk.TreeIter]], dest_path: Gtk.TreePath) -> List[Tuple[tuple, Gtk.TreeIter]]:
+        """
+        Moves the rows of a run before `dest_path`, which must not be after the run at the same level.
+        """
+        moved = []
+        for indices, it in run:
+            it = self.move_row(it, dest_path)
+            moved.append((indices, it))
+            dest_path = self.get_path(it)
+            dest_path.next()
+        return moved
+
+    def _is_hidden(self, it: Gtk.TreeIter) -> bool:
+        """
+        Whether a row is an implementation detail of the store, skipped by the traversal helpers.
+        Hidden rows must not have children.
+        """
+        return False
+
+    def _is_sibling_position(self, src_iter: Gtk.TreeIter, dest_path: Gtk.TreePath) -> bool:
+        src_indices = self.get_path(src_iter).get_indices()
+        dest_indices = dest_path.get_indices()
+        return len(src_indices) == len(dest_indices) and src_indices[:-1] == dest_indices[:-1]
+
+    def _move_among_siblings(self, src_iter: Gtk.TreeIter, dest_path: Gtk.TreePath) -> Gtk.TreeIter:
+        """
+        Relocates a row before `dest_path`, which must be below the same parent.
+        The branch is not copied and the view receives a single `rows-reordered` signal.
+        """
+        parent = self.iter_parent(src_iter)
+        index = dest_path.get_indices()[-1]
+        if index >= self.iter_n_children(parent):
+            # move to the end of the level
+            self.move_before(src_iter, None)
+            return src_iter
+        position = self.iter_nth_child(parent, index)
+        if self.get_path(position) != self.get_path(src_iter):
+            self.move_before(src_iter, position)
+        return src_iter
+
+    def _move_to_parent(self, src_iter: Gtk.TreeIter, dest_path: Gtk.TreePath) -> Optional[Gtk.TreeIter]:
+        """
+        Moves a row before `dest_path`, below another parent.
+        `Gtk.TreeStore` cannot reparent rows, so the branch is copied then the original removed.
+        """
+        dest_iter = self.copy_row(src_iter, dest_path)
+        if dest_iter:
+            self.remove(src_iter)
+        return dest_iter
+
+    def _get_row_values(self, it: Gtk.TreeIter) -> tuple:
+        return self.get(it, *range(self.get_n_columns()))
+
     def _copy_row(self, src_iter: Gtk.TreeIter, dest_path: Gtk.TreePath) -> Optional[Gtk.TreeIter]:
+        dest_iter = self._insert_at(dest_path, self._get_row_values(src_iter))
+        # If we succeeded in creating dest_iter,
+        # walk src_iter tree branch, duplicating it below dest_iter.
+        if dest_iter and self.iter_has_child(src_iter):
+            self._copy_descendants(src_iter, dest_iter)
+        return dest_iter
+
+    def _insert_at(self, dest_path: Gtk.TreePath, src_row: tuple) -> Optional[Gtk.TreeIter]:
+        """
+        Inserts a row before `dest_path`, returning None if the position does not exist.
+        """
         # Logic ported from `gtk_tree_store_drag_data_received()`
         # @see https://github.com/GNOME/gtk/blob/master/gtk/gtktreestore.c
-        src_row = self[src_iter]
         dest_iter = None
         # Get the path to insert _after_ (dest_path is the path to insert _before_)
         prev_path = dest_path.copy()
@@ -96,27 +276,63 @@ class TreeStore(Gtk.TreeStore):
             parent_path = dest_path.copy()
             if parent_path.up() and parent_path.get_depth() > 0:
                 parent_iter = self.get_iter(parent_path)
-            dest_iter = self.prepend(parent_iter, src_row[:])
+            dest_iter = self.prepend(parent_iter, src_row)
         else:
             try:
                 dest_iter = self.get_iter(prev_path)
             except ValueError:
                 return
-            dest_iter = self.insert_after(None, dest_iter, src_row[:])
-
-        # If we succeeded in creating dest_iter,
-        # walk src_iter tree branch, duplicating it below dest_iter.
-        if dest_iter and self.iter_has_child(src_iter):
-            self._copy_descendants(src_iter, dest_iter)
-
+            dest_iter = self.insert_after(None, dest_iter, src_row)
         return dest_iter
 
     def _copy_descendants(self, parent_src: Gtk.TreeIter, parent_dest: Gtk.TreeIter):
         """
-        Recursively copies descendants of `parent_src` into `parent_dest`
+        Copies descendants of `parent_src` into `parent_dest`
+        """
+        walk = self._walk(parent_src, post_order=False)
+        # skip parent_src itself
+        next(walk)
+        parents = [parent_dest]
+        for it, _, depth in walk:
+            del parents[depth - 1:]
+            parents.append(self.append(parents[-1], self._get_row_values(it)))
+
+    def _walk(
+        self,
+        key: ModelKeyType = None,
+        max_depth: Optional[int] = None,
+        post_order: bool = False
+    ) -> Iterator[Tuple[Gtk.TreeIter, List[int], int]]:
         """
-        child_src = self.iter_children(parent_src)
-        while child_src:
-            child_dest = self.append(parent_dest, self[child_src][:])
-            self._copy_descendants(child_src, child_dest)
-            child_src = self.iter_next(child_src)
+        Depth-first traversal using an explicit stack, yielding (iter, path indices, depth) tuples.
+        The depth is relative to `key` (1 for the row at `key`, or for top-level rows).
+
+        The stack holds at most one entry per level, so that memory does not depend on the number of siblings.
+        """
+        if key is None:
+            first = self.get_iter_first()
+            if first is None:
+                return
+            # entries are [iter, indices, depth, visit siblings, children pushed]
+            stack = [[first, [0], 1, True, False]]
+        else:
+            it = self[key].iter
+            stack = [[it, self.get_path(it).get_indices(), 1, False, False]]
+        while stack:
+            entry = stack[-1]
+            it, indices, depth, siblings, expanded = entry
+            descend = not expanded and (max_depth is None or depth < max_depth) and self.iter_has_child(it)
+            if descend and post_order:
+                # visit the children first, the row stays on the stack
+                entry[4] = True
+                stack.append([self.iter_children(it), indices + [0], depth + 1, True, False])
+                continue
+            stack.pop()
+            # Get the next sibling before yielding, in case the row is removed in the meantime
+            next_it = self.iter_next(it) if siblings else None
+            if next_it is not None:
+                stack.append([next_it, indices[:-1] + [indices[-1] + 1], depth, True, False])
+            if descend:
+                # pushed last so that children are visited before the next sibling
+                stack.append([self.iter_children(it), indices + [0], depth + 1, True, False])
+            yield it, indices, depth
@@ -187,3 +187,111 @@ def test_move_row_down_same_depth():
         ]),
     ])
     assert str(store.get_path(it)) == '0:2'
+
+
+def test_traversal_orders():
+    store = create_store(N('', [
+        N('0', [
+            N('0.0', [N('0.0.0')]),
+            N('0.1'),
+        ]),
+        N('1'),
+    ]))
+    assert [(str(path), level, row[0]) for path, level, row in store.iter_preorder()] == [
+        ('0', 1, '0'), ('0:0', 2, '0.0'), ('0:0:0', 3, '0.0.0'), ('0:1', 2, '0.1'), ('1', 1, '1'),
+    ]
+    assert [row[0] for _, _, row in store.iter_postorder()] == ['0.0.0', '0.0', '0.1', '0', '1']
+    assert [row[0] for _, _, row in store.iter_preorder('0', max_depth=2)] == ['0', '0.0', '0.1']
+    assert [str(path) for path, _, _ in store.iter_postorder('0:0')] == ['0:0:0', '0:0']
+
+    for _, _, row in store.iter_postorder('0'):
+        if row[0] != '0':
+            store.remove(row.iter)
+    assert get_node(store) == N('', [N('0'), N('1')])
+
+
+def test_deep_trees_do_not_recurse():
+    store = TreeStore(str)
+    it = None
+    for i in range(5000):
+        it = store.append(it, (str(i),))
+    assert sum(1 for _ in store.descendants()) == 5000
+    dest = store.duplicate_row(store.get_iter_first())
+    assert sum(1 for _ in store.iter_preorder(dest)) == 5000
+
+
+def test_move_row_among_siblings_keeps_the_row():
+    store = create_store(N('', [
+        N('0', [N('0.0')]),
+        N('1'),
+        N('2'),
+    ]))
+    src = store.get_iter('0')
+    it = store.move_row(src, '2')
+    assert it is src
+    assert get_node(store) == N('', [
+        N('1'),
+        N('0', [N('0.0')]),
+        N('2'),
+    ])
+    store.move_row(it, '3')
+    assert get_node(store) == N('', [
+        N('1'),
+        N('2'),
+        N('0', [N('0.0')]),
+    ])
+
+
+def test_move_rows_moves_runs_as_blocks():
+    def create():
+        return create_store(N('', [
+            N('0'),
+            N('1', [
+                N('1.0'),
+                N('1.1', [N('1.1.0')]),
+                N('1.2'),
+                N('1.3'),
+            ]),
+            N('2'),
+        ]))
+
+    store = create()
+    paths = store.move_rows(['1:1', '1:1:0', '1:2'], 'up')
+    assert get_node(store) == N('', [
+        N('0'),
+        N('1', [N('1.1', [N('1.1.0')]), N('1.2'), N('1.0'), N('1.3')]),
+        N('2'),
+    ])
+    assert [str(p) for p in paths] == ['1:0', '1:0:0', '1:1']
+
+    store = create()
+    paths = store.move_rows(['1:1', '1:2'], 'down')
+    assert [row[0] for row in store[1].iterchildren()] == ['1.0', '1.3', '1.1', '1.2']
+    assert [str(p) for p in paths] == ['1:2', '1:3']
+
+    store = create()
+    paths = store.move_rows(['1:0', '1:1', '1:3'], 'left')
+    assert get_node(store) == N('', [
+        N('0'),
+        N('1', [N('1.2')]),
+        N('1.0'),
+        N('1.1', [N('1.1.0')]),
+        N('1.3'),
+        N('2'),
+    ])
+    assert [str(p) for p in paths] == ['2', '3', '4']
+
+    store = create()
+    paths = store.move_rows(['1', '1:0', '2'], 'right')
+    assert get_node(store) == N('', [
+        N('0', [
+            N('1', [N('1.0'), N('1.1', [N('1.1.0')]), N('1.2'), N('1.3')]),
+            N('2'),
+        ]),
+    ])
+    assert [str(p) for p in paths] == ['0:0', '0:0:0', '0:1']
+
+    store = create()
+    paths = store.move_rows(['1:0', '1:1'], 'up')
+    assert [row[0] for row in store] == ['0', '1.0', '1.1', '1', '2']
+    assert [str(p) for p in paths] == ['1', '2']
@@ -0,0 +1,60 @@
+from pathlib import Path
+from typing import Dict, Optional
+
+from gi.repository import GLib, Gio, Gtk
+
+
+class UIResources:
+    """
+    Data files of the application: UI definitions, CSS and keybindings.
+
+    If a compiled `pdftoc.gresource` bundle (see `pdftoc.gresource.xml`) is found in the resources directory,
+    it is registered and the files are mapped from it. Otherwise each file is read from the directory
+    the first time it is requested. Either way, the contents are kept in memory for the lifetime
+    of the application, so that building a window does not touch the disk.
+    """
+
+    PREFIX = '/me/ju1ius/pdftoc/'
+    BUNDLE = 'pdftoc.gresource'
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.bundle: Optional[Gio.Resource] = None
+        self._data: Dict[str, bytes] = {}
+        self._texts: Dict[str, str] = {}
+        path = directory / self.BUNDLE
+        if path.exists():
+            try:
+                self.bundle = Gio.Resource.load(str(path))
+            except GLib.Error as err:
+                print(f'Could not load {path}, falling back to the resource files: {err.message}')
+            else:
+                self.bundle._register()
+
+    def get_data(self, name: str) -> bytes:
+        data = self._data.get(name)
+        if data is None:
+            if self.bundle:
+                data = self.bundle.lookup_data(self.PREFIX + name, Gio.ResourceLookupFlags.NONE).get_data()
+            else:
+                data = (self.directory / name).read_bytes()
+            self._data[name] = data
+        return data
+
+    def get_text(self, name: str) -> str:
+        text = self._texts.get(name)
+        if text is None:
+            text = self._texts[name] = self.get_data(name).decode('utf8')
+        return text
+
+    def new_builder(self, *names: str) -> Gtk.Builder:
+        """
+        Returns a builder holding the objects of the given UI definitions.
+        """
+        builder = Gtk.Builder()
+        for name in names:
+            if self.bundle:
+                builder.add_from_resource(self.PREFIX + name)
+            else:
+                builder.add_from_string(self.get_text(name))
+        return builder
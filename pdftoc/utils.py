@@ -1,5 +1,32 @@
+import errno
+import os
+import shutil
+import sys
+import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
-from typing import Iterable
+from typing import Iterable, BinaryIO, TextIO
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# ioctl request sharing the extents of a file with another one (Linux, btrfs/XFS...)
+FICLONE = 0x40049409
+# Errors meaning that a copy method is not supported for the given pair of files
+COPY_UNSUPPORTED_ERRORS = {
+    errno.EBADF,
+    errno.EINVAL,
+    errno.ENOSYS,
+    errno.ENOTSUP,
+    errno.EOPNOTSUPP,
+    errno.ENOTTY,
+    errno.EXDEV,
+    errno.EPERM,
+}
+COPY_CHUNK_SIZE = 1 << 30
 
 
 def local_timezone():
@@ -21,3 +48,81 @@ def all_equal(items: Iterable) -> bool:
     except StopIteration:
         return False
     return all(x == first for x in it)
+
+
+class PhaseTimer:
+    """
+    Reports the duration of named phases, and when they ended relative to the creation of the timer.
+    Does nothing unless enabled.
+    """
+
+    def __init__(self, enabled: bool, out: TextIO = sys.stderr):
+        self.enabled = enabled
+        self.out = out
+        self.origin = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.mark(name, time.perf_counter() - start)
+
+    def mark(self, name: str, duration: float = 0.0):
+        if self.enabled:
+            elapsed = time.perf_counter() - self.origin
+            print(f'{name:>20}: {duration * 1000:8.1f}ms, at {elapsed * 1000:8.1f}ms', file=self.out)
+
+
+def copy_file_data(src: BinaryIO, dst: BinaryIO) -> int:
+    """
+    Copies the whole content of `src` at the start of `dst`, leaving the position of `dst` at the end of the data.
+
+    Tries, in order: a copy-on-write reflink, `copy_file_range`, `sendfile`, and finally a buffered copy,
+    so that unchanged bytes are shared or at least never pulled through userspace when the platform allows it.
+    Returns the number of bytes copied.
+    """
+    dst.flush()
+    src_fd, dst_fd = src.fileno(), dst.fileno()
+    size = os.fstat(src_fd).st_size
+    copied = 0
+    if fcntl and size:
+        try:
+            fcntl.ioctl(dst_fd, FICLONE, src_fd)
+            copied = size
+        except OSError as err:
+            if err.errno not in COPY_UNSUPPORTED_ERRORS:
+                raise
+    if copied < size and hasattr(os, 'copy_file_range'):
+        copied = _copy_with(lambda offset, count: os.copy_file_range(src_fd, dst_fd, count, offset, offset), copied, size)
+    if copied < size and hasattr(os, 'sendfile'):
+        os.lseek(dst_fd, copied, os.SEEK_SET)
+        copied = _copy_with(lambda offset, count: os.sendfile(dst_fd, src_fd, offset, count), copied, size)
+    if copied < size:
+        src.seek(copied)
+        dst.seek(copied)
+        shutil.copyfileobj(src, dst)
+        copied = dst.tell()
+    dst.seek(copied)
+    return copied
+
+
+def _copy_with(copy_range, offset: int, size: int) -> int:
+    """
+    Calls `copy_range(offset, count)` until `size` bytes are copied,
+    or the method turns out to be unsupported. Returns the new offset.
+    """
+    try:
+        while offset < size:
+            n = copy_range(offset, min(COPY_CHUNK_SIZE, size - offset))
+            if not n:
+                break
+            offset += n
+    except OSError as err:
+        if err.errno not in COPY_UNSUPPORTED_ERRORS:
+            raise
+    return offset
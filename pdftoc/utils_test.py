@@ -0,0 +1,73 @@
+import errno
+import os
+import types
+
+import pytest
+
+from pdftoc import utils
+
+
+DATA = os.urandom(300_000) + b'end'
+
+
+def unsupported(code):
+    def copy(*args):
+        raise OSError(code, os.strerror(code))
+    return copy
+
+
+def copy_file(tmp_path, prefix=b''):
+    src, dst = tmp_path / 'src', tmp_path / 'dst'
+    src.write_bytes(DATA)
+    with open(src, 'rb') as s, open(dst, 'wb') as d:
+        d.write(prefix)
+        copied = utils.copy_file_data(s, d)
+        position = d.tell()
+    return copied, position, dst.read_bytes()
+
+
+@pytest.mark.parametrize('disabled', [
+    (),
+    ('ioctl',),
+    ('ioctl', 'copy_file_range'),
+    ('ioctl', 'copy_file_range', 'sendfile'),
+])
+def test_copy_fallbacks(tmp_path, monkeypatch, disabled):
+    codes = iter((errno.EOPNOTSUPP, errno.EXDEV, errno.ENOSYS))
+    if 'ioctl' in disabled:
+        monkeypatch.setattr(utils, 'fcntl', types.SimpleNamespace(ioctl=unsupported(next(codes))))
+    for name in ('copy_file_range', 'sendfile'):
+        if name in disabled and hasattr(os, name):
+            monkeypatch.setattr(os, name, unsupported(next(codes)))
+    # the data is copied at the start of the destination, whatever was written before
+    assert copy_file(tmp_path, prefix=b'overwritten') == (len(DATA), len(DATA), DATA)
+
+
+def test_partial_copies_continue_with_the_next_method(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, 'fcntl', types.SimpleNamespace(ioctl=unsupported(errno.EXDEV)))
+    monkeypatch.setattr(utils, 'COPY_CHUNK_SIZE', 4096)
+    calls = []
+
+    def copy_file_range(src, dst, count, offset_src, offset_dst):
+        calls.append(count)
+        if len(calls) > 3:
+            raise OSError(errno.EXDEV, 'cross-device')
+        # short writes
+        return os.pwrite(dst, os.pread(src, count // 2, offset_src), offset_dst)
+
+    def sendfile(out_fd, in_fd, offset, count):
+        if offset > 100_000:
+            return 0
+        return os.write(out_fd, os.pread(in_fd, count, offset))
+
+    monkeypatch.setattr(os, 'copy_file_range', copy_file_range, raising=False)
+    monkeypatch.setattr(os, 'sendfile', sendfile, raising=False)
+    assert copy_file(tmp_path) == (len(DATA), len(DATA), DATA)
+    assert calls == [4096, 4096, 4096, 4096]
+
+
+def test_copy_errors_are_raised(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, 'fcntl', types.SimpleNamespace(ioctl=unsupported(errno.EIO)))
+    with pytest.raises(OSError) as exc_info:
+        copy_file(tmp_path)
+    assert exc_info.value.errno == errno.EIO